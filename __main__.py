@@ -2,7 +2,10 @@
 import signal
 
 from nowplaying import start as start_nowplaying
-from transcription_engine import start as start_transcription
+from outputs import QueueSink
+from resource_policy import run_with_policy
+from transcription_engine import INPUT_DEVICES, WORKERS, start as start_transcription
+from shared_audio import SharedAudioRing, SharedMemorySource, start_capture
 from transcription_server import start as start_server
 
 from multiprocessing import Process, Queue, Semaphore
@@ -14,15 +17,39 @@ if __name__ == "__main__":
     # Queue message format: Dictionary ->
     #   log:     committed text that won't change anymore
     #   stream:  streaming text that hasn't finished changing yet
+    #   source:  speaker label of the input the log or stream text came from
+    #   seq:     where the log or stream text ends on the shared audio timeline
+    #   start:   when the audio the log or stream text covers started being captured (UNIX seconds)
+    #   end:     when the audio it covers finished being captured (UNIX seconds)
     #   stop:    if true, we're shutting down
     #   clear:   clear transcription log
     transcription_queue = Queue()
-    nowplaying = Process(target=start_nowplaying)
-    transcription = Process(target=start_transcription, args=(transcription_queue,))
-    server = Process(target=start_server, args=(transcription_queue,))
+    # Metrics snapshots from the engine and nowplaying, served at /metrics
+    metrics_queue = Queue()
+    # Now-playing outputs, as they change, for the server to serve to overlays
+    nowplaying_queue = Queue()
+    # Captured audio goes from the capture process to the inference workers through shared memory
+    rings = {name: SharedAudioRing.create() for name in INPUT_DEVICES}
+    # Every process applies the policy for its role (see resource_policy.POLICIES) before it starts
+    nowplaying = Process(target=run_with_policy, args=("nowplaying", start_nowplaying, metrics_queue, [QueueSink(nowplaying_queue)]))
+    capture = Process(
+        target=run_with_policy, args=("capture", start_capture, {name: ring.name for name, ring in rings.items()}, INPUT_DEVICES)
+    )
+    workers = [
+        Process(
+            target=run_with_policy,
+            args=("engine", start_transcription, transcription_queue, {name: SharedMemorySource(ring.name) for name, ring in rings.items()}),
+            # The workers share the engine's threads, so together they still leave room for OBS
+            kwargs={"metrics_queue": metrics_queue, "role": role, "model_id": model_id, "role_processes": len(WORKERS)},
+        )
+        for role, model_id in WORKERS
+    ]
+    server = Process(target=run_with_policy, args=("server", start_server, transcription_queue, metrics_queue, nowplaying_queue))
 
     nowplaying.start()
-    transcription.start()
+    capture.start()
+    for worker in workers:
+        worker.start()
     server.start()
 
     exit_lock = Semaphore(0)
@@ -35,12 +62,20 @@ if __name__ == "__main__":
         print("Cleaning up...")
         nowplaying.terminate()
         server.terminate()
-        transcription.terminate()
+        capture.terminate()
+        for worker in workers:
+            worker.terminate()
         nowplaying.join()
         server.join()
-        transcription.join()
+        capture.join()
+        for worker in workers:
+            worker.join()
 
+        for ring in rings.values():
+            ring.close()
         transcription_queue.close()
+        metrics_queue.close()
+        nowplaying_queue.close()
         exit_lock.release()
 
         # Escapes the loop below even if we ^C instead of writing 'q'
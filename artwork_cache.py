@@ -0,0 +1,89 @@
+#!/usr/bin/env python3.9
+# This module keeps now-playing artwork on disk, resized for the overlay
+# and named by a hash of the bytes the player handed over, so artwork we've
+# seen before is never decoded or encoded again, and swaps it into place
+# for OBS atomically.
+
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+from PIL import Image
+from util import create_logger
+
+import hashlib
+import os
+import shutil
+
+LOG = create_logger("artwork-cache")
+
+ARTWORK_CACHE_DIR = Path.home().joinpath(".stream", "artwork")
+# Longest side of the artwork the overlay shows; bigger artwork is scaled down to it
+ARTWORK_SIZE = 512
+# Least recently used artwork goes once the cache is bigger than this
+ARTWORK_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+
+def swap_in(source: Path, dest: Path):
+    """Makes `dest` a hard link to `source`, so anything reading `dest` sees one or the other, never half of one"""
+    tmp = dest.with_name(f".{dest.name}.tmp")
+    if tmp.exists():
+        tmp.unlink()
+    try:
+        os.link(source, tmp)
+    except OSError:
+        # Different filesystems; a copy is still swapped in whole
+        shutil.copyfile(source, tmp)
+    os.replace(tmp, dest)
+
+
+class ArtworkCache:
+    def __init__(
+        self, directory: Path = ARTWORK_CACHE_DIR, size: int = ARTWORK_SIZE, max_bytes: int = ARTWORK_CACHE_MAX_BYTES
+    ) -> None:
+        self.directory = directory
+        self.size = size
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, data: bytes) -> Path:
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return self.directory.joinpath(f"{digest}-{self.size}.png")
+
+    def get(self, data: bytes) -> Optional[Path]:
+        """The PNG for artwork `data`, decoded and resized only if it isn't cached; None if it isn't an image"""
+        path = self.path_for(data)
+        if path.exists():
+            self.hits += 1
+            # Its mtime is what eviction goes by
+            os.utime(path)
+            return path
+
+        self.misses += 1
+        try:
+            image = Image.open(BytesIO(data))
+            image.thumbnail((self.size, self.size))
+            if image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+                # CMYK JPEGs and the like, which PNG can't hold
+                image = image.convert("RGBA")
+        except Exception as e:
+            LOG.warning(f"Couldn't decode artwork: {type(e).__name__}: {e}")
+            return None
+        tmp = path.with_suffix(".tmp")
+        image.save(tmp, format="PNG")
+        os.replace(tmp, path)
+        self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: Path):
+        entries = [(entry.stat(), entry) for entry in self.directory.glob("*.png")]
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, entry in sorted(entries, key=lambda e: e[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            if entry == keep:
+                continue
+            # Whatever OBS is showing stays, through its own link
+            entry.unlink()
+            total -= stat.st_size
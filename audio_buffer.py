@@ -0,0 +1,103 @@
+#!/usr/bin/env python3.9
+# This module provides a fixed-capacity ring buffer for captured
+# audio, so the transcription engine can append, cut and read its
+# window without reallocating or copying the whole thing every tick.
+
+import numpy
+
+
+class AudioRingBuffer:
+    """
+    A float32 ring buffer addressed by absolute sample offsets.
+
+    Every sample is stored twice (at `i` and `i + capacity`), so any run
+    of up to `capacity` samples is contiguous in memory and `view()` can
+    hand it out without copying. Appending costs one block write per
+    block, cutting only moves the start offset.
+
+    If more than `capacity` samples are buffered, the oldest ones are
+    dropped and counted in `dropped`.
+    """
+
+    def __init__(self, capacity: int, alignment: int = 1):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        # Cut points are rounded down to a multiple of this
+        self.alignment = alignment
+        self.dropped = 0
+        self._buf = numpy.zeros(2 * capacity, dtype=numpy.float32)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self) -> int:
+        return self._end - self._start
+
+    @property
+    def start_sample(self) -> int:
+        """Absolute offset of the oldest buffered sample"""
+        return self._start
+
+    @property
+    def end_sample(self) -> int:
+        """Absolute offset one past the newest buffered sample"""
+        return self._end
+
+    def append(self, block: numpy.ndarray):
+        block = numpy.asarray(block, dtype=numpy.float32).reshape(-1)
+        n = len(block)
+        if n == 0:
+            return
+        if n > self.capacity:
+            # Only the tail of the block can survive anyway
+            self._end += n - self.capacity
+            block = block[-self.capacity :]
+            n = self.capacity
+
+        cap = self.capacity
+        pos = self._end % cap
+        first = min(n, cap - pos)
+        self._buf[pos : pos + first] = block[:first]
+        self._buf[pos + cap : pos + cap + first] = block[:first]
+        rest = n - first
+        if rest:
+            self._buf[:rest] = block[first:]
+            self._buf[cap : cap + rest] = block[first:]
+        self._end += n
+
+        if len(self) > cap:
+            new_start = self._align_up(self._end - cap)
+            self.dropped += new_start - self._start
+            self._start = new_start
+
+    def cut_to(self, sample: int):
+        """Drop everything before absolute offset `sample` (rounded down to `alignment`)"""
+        sample = min(max(self._start, self._align_down(sample)), self._end)
+        self._start = sample
+
+    def keep_last(self, n: int):
+        """Drop everything but (roughly) the newest `n` samples"""
+        self.cut_to(self._end - max(0, n))
+
+    def clear(self):
+        self._start = self._end
+
+    def view(self, start: int = None, end: int = None) -> numpy.ndarray:
+        """
+        A contiguous, zero-copy view of the buffered audio between absolute
+        offsets `start` and `end` (defaulting to everything buffered).
+
+        The view stays valid until the buffer's end passes `start + capacity`:
+        for a view up to the end, that's only `capacity - len(view)` more
+        samples appended. After that, appends overwrite its oldest samples.
+        """
+        start = self._start if start is None else min(max(self._start, start), self._end)
+        end = self._end if end is None else min(max(start, end), self._end)
+        pos = start % self.capacity
+        return self._buf[pos : pos + (end - start)]
+
+    def _align_down(self, sample: int) -> int:
+        return sample - sample % self.alignment
+
+    def _align_up(self, sample: int) -> int:
+        return -(-sample // self.alignment) * self.alignment
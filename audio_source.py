@@ -0,0 +1,243 @@
+#!/usr/bin/env python3.9
+# This module provides the audio inputs the transcription engine can be
+# driven by: a live microphone, or a recording played back either in
+# real time or as fast as we can transcribe it.
+
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+from resampler import PolyphaseResampler, resample
+from util import create_logger
+from whisper.audio import SAMPLE_RATE
+
+import numpy
+import queue
+import time
+
+LOG = create_logger("audio-source")
+
+# How many frames a file source hands out at a time, roughly a sounddevice callback's worth
+FILE_BLOCK_FRAMES = 1024
+# sounddevice.CallbackFlags attributes we count
+STATUS_FLAGS = ("input_underflow", "input_overflow", "output_underflow", "output_overflow", "priming_output")
+# Capture in blocks this long, at the device's own rate, resampled to SAMPLE_RATE as they arrive
+CAPTURE_BLOCK_S = 0.02
+# sounddevice latency for capture: "low", "high" or seconds
+CAPTURE_LATENCY = "low"
+
+
+def open_capture(
+    device,
+    on_block: Callable[[numpy.ndarray, float], None],
+    on_status: Callable[[str], None],
+    latency=CAPTURE_LATENCY,
+    native_rate: bool = True,
+):
+    """
+    An unstarted sounddevice InputStream on `device` that calls
+    `on_block(samples, captured)` with mono SAMPLE_RATE audio and when its last
+    sample was captured (UNIX seconds), and `on_status(flag)` for every
+    STATUS_FLAGS problem. With `native_rate`, the device runs at its own
+    default rate and we resample, instead of leaving that to the driver.
+    Both callbacks run on sounddevice's thread.
+    """
+    import sounddevice
+
+    rate = sounddevice.query_devices(device, "input")["default_samplerate"] if native_rate else SAMPLE_RATE
+    resampler = PolyphaseResampler(rate, SAMPLE_RATE)
+
+    def callback(indata: numpy.ndarray, frames: int, time_info, status):
+        if status:
+            LOG.error(str(status))
+            for flag in STATUS_FLAGS:
+                if getattr(status, flag):
+                    on_status(flag)
+        # How long ago the first sample of this block hit the ADC
+        delay = max(0.0, time_info.currentTime - time_info.inputBufferAdcTime)
+        captured = time.time() - delay + frames / rate - resampler.delay_s
+        block = resampler.process(indata[:, 0])
+        if len(block):
+            on_block(block, captured)
+
+    stream = sounddevice.InputStream(
+        callback=callback,
+        dtype="float32",
+        samplerate=rate,
+        blocksize=int(rate * CAPTURE_BLOCK_S),
+        latency=latency,
+        channels=1,
+        device=device,
+    )
+    LOG.info(f"Capturing {stream.device} at {rate:g} Hz, {stream.latency * 1000:.0f}ms input latency")
+    return stream
+
+
+class AudioSource(ABC):
+    """
+    A mono float32 audio input, opened with `with`. The engine also takes its
+    clock from the source, so a file can be played back faster than real time.
+    """
+
+    samplerate: float = SAMPLE_RATE
+    # When (on this source's clock) the end of the last block returned by `read` was captured
+    last_capture_time: float = 0.0
+    # False if the clock stands still while the engine is busy, so there's no point in not waiting
+    realtime: bool = True
+    # Where sample 0 of this source is on a timeline shared with other readers of the same audio
+    origin: int = 0
+
+    def __enter__(self) -> "AudioSource":
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+    @abstractmethod
+    def read(self) -> List[numpy.ndarray]:
+        """Returns every block captured since the last call, waiting for at least one unless exhausted"""
+        ...
+
+    @property
+    def exhausted(self) -> bool:
+        """True once the source will never produce more audio"""
+        return False
+
+    def status_counts(self) -> Dict[str, int]:
+        """How many times each capture problem (overflow, underflow, ...) has happened so far"""
+        return {}
+
+    @property
+    def committed_sample(self) -> Optional[int]:
+        """Where another reader of the same audio last committed text up to, if anyone shares it"""
+        return None
+
+    def mark_committed(self, sample: int):
+        """Tells other readers of the same audio that text up to `sample` has been committed"""
+        pass
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class MicrophoneSource(AudioSource):
+    def __init__(self, latency=CAPTURE_LATENCY, device=None, native_rate: bool = True) -> None:
+        super().__init__()
+        self._latency = latency
+        # A sounddevice device name or index; None for the default input
+        self._device = device
+        self._native_rate = native_rate
+        self._queue = queue.Queue()
+        self._stream = None
+        self._status_counts = Counter()
+
+    # runs on sounddevice's separate thread
+    def _on_block(self, block: numpy.ndarray, captured: float):
+        # Without resampling, the block is a view into sounddevice's buffer
+        self._queue.put((block.reshape(-1, 1).copy(), captured))
+
+    def _on_status(self, flag: str):
+        self._status_counts[flag] += 1
+
+    def __enter__(self) -> "MicrophoneSource":
+        self._stream = open_capture(self._device, self._on_block, self._on_status, self._latency, self._native_rate)
+        self._stream.__enter__()
+        return self
+
+    def __exit__(self, *args):
+        self._stream.__exit__(*args)
+
+    def status_counts(self) -> Dict[str, int]:
+        return dict(self._status_counts)
+
+    def read(self) -> List[numpy.ndarray]:
+        items = [self._queue.get()]
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self.last_capture_time = items[-1][1]
+        return [block for block, _ in items]
+
+
+class FileSource(AudioSource):
+    """
+    Plays back an audio file (anything soundfile reads: WAV, FLAC, ...).
+
+    Paced playback releases audio in real time, like a microphone would.
+    Unpaced playback runs on a virtual clock that only moves when the engine
+    sleeps, so ticks happen as fast as inference allows while the engine
+    still sees the same audio per tick as it would live.
+    """
+
+    def __init__(self, path: str, paced: bool = True, block_frames: int = FILE_BLOCK_FRAMES) -> None:
+        super().__init__()
+        self.path = path
+        self.paced = paced
+        self._block_frames = block_frames
+        self._audio = None
+        self._pos = 0
+        self._clock = 0.0
+        self._started = 0.0
+
+    def __enter__(self) -> "FileSource":
+        import soundfile
+
+        data, rate = soundfile.read(self.path, dtype="float32", always_2d=True)
+        self._audio = resample(data.mean(axis=1), rate, SAMPLE_RATE)
+        self._pos = 0
+        self._clock = 0.0
+        self._started = time.time()
+        return self
+
+    @property
+    def realtime(self) -> bool:
+        return self.paced
+
+    @property
+    def started_at(self) -> float:
+        """Our clock's reading when playback started"""
+        return self._started
+
+    @property
+    def duration_s(self) -> float:
+        return len(self._audio) / self.samplerate
+
+    @property
+    def exhausted(self) -> bool:
+        return self._pos >= len(self._audio)
+
+    def time(self) -> float:
+        return time.time() if self.paced else self._started + self._clock
+
+    def sleep(self, seconds: float):
+        if self.paced:
+            time.sleep(seconds)
+        else:
+            self._clock += max(0.0, seconds)
+
+    def read(self) -> List[numpy.ndarray]:
+        if self.exhausted:
+            return []
+
+        def available():
+            elapsed = self.time() - self._started
+            return min(len(self._audio), int(elapsed * self.samplerate))
+
+        # Like a microphone, wait for at least one block
+        next_block = min(len(self._audio), self._pos + self._block_frames)
+        if available() < next_block:
+            self.sleep(next_block / self.samplerate - (self.time() - self._started))
+
+        end = max(next_block, available())
+        blocks = [
+            self._audio[i : min(end, i + self._block_frames)].reshape(-1, 1)
+            for i in range(self._pos, end, self._block_frames)
+        ]
+        self._pos = end
+        self.last_capture_time = self._started + end / self.samplerate
+        return blocks
+
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3.9
+# This module transcribes several short windows of audio at once, with a
+# single batched encoder and decoder pass, and splits the output into the
+# same segments `whisper.transcribe` would return.
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from mel_cache import precomputed_mel
+from whisper.audio import HOP_LENGTH, N_FRAMES, N_SAMPLES, SAMPLE_RATE
+
+import numpy
+import time
+import torch
+
+# Same thresholds `whisper.transcribe` uses by default to decide a decode failed
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+# Seconds per timestamp token: the encoder halves the frame rate
+TIME_PRECISION = 2 * HOP_LENGTH / SAMPLE_RATE
+
+
+class DecodeProfile(NamedTuple):
+    """How much work decoding a tick's windows is allowed to take"""
+
+    # None for greedy decoding, or how many beams to keep (at temperature 0)
+    beam_size: Optional[int]
+    # Temperatures to try in turn while a decode looks like it failed; caps the attempts
+    temperatures: Tuple[float, ...]
+    # Once a tick has taken this long, keep the best hypothesis so far instead of retrying
+    budget_s: Optional[float]
+    # At most this many tokens per second of audio, so a looping decode can't run to the context limit
+    max_tokens_per_s: Optional[float]
+
+
+DECODE_PROFILES: Dict[str, DecodeProfile] = {
+    # Predictable tick latency: greedy, one retry, a time budget and a token cap
+    "realtime": DecodeProfile(beam_size=None, temperatures=(0.0, 0.4), budget_s=1.0, max_tokens_per_s=12),
+    # A bounded beam for when there's CPU to spare
+    "beam": DecodeProfile(beam_size=3, temperatures=(0.0, 0.4), budget_s=2.0, max_tokens_per_s=12),
+    # What `whisper.transcribe` does by default: up to six attempts, no limits
+    "whisper": DecodeProfile(beam_size=None, temperatures=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0), budget_s=None, max_tokens_per_s=None),
+}
+
+
+def split_segments(tokens: List[int], duration: float, tokenizer, no_speech_prob: float) -> List[dict]:
+    """Splits decoded tokens into segments at timestamp pairs, like `whisper.transcribe`"""
+
+    def segment(start: float, end: float, sliced: List[int]) -> dict:
+        return {
+            "seek": 0,
+            "start": start,
+            "end": end,
+            "text": tokenizer.decode([token for token in sliced if token < tokenizer.eot]),
+            "tokens": sliced,
+            "no_speech_prob": no_speech_prob,
+        }
+
+    is_timestamp = [token >= tokenizer.timestamp_begin for token in tokens]
+    consecutive = [i + 1 for i in range(len(tokens) - 1) if is_timestamp[i] and is_timestamp[i + 1]]
+    if not consecutive:
+        timestamps = [token for token, timestamp in zip(tokens, is_timestamp) if timestamp]
+        if timestamps and timestamps[-1] != tokenizer.timestamp_begin:
+            # No pairs, but a timestamp; use the last one
+            duration = (timestamps[-1] - tokenizer.timestamp_begin) * TIME_PRECISION
+        return [segment(0.0, duration, tokens)]
+
+    segments = []
+    last = 0
+    single_timestamp_ending = is_timestamp[-2:] == [False, True]
+    if single_timestamp_ending:
+        consecutive.append(len(tokens))
+    for i in consecutive:
+        sliced = tokens[last:i]
+        segments.append(
+            segment(
+                (sliced[0] - tokenizer.timestamp_begin) * TIME_PRECISION,
+                (sliced[-1] - tokenizer.timestamp_begin) * TIME_PRECISION,
+                sliced,
+            )
+        )
+        last = i
+    # `transcribe` would decode an unfinished last segment again from its
+    # start; our windows end where the audio does, so keep it as it is
+    rest = tokens[last:]
+    if any(token < tokenizer.eot for token in rest):
+        segments.append(segment(segments[-1]["end"], duration, rest))
+    return segments
+
+
+def transcribe_batch(
+    model,
+    windows: List[Tuple[torch.Tensor, numpy.ndarray]],
+    no_speech_threshold: float,
+    word_timestamps: bool = False,
+    profile: DecodeProfile = DECODE_PROFILES["realtime"],
+    stats: Optional[dict] = None,
+) -> List[dict]:
+    """
+    Transcribes each (mel, audio) window, `mel` being what `MelCache.update`
+    returned for `audio`. Windows up to 30 seconds long are encoded once and
+    decoded together; windows whose decode looks like it failed are decoded
+    again, from the same encoder output, at the profile's next temperature
+    until it runs out of attempts or time. Longer windows go through
+    `model.transcribe` on their own. Returns a dict with "segments" per
+    window, in order; with `word_timestamps`, every segment also has
+    "words". Timings and attempt counts are added to `stats`, if given.
+    """
+    from whisper.decoding import DecodingOptions
+    from whisper.timing import add_word_timestamps
+    from whisper.tokenizer import get_tokenizer
+
+    start = time.time()
+    stats = {} if stats is None else stats
+    stats.update(encode_s=0.0, decode_s=0.0, decode_attempts=0, fallbacks=0, over_budget=False)
+
+    results = [None] * len(windows)
+    batch = [i for i, (_, audio) in enumerate(windows) if len(audio) <= N_SAMPLES]
+    if batch:
+        fp16 = model.device.type != "cpu"
+        mels = torch.stack([windows[i][0][:, :N_FRAMES] for i in batch]).to(model.device)
+        if fp16:
+            mels = mels.half()
+        # `decode` skips the encoder when it's given audio features, so retries only pay for decoding
+        with torch.no_grad():
+            features = model.embed_audio(mels)
+        stats["encode_s"] = time.time() - start
+
+        sample_len = model.dims.n_text_ctx // 2
+        if profile.max_tokens_per_s is not None:
+            longest_s = max(len(windows[i][1]) for i in batch) / SAMPLE_RATE
+            sample_len = min(sample_len, int(profile.max_tokens_per_s * longest_s) + 8)
+
+        # Best decode so far for each window, by position in `batch`
+        best = {}
+        pending = list(range(len(batch)))
+        for attempt, temperature in enumerate(profile.temperatures):
+            if attempt > 0 and profile.budget_s is not None and time.time() - start > profile.budget_s:
+                stats["over_budget"] = True
+                break
+            options = DecodingOptions(
+                language=None if model.is_multilingual else "en",
+                temperature=temperature,
+                beam_size=profile.beam_size if temperature == 0 else None,
+                sample_len=sample_len,
+                fp16=fp16,
+            )
+            decode_start = time.time()
+            decoded = model.decode(features[pending], options)
+            stats["decode_s"] += time.time() - decode_start
+            stats["decode_attempts"] += 1
+            if attempt > 0:
+                stats["fallbacks"] += len(pending)
+
+            retry = []
+            for j, result in zip(pending, decoded):
+                silent = result.no_speech_prob > no_speech_threshold and result.avg_logprob <= LOGPROB_THRESHOLD
+                if j not in best or silent or result.avg_logprob > best[j].avg_logprob:
+                    best[j] = result
+                failed = result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or result.avg_logprob < LOGPROB_THRESHOLD
+                if failed and not silent:
+                    retry.append(j)
+            pending = retry
+            if not pending:
+                break
+
+        for j, i in enumerate(batch):
+            result = best[j]
+            if result.no_speech_prob > no_speech_threshold and result.avg_logprob <= LOGPROB_THRESHOLD:
+                results[i] = {"segments": []}
+                continue
+            tokenizer = get_tokenizer(
+                model.is_multilingual, num_languages=model.num_languages, language=result.language, task="transcribe"
+            )
+            duration = len(windows[i][1]) / SAMPLE_RATE
+            segments = split_segments(result.tokens, duration, tokenizer, result.no_speech_prob)
+            if word_timestamps:
+                add_word_timestamps(
+                    segments=segments,
+                    model=model,
+                    tokenizer=tokenizer,
+                    mel=mels[j],
+                    num_frames=len(windows[i][1]) // HOP_LENGTH,
+                    last_speech_timestamp=0.0,
+                )
+            results[i] = {"segments": segments}
+
+    for i, (mel, audio) in enumerate(windows):
+        if results[i] is None:
+            with precomputed_mel(mel):
+                results[i] = model.transcribe(
+                    audio,
+                    no_speech_threshold=no_speech_threshold,
+                    condition_on_previous_text=False,
+                    word_timestamps=word_timestamps,
+                    temperature=profile.temperatures,
+                    beam_size=profile.beam_size,
+                )
+    return results
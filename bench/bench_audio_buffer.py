@@ -0,0 +1,69 @@
+#!/usr/bin/env python3.9
+# Micro-benchmark for the engine's audio buffering: per-tick cost of
+# the old concatenate-and-copy approach versus AudioRingBuffer, as the
+# amount of buffered audio grows.
+
+from pathlib import Path
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_buffer import AudioRingBuffer
+
+import numpy
+
+SAMPLE_RATE = 16000
+# sounddevice hands us roughly this many frames per callback with latency=1.0
+BLOCK_FRAMES = 1024
+TICK_S = 2
+MAX_BUFFERED_S = 60
+REPEATS = 5
+
+
+def ticks():
+    """Blocks arriving per tick, for enough ticks to reach MAX_BUFFERED_S"""
+    rng = numpy.random.default_rng(0)
+    blocks_per_tick = TICK_S * SAMPLE_RATE // BLOCK_FRAMES
+    for _ in range(MAX_BUFFERED_S // TICK_S):
+        yield [rng.standard_normal((BLOCK_FRAMES, 1), dtype=numpy.float32) for _ in range(blocks_per_tick)]
+
+
+def bench_concatenate():
+    audio_data = None
+    for blocks in ticks():
+        start = time.perf_counter()
+        for _ in range(REPEATS):
+            data = audio_data
+            for indata in blocks:
+                data = indata if data is None else numpy.concatenate((data, indata), dtype="float32")
+            flattened = data.copy().flatten()
+        elapsed = (time.perf_counter() - start) / REPEATS
+        audio_data = data
+        yield len(flattened), elapsed
+
+
+def bench_ring():
+    audio = AudioRingBuffer(MAX_BUFFERED_S * SAMPLE_RATE + TICK_S * SAMPLE_RATE)
+    for blocks in ticks():
+        start = time.perf_counter()
+        for i in range(REPEATS):
+            start_sample, end_sample = audio.start_sample, audio.end_sample
+            for indata in blocks:
+                audio.append(indata)
+            flattened = audio.view()
+            if i + 1 < REPEATS:
+                # Drop as much as the tick added from the front, so every repeat sees as much audio buffered
+                audio.cut_to(start_sample + audio.end_sample - end_sample)
+        elapsed = (time.perf_counter() - start) / REPEATS
+        yield len(flattened), elapsed
+
+
+def main():
+    print(f"{'buffered (s)':>12} {'concatenate (ms)':>17} {'ring buffer (ms)':>17}")
+    for (n, old), (_, new) in zip(bench_concatenate(), bench_ring()):
+        print(f"{n / SAMPLE_RATE:12.1f} {old * 1000:17.3f} {new * 1000:17.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3.9
+# Benchmark for transcript censoring: throughput of the precompiled
+# ProfanityFilter against better_profanity's profanity.censor on a large
+# block of text, and the cost of censoring streaming text incrementally.
+
+from pathlib import Path
+import random
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from better_profanity import profanity
+from util import create_filter
+
+# Size of the text block to censor
+TEXT_WORDS = 20_000
+# profanity.censor costs milliseconds a word, so it only gets the start of the text
+BASELINE_WORDS = 2_000
+# One in this many words comes from the censor list
+PROFANE_EVERY = 50
+
+WORDS = "the stream chat is going to love this new map so let's try and beat the boss again".split()
+
+
+def build_text(rng: random.Random, censored_words) -> str:
+    return " ".join(
+        rng.choice(censored_words) if rng.randrange(PROFANE_EVERY) == 0 else rng.choice(WORDS)
+        for _ in range(TEXT_WORDS)
+    )
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    matcher = create_filter()
+    censored_words = [str(word) for word in profanity.CENSOR_WORDSET]
+    rng = random.Random(0)
+    text = build_text(rng, censored_words)
+    size_mb = len(text.encode("utf-8")) / 1e6
+
+    baseline_text = " ".join(text.split()[:BASELINE_WORDS])
+    baseline_mb = len(baseline_text.encode("utf-8")) / 1e6
+
+    _, ours = timed(matcher.censor, text)
+    _, theirs = timed(profanity.censor, baseline_text)
+    print(f"Text: {TEXT_WORDS} words, {size_mb:.2f}MB")
+    print(f"ProfanityFilter.censor: {ours:.3f}s for {TEXT_WORDS} words ({ours / TEXT_WORDS * 1e6:.2f}us/word, {size_mb / ours:.1f}MB/s)")
+    print(
+        f"profanity.censor:       {theirs:.3f}s for {BASELINE_WORDS} words "
+        f"({theirs / BASELINE_WORDS * 1e6:.2f}us/word, {baseline_mb / theirs:.3f}MB/s)"
+    )
+
+    # A stream hypothesis that grows a word at a time, like the engine's `stream` messages
+    words = text.split()[:500]
+    full_s = incremental_s = 0.0
+    previous = previous_censored = ""
+    for i in range(1, len(words) + 1):
+        hypothesis = " ".join(words[:i])
+        _, elapsed = timed(matcher.censor, hypothesis)
+        full_s += elapsed
+        previous_censored, elapsed = timed(matcher.censor_update, previous, previous_censored, hypothesis)
+        incremental_s += elapsed
+        previous = hypothesis
+    print(f"Streaming updates ({len(words)}): full rescan {full_s * 1000:.1f}ms, incremental {incremental_s * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
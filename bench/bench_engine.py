@@ -0,0 +1,149 @@
+#!/usr/bin/env python3.9
+# Benchmark for the whole transcription engine: plays a recording through
+# the exact same tick, cut and commit logic as a live stream (optionally
+# faster than real time) and reports speed, latency and accuracy.
+#
+# Usage: python3 bench/bench_engine.py recording.wav [--reference transcript.txt] [--paced] [--int8] [--policy all] [--profile whisper]
+
+from pathlib import Path
+from typing import Optional
+import argparse
+import queue
+import re
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_source import FileSource
+from batch_transcribe import DECODE_PROFILES
+
+import transcription_engine
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, round(p / 100 * (len(values) - 1)))]
+
+
+def normalize_words(text: str):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    if not ref:
+        return float(len(hyp) > 0)
+    # Word-level Levenshtein distance, one row at a time
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        prev_diag, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, 1):
+            cur = min(row[j] + 1, row[j - 1] + 1, prev_diag + (ref_word != hyp_word))
+            prev_diag, row[j] = row[j], cur
+    return row[-1] / len(ref)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the transcription engine over a recording and measure it")
+    parser.add_argument("file", help="recording to transcribe (WAV, FLAC, ...)")
+    parser.add_argument("--reference", help="text file with the reference transcript, to compute WER")
+    parser.add_argument("--paced", action="store_true", help="play back in real time instead of as fast as possible")
+    parser.add_argument("--model", help=f"whisper model (default {transcription_engine.MODEL_ID})")
+    parser.add_argument(
+        "--profile",
+        choices=tuple(DECODE_PROFILES),
+        help=f"decode profile (default {transcription_engine.DECODE_PROFILE})",
+    )
+    parser.add_argument("--int8", action="store_true", help="use the int8 quantized CPU model")
+    parser.add_argument("--window-s", type=float, help=f"WINDOW_S (default {transcription_engine.WINDOW_S})")
+    parser.add_argument(
+        "--max-segment-s", type=float, help=f"MAX_SEGMENT_LENGTH_S (default {transcription_engine.MAX_SEGMENT_LENGTH_S})"
+    )
+    parser.add_argument(
+        "--policy",
+        choices=(*transcription_engine.COMMIT_POLICIES, "all"),
+        default=transcription_engine.COMMIT_POLICY,
+        help="commit policy, or all of them one after another to compare",
+    )
+    args = parser.parse_args()
+
+    if args.model is not None:
+        transcription_engine.MODEL_ID = args.model
+    if args.int8:
+        transcription_engine.MODEL_INT8 = True
+    if args.profile is not None:
+        transcription_engine.DECODE_PROFILE = args.profile
+    if args.window_s is not None:
+        transcription_engine.WINDOW_S = args.window_s
+    if args.max_segment_s is not None:
+        transcription_engine.MAX_SEGMENT_LENGTH_S = args.max_segment_s
+
+    policies = transcription_engine.COMMIT_POLICIES if args.policy == "all" else (args.policy,)
+    reference = Path(args.reference).read_text() if args.reference else None
+    for policy in policies:
+        transcription_engine.COMMIT_POLICY = policy
+        if len(policies) > 1:
+            print(f"== {policy} ==")
+        run(args.file, args.paced, reference)
+
+
+def run(path: str, paced: bool, reference: Optional[str]):
+    source = FileSource(path, paced=paced)
+    log_queue = queue.Queue()
+    ticks = []
+
+    wall_start = time.time()
+    transcription_engine.start(log_queue, sources={"file": source}, on_tick=ticks.append)
+    wall_s = time.time() - wall_start
+
+    committed = []
+    while not log_queue.empty():
+        obj = log_queue.get()
+        if "log" in obj:
+            committed.append(obj["log"])
+    hypothesis = " ".join(committed)
+
+    duration_s = source.duration_s
+    inference_ticks = [tick for tick in ticks if tick["inference_s"] is not None]
+    inference_s = sum(tick["inference_s"] for tick in inference_ticks)
+    tick_latencies = [tick["tick_s"] for tick in inference_ticks]
+    tick_cpu = [tick["cpu_s"] for tick in inference_ticks]
+    windows = sum(tick["windows"] for tick in inference_ticks)
+    window_s = sum(tick["window_s"] for tick in inference_ticks)
+    commit_latencies = [
+        tick["clock"] - source.started_at + tick["tick_s"] - commit["end_s"] for tick in ticks for commit in tick["commits"]
+    ]
+
+    print(f"Audio: {duration_s:.1f}s, wall time: {wall_s:.1f}s ({wall_s / duration_s:.3f}x real time)")
+    print(f"Ticks: {len(ticks)} ({len(tick_latencies)} ran inference)")
+    print(f"Real-time factor (inference only): {inference_s / duration_s:.3f}")
+    print(
+        f"Window length: mean {window_s / max(windows, 1):.2f}s, max "
+        f"{max((tick['window_s'] for tick in inference_ticks), default=0.0):.2f}s"
+    )
+    print(
+        "Tick latency: "
+        + ", ".join(f"p{p} {percentile(tick_latencies, p) * 1000:.0f}ms" for p in (50, 90, 99))
+    )
+    print(
+        f"Decode attempts: {sum(tick['decode_attempts'] for tick in inference_ticks)}, "
+        f"fallbacks: {sum(tick['fallbacks'] for tick in inference_ticks)}, "
+        f"ticks over budget: {sum(tick['over_budget'] for tick in inference_ticks)}"
+    )
+    print(
+        "CPU per tick: "
+        + ", ".join(f"p{p} {percentile(tick_cpu, p) * 1000:.0f}ms" for p in (50, 90, 99))
+    )
+    print(
+        f"Time to commit ({len(commit_latencies)} segments): "
+        + ", ".join(f"p{p} {percentile(commit_latencies, p):.2f}s" for p in (50, 90, 99))
+    )
+    if reference is not None:
+        print(f"WER: {word_error_rate(reference, hypothesis) * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3.9
+# Benchmark for model startup and the int8 CPU variant: how long loading
+# and warm-up take from a cold and a warm cache, how slow the first
+# transcription is with and without warm-up, and speed and accuracy of
+# fp32 against int8 on a recording.
+#
+# Usage: python3 bench/bench_model.py recording.wav [--reference transcript.txt] [--model base.en]
+
+from pathlib import Path
+import argparse
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_engine import word_error_rate
+from model_loader import load_model, warm_up
+from transcription_engine import MODEL_ID, NO_SPEECH_THRESHOLD, silenced_stderr
+from whisper.audio import SAMPLE_RATE, load_audio
+
+# How much of the recording the first-transcription measurement uses, about one engine window
+FIRST_WINDOW_S = 5
+
+
+def transcribe(model, audio) -> str:
+    with silenced_stderr():
+        tscript = model.transcribe(audio, fp16=False, no_speech_threshold=NO_SPEECH_THRESHOLD, condition_on_previous_text=False)
+    return tscript["text"]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def bench_variant(model_id: str, int8: bool, cache_dir: Path, audio) -> dict:
+    # Cold: nothing cached yet (for int8 that means converting), first transcription without warm-up
+    model, cold_load_s = timed(load_model, model_id, int8, cache_dir)
+    _, cold_first_s = timed(transcribe, model, audio[: FIRST_WINDOW_S * SAMPLE_RATE])
+    del model
+
+    # Warm: loaded again (from the int8 cache, if any) and warmed up like the engine does
+    model, warm_load_s = timed(load_model, model_id, int8, cache_dir)
+    _, warmup_s = timed(warm_up, model)
+    _, warm_first_s = timed(transcribe, model, audio[: FIRST_WINDOW_S * SAMPLE_RATE])
+
+    text, full_s = timed(transcribe, model, audio)
+    return {
+        "cold_load_s": cold_load_s,
+        "cold_first_s": cold_first_s,
+        "warm_load_s": warm_load_s,
+        "warmup_s": warmup_s,
+        "warm_first_s": warm_first_s,
+        "rtf": full_s / (len(audio) / SAMPLE_RATE),
+        "text": text,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure model startup and fp32 vs int8 inference")
+    parser.add_argument("file", help="recording to transcribe")
+    parser.add_argument("--reference", help="text file with the reference transcript, to compute WER")
+    parser.add_argument("--model", default=MODEL_ID, help=f"whisper model (default {MODEL_ID})")
+    args = parser.parse_args()
+
+    audio = load_audio(args.file)
+    reference = Path(args.reference).read_text() if args.reference else None
+
+    # A fresh cache directory, so the first int8 load really converts
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results = {
+            "fp32": bench_variant(args.model, False, Path(cache_dir), audio),
+            "int8": bench_variant(args.model, True, Path(cache_dir), audio),
+        }
+
+    print(f"Audio: {len(audio) / SAMPLE_RATE:.1f}s, model: {args.model}")
+    print("(fp32 'cold' loads can still come from the OS page cache)")
+    header = f"{'':6}{'cold load':>11}{'1st tx':>9}{'warm load':>11}{'warm-up':>9}{'1st tx':>9}{'RTF':>8}"
+    print(header + ("" if reference is None else f"{'WER':>8}"))
+    for name, r in results.items():
+        line = (
+            f"{name:6}{r['cold_load_s']:10.2f}s{r['cold_first_s']:8.2f}s{r['warm_load_s']:10.2f}s"
+            f"{r['warmup_s']:8.2f}s{r['warm_first_s']:8.2f}s{r['rtf']:8.3f}"
+        )
+        if reference is not None:
+            line += f"{word_error_rate(reference, r['text']) * 100:7.1f}%"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3.9
+# Benchmark and check for the Linux now-playing backend against a fake MPRIS
+# player on a private D-Bus session bus: whether snapshots follow track,
+# playback state, seek and late artwork changes, how long change events take
+# to arrive compared to the 0.5s poll, and CPU while nothing plays.
+#
+# Needs dbus-daemon and dbus-next.
+# Usage: python3 bench/bench_mpris.py [--rounds 20] [--idle 5]
+
+from pathlib import Path
+import argparse
+import asyncio
+import os
+import queue
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import nowplaying
+from nowplaying import MPRIS_PATH, MPRIS_PLAYER_INTERFACE, MPRIS_PREFIX, PLAYBACK_CHANGED, SEEKED, TRACK_CHANGED
+
+PLAYER_NAME = MPRIS_PREFIX + "fake"
+# Length of every fake track
+TRACK_LENGTH_US = 180_000_000
+# How long to wait for an event before calling it lost
+EVENT_TIMEOUT_S = 2
+
+
+def run_player():
+    """The fake player: applies commands from stdin ("track N", "art N", "play", "pause", "seek US") and signals them"""
+    from dbus_next import PropertyAccess, Variant
+    from dbus_next.aio import MessageBus
+    from dbus_next.service import ServiceInterface, dbus_property, signal
+
+    class FakePlayer(ServiceInterface):
+        def __init__(self) -> None:
+            super().__init__(MPRIS_PLAYER_INTERFACE)
+            self.metadata = {}
+            self.status = "Stopped"
+            self.position = 0
+
+        @dbus_property(access=PropertyAccess.READ)
+        def Metadata(self) -> "a{sv}":
+            return self.metadata
+
+        @dbus_property(access=PropertyAccess.READ)
+        def PlaybackStatus(self) -> "s":
+            return self.status
+
+        @dbus_property(access=PropertyAccess.READ)
+        def Position(self) -> "x":
+            return self.position
+
+        @dbus_property(access=PropertyAccess.READ)
+        def Rate(self) -> "d":
+            return 1.0
+
+        @signal()
+        def Seeked(self, position) -> "x":
+            return position
+
+    async def serve():
+        bus = await MessageBus().connect()
+        player = FakePlayer()
+        bus.export(MPRIS_PATH, player)
+        await bus.request_name(PLAYER_NAME)
+        print("ready", flush=True)
+
+        loop = asyncio.get_running_loop()
+        while True:
+            line = await loop.run_in_executor(None, sys.stdin.readline)
+            if not line:
+                break
+            command, *args = line.split()
+            if command == "track":
+                player.metadata = {
+                    "mpris:trackid": Variant("o", f"/fake/track/{args[0]}"),
+                    "mpris:length": Variant("x", TRACK_LENGTH_US),
+                    "xesam:title": Variant("s", f"Song {args[0]}"),
+                    "xesam:artist": Variant("as", ["Artist"]),
+                    "xesam:album": Variant("s", "Album"),
+                }
+                player.position = 0
+                player.emit_properties_changed({"Metadata": player.metadata})
+            elif command == "art":
+                # Like many players, the art URL follows in a signal of its own
+                player.metadata = {**player.metadata, "mpris:artUrl": Variant("s", f"file:///tmp/fake-art-{args[0]}.png")}
+                player.emit_properties_changed({"Metadata": player.metadata})
+            elif command in ("play", "pause"):
+                player.status = "Playing" if command == "play" else "Paused"
+                player.emit_properties_changed({"PlaybackStatus": player.status})
+            elif command == "seek":
+                player.position = int(args[0])
+                player.Seeked(player.position)
+
+    asyncio.run(serve())
+
+
+class Harness:
+    def __init__(self) -> None:
+        self.daemon = subprocess.Popen(
+            ["dbus-daemon", "--session", "--nofork", "--print-address=1"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        )
+        os.environ["DBUS_SESSION_BUS_ADDRESS"] = self.daemon.stdout.readline().strip()
+        self.player = subprocess.Popen(
+            [sys.executable, __file__, "--player"], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        assert self.player.stdout.readline().strip() == "ready"
+        self.events = queue.Queue()
+        self.info = nowplaying.MediaInfoImplLinux()
+        assert self.info.subscribe(lambda event: self.events.put((event, time.perf_counter())))
+
+    def send(self, command: str) -> float:
+        """Sends a player command, and returns how long until the matching event arrived"""
+        expected = {"track": TRACK_CHANGED, "art": TRACK_CHANGED, "play": PLAYBACK_CHANGED, "pause": PLAYBACK_CHANGED, "seek": SEEKED}[command.split()[0]]
+        sent = time.perf_counter()
+        self.player.stdin.write(command + "\n")
+        self.player.stdin.flush()
+        deadline = sent + EVENT_TIMEOUT_S
+        while True:
+            event, received = self.events.get(timeout=max(0.0, deadline - time.perf_counter()))
+            if event == expected:
+                return received - sent
+
+    def close(self):
+        self.player.stdin.close()
+        self.player.wait()
+        self.daemon.terminate()
+        self.daemon.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and measure the MPRIS now-playing backend against a fake player")
+    parser.add_argument("--rounds", type=int, default=20, help="track changes to measure (default 20)")
+    parser.add_argument("--idle", type=float, default=5, help="seconds to measure idle CPU over (default 5)")
+    parser.add_argument("--player", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.player:
+        return run_player()
+
+    harness = Harness()
+    try:
+        latencies = {TRACK_CHANGED: [], PLAYBACK_CHANGED: [], SEEKED: []}
+        for i in range(args.rounds):
+            latencies[TRACK_CHANGED].append(harness.send(f"track {i}"))
+            assert harness.info.snapshot().artwork_id is None
+            latencies[TRACK_CHANGED].append(harness.send(f"art {i}"))
+            assert harness.info.snapshot().artwork_id == f"file:///tmp/fake-art-{i}.png"
+            latencies[PLAYBACK_CHANGED].append(harness.send("play"))
+            snapshot = harness.info.snapshot()
+            assert snapshot.title == f"Song {i}" and snapshot.playing, snapshot
+            latencies[SEEKED].append(harness.send(f"seek {TRACK_LENGTH_US // 2}"))
+            assert abs(harness.info.snapshot().progress - 0.5) < 0.01
+            latencies[PLAYBACK_CHANGED].append(harness.send("pause"))
+            assert harness.info.snapshot().playing is False
+        print(f"Snapshots followed {args.rounds} track, late artwork, playback and seek changes")
+
+        print(f"{'event':10}{'mean':>10}{'max':>10}")
+        for event, values in latencies.items():
+            print(f"{event:10}{statistics.mean(values) * 1000:8.2f}ms{max(values) * 1000:8.2f}ms")
+        print(f"{'poll':10}{nowplaying.POLL_INTERVAL_S / 2 * 1000:8.2f}ms{nowplaying.POLL_INTERVAL_S * 1000:8.2f}ms")
+
+        # Paused: subscribed, the poll loop sleeps until an event or the resync; polling, it reads every tick
+        for name, interval in (("subscribed", min(args.idle, nowplaying.RESYNC_INTERVAL_S)), ("polling", nowplaying.POLL_INTERVAL_S)):
+            cpu_start = time.process_time()
+            end = time.monotonic() + args.idle
+            wakeups = 0
+            while time.monotonic() < end:
+                time.sleep(min(interval, max(0.0, end - time.monotonic())))
+                harness.info.snapshot()
+                wakeups += 1
+            cpu_s = time.process_time() - cpu_start
+            print(f"idle {name:12}{wakeups:4} wakeups, CPU {cpu_s / args.idle * 100:.3f}%")
+    finally:
+        harness.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3.9
+# Benchmark for now-playing polling: backend round trips (nowplaying-cli
+# spawns on macOS) and CPU per tick when reading every field on its own and
+# the artwork every tick, like the poll loop used to, against one `snapshot`
+# per tick with the artwork fetched only when the track changes. The backend
+# is a fake nowplaying-cli, so this runs anywhere and the numbers exclude
+# the real process spawn cost (a few ms each on macOS).
+#
+# Usage: python3 bench/bench_nowplaying.py [--ticks 2000] [--track-ticks 360]
+
+from io import BytesIO
+from pathlib import Path
+from subprocess import PIPE
+from types import SimpleNamespace
+import argparse
+import base64
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import nowplaying
+from nowplaying import MediaInfoImplMacOS
+from PIL import Image
+
+# Size of the fake cover art; real players hand out a few hundred pixels square
+ARTWORK_SIZE = 600
+
+
+class FakeNowPlayingCli:
+    """Stands in for `subprocess.run` with a player whose track changes every `track_ticks` reads"""
+
+    def __init__(self, track_ticks: int) -> None:
+        self.track_ticks = track_ticks
+        self.spawns = 0
+        self.tick = 0
+        image = Image.effect_noise((ARTWORK_SIZE, ARTWORK_SIZE), 64).convert("RGB")
+        png = BytesIO()
+        image.save(png, format="PNG")
+        self.artwork = base64.encodebytes(png.getvalue()).decode()
+
+    def value(self, field: str) -> str:
+        track = self.tick // self.track_ticks
+        return {
+            "title": f"Song {track}",
+            "artist": "Artist",
+            "album": f"Album {track // 10}",
+            "duration": "180.0",
+            "elapsedTime": str((self.tick % self.track_ticks) * 0.5),
+            "playbackRate": "1.0",
+            "artworkData": self.artwork,
+        }[field]
+
+    def __call__(self, args, stdout=None):
+        self.spawns += 1
+        fields = args[2:]
+        return SimpleNamespace(stdout=("\n".join(self.value(field) for field in fields) + "\n").encode())
+
+
+def cli_get(field: str) -> str:
+    return nowplaying.run(["nowplaying-cli", "get", field], stdout=PIPE).stdout.decode().strip()
+
+
+def poll_properties(info, last_key):
+    # What the loop did before `snapshot`: one call per field, position and
+    # duration separately, and the artwork fetched and opened every tick
+    key = (cli_get("title"), cli_get("artist"), cli_get("album"))
+    duration = cli_get("duration")
+    elapsed = cli_get("elapsedTime")
+    progress = None if duration == "null" or elapsed == "null" else float(elapsed) / float(duration)
+    artwork_b64 = cli_get("artworkData").encode()
+    artwork = None if artwork_b64 == b"null" else Image.open(BytesIO(base64.decodebytes(artwork_b64)))
+    # Only saved when the track changed
+    return key, progress, artwork if key != last_key else None
+
+
+def poll_snapshot(info, last_key):
+    snapshot = info.snapshot()
+    artwork = info.artwork if snapshot.track_key != last_key else None
+    return snapshot.track_key, snapshot.progress, artwork
+
+
+def run(poll, ticks: int, track_ticks: int) -> dict:
+    fake = FakeNowPlayingCli(track_ticks)
+    nowplaying.run = fake
+    info = MediaInfoImplMacOS()
+
+    last_key = None
+    cpu_start = time.process_time()
+    for tick in range(ticks):
+        fake.tick = tick
+        last_key, _, artwork = poll(info, last_key)
+        if artwork is not None:
+            # What saving it would need anyway
+            artwork.load()
+    cpu_s = time.process_time() - cpu_start
+    return {"spawns": fake.spawns / ticks, "cpu_ms": cpu_s / ticks * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure now-playing backend round trips and CPU per poll tick")
+    parser.add_argument("--ticks", type=int, default=2000, help="poll ticks to run (default 2000)")
+    parser.add_argument("--track-ticks", type=int, default=360, help="ticks per track, 3 minutes at 0.5s (default 360)")
+    args = parser.parse_args()
+
+    print(f"{args.ticks} ticks, track changes every {args.track_ticks} ticks, {ARTWORK_SIZE}px artwork")
+    print(f"{'':12}{'spawns/tick':>13}{'CPU/tick':>12}")
+    for name, poll in (("properties", poll_properties), ("snapshot", poll_snapshot)):
+        r = run(poll, args.ticks, args.track_ticks)
+        print(f"{name:12}{r['spawns']:13.2f}{r['cpu_ms']:10.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3.9
+# Benchmark for now-playing outputs: filesystem syscalls per hour while one
+# track plays unchanged, writing every text file every tick like the poll
+# loop used to, against staging everything and flushing only what changed.
+# Counts opens, renames and links by wrapping them, and write(2) calls from
+# /proc/self/io where there is one.
+#
+# Usage: python3 bench/bench_outputs.py [--hours 1]
+
+from pathlib import Path
+import argparse
+import io
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from outputs import FileSink, MemorySink, Outputs
+from progress_bar import ProgressBar
+
+# Poll interval of the now-playing loop
+TICK_S = 0.5
+
+
+class SyscallCounter:
+    def __init__(self) -> None:
+        self.counts = {"open": 0, "rename": 0, "link": 0}
+
+    def __enter__(self) -> "SyscallCounter":
+        self._open, self._replace, self._link = io.open, os.replace, os.link
+
+        def counted(name, fn):
+            def wrapper(*args, **kwargs):
+                self.counts[name] += 1
+                return fn(*args, **kwargs)
+
+            return wrapper
+
+        io.open = counted("open", self._open)
+        os.replace = counted("rename", self._replace)
+        os.link = counted("link", self._link)
+        self._writes = self.write_syscalls()
+        return self
+
+    def __exit__(self, *_):
+        io.open, os.replace, os.link = self._open, self._replace, self._link
+        writes = self.write_syscalls()
+        if writes is not None:
+            self.counts["write"] = writes - self._writes
+
+    @staticmethod
+    def write_syscalls():
+        try:
+            for line in Path("/proc/self/io").read_text().splitlines():
+                if line.startswith("syscw:"):
+                    return int(line.split()[1])
+        except OSError:
+            return None
+
+
+def play(directory: Path, ticks: int, write_every_tick: bool):
+    """One track, `ticks` long, with the progress bar moving across it"""
+    title, artist, album = "Song".encode(), "Artist".encode(), "Album".encode()
+    progress_bar = ProgressBar()
+    outputs = Outputs(FileSink(directory), MemorySink())
+    for tick in range(ticks):
+        progress_changed = progress_bar.update(tick / ticks)
+        if write_every_tick:
+            directory.joinpath("title.txt").write_bytes(title)
+            directory.joinpath("artist.txt").write_bytes(artist)
+            directory.joinpath("album.txt").write_bytes(album)
+            if progress_changed:
+                directory.joinpath("progress.png").write_bytes(progress_bar.png)
+            continue
+        outputs.stage("title.txt", title)
+        outputs.stage("artist.txt", artist)
+        outputs.stage("album.txt", album)
+        if progress_changed:
+            outputs.stage("progress.png", progress_bar.png)
+        outputs.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count now-playing output syscalls while a track plays")
+    parser.add_argument("--hours", type=float, default=1, help="how long the track plays (default 1)")
+    args = parser.parse_args()
+    ticks = int(args.hours * 3600 / TICK_S)
+
+    print(f"One {args.hours:g}h track, {ticks} ticks, per hour:")
+    for name, write_every_tick in (("every tick", True), ("staged", False)):
+        with tempfile.TemporaryDirectory() as directory, SyscallCounter() as counter:
+            play(Path(directory), ticks, write_every_tick)
+        counts = {syscall: count / args.hours for syscall, count in counter.counts.items()}
+        print(f"  {name:12}" + "".join(f"{count:9.0f} {syscall}" for syscall, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
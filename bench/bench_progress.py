@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.9
+# Micro-benchmark for the now-playing progress bar: drawing one frame with
+# the old per-pixel loops against the vectorized renderer, and how many
+# frames each encodes over a track polled every 0.5s.
+#
+# Usage: python3 bench/bench_progress.py [--width 200] [--height 10] [--track 180]
+
+from io import BytesIO
+from pathlib import Path
+import argparse
+import sys
+import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy
+from PIL import Image
+from progress_bar import ProgressBar, ProgressStyle, filled_pixels, render, render_png
+
+# Poll interval of the now-playing loop
+TICK_S = 0.5
+
+
+def old_progress_as_image(progress: float, width=200, height=10) -> Image:
+    # What MediaInfo.progress_as_image used to do
+    progress = round(progress * width)
+    progressImg = Image.new("RGBA", (width, height))
+    for y in range(progressImg.height):
+        for i in range(progress):
+            progressImg.putpixel((i, y), (255, 255, 255, 255))
+        for i in range(progress + 1, progressImg.width):
+            progressImg.putpixel((i, y), (0, 0, 0, 0))
+
+    return progressImg
+
+
+def old_png(progress: float, width: int, height: int) -> bytes:
+    png = BytesIO()
+    old_progress_as_image(progress, width, height).save(png, format="PNG")
+    return png.getvalue()
+
+
+def per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the old and vectorized progress bar renderers")
+    parser.add_argument("--width", type=int, default=200)
+    parser.add_argument("--height", type=int, default=10)
+    parser.add_argument("--track", type=float, default=180, help="track length in seconds (default 180)")
+    args = parser.parse_args()
+    style = ProgressStyle(width=args.width, height=args.height)
+
+    for progress in numpy.linspace(0, 1, 101):
+        old = numpy.asarray(old_progress_as_image(progress, args.width, args.height))
+        new = numpy.asarray(render(filled_pixels(progress, args.width), style))
+        assert (old == new).all(), progress
+
+    progress = 0.437
+    filled = filled_pixels(progress, args.width)
+    print(f"{args.width}x{args.height} bar, one frame:")
+    print(f"  old draw        {per_call_us(lambda: old_progress_as_image(progress, args.width, args.height), 20):10.1f}us")
+    print(f"  new draw        {per_call_us(lambda: render(filled, style), 500):10.1f}us")
+    print(f"  old draw + PNG  {per_call_us(lambda: old_png(progress, args.width, args.height), 20):10.1f}us")
+    print(f"  new draw + PNG  {per_call_us(lambda: render_png.__wrapped__(filled, style), 500):10.1f}us")
+    print(f"  new, cached     {per_call_us(lambda: render_png(filled, style), 5000):10.1f}us")
+
+    # A whole track, with progress moving every tick like a real player's
+    ticks = [i * TICK_S / args.track for i in range(int(args.track / TICK_S) + 1)]
+
+    def old_track():
+        last, encodes = None, 0
+        for p in ticks:
+            if p != last:
+                last = p
+                old_png(p, args.width, args.height)
+                encodes += 1
+        return encodes
+
+    def new_track():
+        render_png.cache_clear()
+        bar, encodes = ProgressBar(style), 0
+        for p in ticks:
+            if bar.update(p):
+                bar.png
+                encodes += 1
+        return encodes
+
+    print(f"{args.track:.0f}s track, {len(ticks)} ticks:")
+    for name, fn in (("old", old_track), ("new", new_track)):
+        writes = fn()
+        total_ms = min(timeit.repeat(fn, number=1, repeat=3)) * 1000
+        print(f"  {name:4}{writes:6} writes{total_ms:10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
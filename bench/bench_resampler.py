@@ -0,0 +1,99 @@
+#!/usr/bin/env python3.9
+# Benchmark for capture resampling: throughput of the polyphase resampler
+# in capture-sized blocks and on whole recordings against the linear
+# interpolation FileSource used to do, how well each keeps audio above
+# 8 kHz from aliasing into what whisper hears, and the capture latency the
+# low-latency native-rate mode saves over the old 1 second input buffer.
+#
+# Usage: python3 bench/bench_resampler.py [--device NAME]
+
+from pathlib import Path
+import argparse
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy
+from audio_source import CAPTURE_BLOCK_S
+from resampler import PolyphaseResampler, resample
+from whisper.audio import SAMPLE_RATE
+
+# Seconds of audio each throughput measurement runs on
+AUDIO_S = 60
+# Latency the engine used to ask sounddevice for
+OLD_LATENCY_S = 1.0
+
+
+def resample_linear(audio: numpy.ndarray, from_rate: float, to_rate: float) -> numpy.ndarray:
+    # What FileSource used to do
+    if from_rate == to_rate:
+        return numpy.ascontiguousarray(audio, dtype=numpy.float32)
+    n = int(len(audio) * to_rate / from_rate)
+    positions = numpy.arange(n) * (from_rate / to_rate)
+    return numpy.interp(positions, numpy.arange(len(audio)), audio).astype(numpy.float32)
+
+
+def tone(frequency: float, rate: int, seconds: float) -> numpy.ndarray:
+    return numpy.sin(2 * numpy.pi * frequency * numpy.arange(int(rate * seconds)) / rate).astype(numpy.float32)
+
+
+def level_db(audio: numpy.ndarray) -> float:
+    # Relative to a full-scale sine, skipping the edges
+    middle = audio[len(audio) // 10 : -len(audio) // 10]
+    return 20 * numpy.log10(max(numpy.sqrt(numpy.mean(middle**2)) / numpy.sqrt(0.5), 1e-12))
+
+
+def speed(fn, audio_s: float) -> float:
+    """Seconds of audio processed per second"""
+    start = time.perf_counter()
+    fn()
+    return audio_s / (time.perf_counter() - start)
+
+
+def streamed(audio: numpy.ndarray, rate: int) -> numpy.ndarray:
+    resampler = PolyphaseResampler(rate, SAMPLE_RATE)
+    block = int(rate * CAPTURE_BLOCK_S)
+    return numpy.concatenate([resampler.process(audio[i : i + block]) for i in range(0, len(audio), block)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure capture resampling speed, quality and latency")
+    parser.add_argument("--device", help="input device to read latencies from (default: the default input)")
+    args = parser.parse_args()
+
+    print(f"{'rate':>7}{'polyphase, blocks':>20}{'polyphase, whole':>18}{'linear, whole':>15}{'alias p/l':>14}{'1 kHz p/l':>14}")
+    for rate in (44100, 48000):
+        noise = numpy.random.default_rng(0).normal(0, 0.1, rate * AUDIO_S).astype(numpy.float32)
+        blocks_x = speed(lambda: streamed(noise, rate), AUDIO_S)
+        whole_x = speed(lambda: resample(noise, rate, SAMPLE_RATE), AUDIO_S)
+        linear_x = speed(lambda: resample_linear(noise, rate, SAMPLE_RATE), AUDIO_S)
+        # A tone whisper can't represent should vanish, not fold down to 16 kHz - 11 kHz = 5 kHz
+        alias = tone(11000, rate, 2)
+        passband = tone(1000, rate, 2)
+        print(
+            f"{rate:7}{blocks_x:18.0f}x{whole_x:16.0f}x{linear_x:13.0f}x"
+            f"{level_db(resample(alias, rate, SAMPLE_RATE)):7.0f}/{level_db(resample_linear(alias, rate, SAMPLE_RATE)):.0f}dB"
+            f"{level_db(resample(passband, rate, SAMPLE_RATE)):7.2f}/{level_db(resample_linear(passband, rate, SAMPLE_RATE)):.2f}dB"
+        )
+
+    resampler_s = PolyphaseResampler(48000, SAMPLE_RATE).delay_s
+    try:
+        import sounddevice
+
+        low_latency_s = sounddevice.query_devices(args.device, "input")["default_low_input_latency"]
+        device = f"device low latency {low_latency_s * 1000:.0f}ms"
+    except Exception as e:
+        low_latency_s = 0.0
+        device = f"device latency unknown ({type(e).__name__}), not included"
+    new_s = low_latency_s + CAPTURE_BLOCK_S + resampler_s
+    print(f"Capture latency before the engine sees audio, {device}:")
+    print(f"  old: up to {OLD_LATENCY_S * 1000:.0f}ms input buffer at 16 kHz, resampled by the driver")
+    print(
+        f"  new: {new_s * 1000:.1f}ms ({CAPTURE_BLOCK_S * 1000:.0f}ms blocks + {resampler_s * 1000:.1f}ms resampler delay), "
+        f"saving up to {(OLD_LATENCY_S - new_s) * 1000:.0f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
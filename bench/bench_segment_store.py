@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.9
+# Benchmark for the transcript store: replays a synthetic 8-hour
+# transcript into the old string log and into SegmentStore, polling it
+# the way overlays do, and reports append cost and lock hold time.
+
+from pathlib import Path
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from segment_store import SegmentStore
+
+HOURS = 8
+# Roughly how often the engine commits a segment
+SEGMENT_EVERY_S = 3
+# How many /text polls we simulate per committed segment
+POLLS_PER_SEGMENT = 1
+# Report progress at these points through the replay
+CHECKPOINTS = (1, 2, 4, 8)
+
+WORDS = "the stream chat is going to love this new map so let's try and beat the boss again".split()
+
+
+def segments():
+    rng = random.Random(0)
+    for _ in range(HOURS * 3600 // SEGMENT_EVERY_S):
+        yield " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20)))
+
+
+def bench_string_log():
+    """What start_listener and do_GET used to do"""
+    lock = threading.Lock()
+    text_log = ""
+    append_s = hold_s = 0.0
+    for i, segment in enumerate(segments(), 1):
+        start = time.perf_counter()
+        with lock:
+            text_log += segment + "\n"
+        append_s += time.perf_counter() - start
+
+        for _ in range(POLLS_PER_SEGMENT):
+            start = time.perf_counter()
+            with lock:
+                body = bytes(text_log + "", "utf-8")
+            hold_s += time.perf_counter() - start
+        yield i, append_s, hold_s, len(body)
+
+
+def bench_segment_store(poll_gzip: bool):
+    lock = threading.Lock()
+    store = SegmentStore()
+    append_s = hold_s = 0.0
+    offset = 0
+    generation = store.generation
+    for i, segment in enumerate(segments(), 1):
+        start = time.perf_counter()
+        with lock:
+            store.append(segment)
+        append_s += time.perf_counter() - start
+
+        for _ in range(POLLS_PER_SEGMENT):
+            start = time.perf_counter()
+            with lock:
+                snapshot = store.snapshot(gzip=poll_gzip)
+            hold_s += time.perf_counter() - start
+            if poll_gzip:
+                body = snapshot.full_gzip()
+            else:
+                assert snapshot.generation == generation
+                body = snapshot.committed_since(offset) + snapshot.stream
+                offset = snapshot.size
+        yield i, append_s, hold_s, len(body)
+
+
+def report(name, results):
+    print(name)
+    per_hour = 3600 // SEGMENT_EVERY_S
+    checkpoints = {hours * per_hour for hours in CHECKPOINTS}
+    for i, append_s, hold_s, body_len in results:
+        if i in checkpoints:
+            polls = i * POLLS_PER_SEGMENT
+            print(
+                f"  {i // per_hour}h: total append {append_s * 1000:9.1f}ms, "
+                f"mean lock hold per poll {hold_s / polls * 1e6:8.2f}us, last body {body_len} bytes"
+            )
+
+
+def main():
+    report("string log, full reads", bench_string_log())
+    report("segment store, delta reads", bench_segment_store(poll_gzip=False))
+    report("segment store, full gzip reads", bench_segment_store(poll_gzip=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3.9
+# Measurement mode for the resource policy: runs the engine over a
+# recording at each torch thread count and reports the real-time factor
+# curve, to pick ENGINE_THREADS for a machine from data. Run it while
+# whatever else shares the machine (OBS) is busy, for numbers that hold live.
+#
+# Usage: python3 bench/bench_threads.py recording.wav [--threads 1,2,4,8] [--nice 5] [--cpus 0,1,2,3]
+
+from pathlib import Path
+import argparse
+import queue
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from audio_source import FileSource
+from bench_engine import percentile
+from resource_policy import CPU_COUNT, ProcessPolicy, apply, set_torch_threads
+
+import transcription_engine
+
+# A thread count counts as good enough within this much of the best real-time factor
+GOOD_ENOUGH = 1.1
+
+
+def measure(path: str) -> dict:
+    source = FileSource(path, paced=False)
+    ticks = []
+    wall_start = time.time()
+    transcription_engine.start(queue.Queue(), sources={"file": source}, on_tick=ticks.append)
+    wall_s = time.time() - wall_start
+
+    inference_ticks = [tick for tick in ticks if tick["inference_s"] is not None]
+    return {
+        "rtf": sum(tick["inference_s"] for tick in inference_ticks) / source.duration_s,
+        "wall_rtf": wall_s / source.duration_s,
+        "tick_p90_s": percentile([tick["tick_s"] for tick in inference_ticks], 90),
+        "cpu_s": sum(tick["cpu_s"] for tick in inference_ticks),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep torch thread counts and report the engine's real-time factor")
+    parser.add_argument("file", help="recording to transcribe")
+    default_threads = sorted({1, 2, 4, 8, CPU_COUNT} & set(range(1, CPU_COUNT + 1)))
+    parser.add_argument(
+        "--threads",
+        default=",".join(map(str, default_threads)),
+        help=f"thread counts to try (default {','.join(map(str, default_threads))})",
+    )
+    parser.add_argument("--nice", type=int, help="nice value to measure at, like the engine's policy")
+    parser.add_argument("--cpus", help="CPUs to pin to, e.g. 0,1,2,3")
+    parser.add_argument("--model", help=f"whisper model (default {transcription_engine.MODEL_ID})")
+    parser.add_argument("--int8", action="store_true", help="use the int8 quantized CPU model")
+    args = parser.parse_args()
+
+    if args.model is not None:
+        transcription_engine.MODEL_ID = args.model
+    if args.int8:
+        transcription_engine.MODEL_INT8 = True
+    cpus = None if args.cpus is None else tuple(int(cpu) for cpu in args.cpus.split(","))
+    apply("bench", ProcessPolicy(cpus=cpus, nice=args.nice))
+
+    results = {}
+    print(f"{'threads':>8}{'RTF':>8}{'wall RTF':>10}{'tick p90':>10}{'CPU':>9}")
+    for threads in (int(threads) for threads in args.threads.split(",")):
+        set_torch_threads(threads)
+        r = results[threads] = measure(args.file)
+        print(f"{threads:8}{r['rtf']:8.3f}{r['wall_rtf']:10.3f}{r['tick_p90_s'] * 1000:8.0f}ms{r['cpu_s']:8.1f}s")
+
+    best = min(r["rtf"] for r in results.values())
+    pick = min(threads for threads, r in results.items() if r["rtf"] <= best * GOOD_ENOUGH)
+    print(
+        f"Fewest threads within {(GOOD_ENOUGH - 1) * 100:.0f}% of the best RTF: {pick} per worker "
+        f"(ENGINE_THREADS in resource_policy.py is that times the number of WORKERS)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3.9
+# Benchmark for the voice-activity gate: replays recorded audio through
+# the VAD in capture-sized blocks, and reports how many inference windows
+# it would have skipped and how many words whisper finds in those windows.
+#
+# Usage: python3 bench/bench_vad.py [--no-whisper] recording.wav [...]
+
+from pathlib import Path
+import argparse
+import sys
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from transcription_engine import MODEL_ID, NO_SPEECH_THRESHOLD, silenced_stderr
+from vad import VoiceActivityDetector
+from whisper.audio import SAMPLE_RATE, load_audio
+
+import numpy
+
+BLOCK_FRAMES = 1024
+# Length of the windows we judge, roughly what the engine holds on to between cuts
+WINDOW_S = 5
+
+
+def words_in(model, window: numpy.ndarray) -> int:
+    with silenced_stderr():
+        tscript = model.transcribe(window, no_speech_threshold=NO_SPEECH_THRESHOLD, condition_on_previous_text=False)
+    return sum(
+        len(segment["text"].split())
+        for segment in tscript["segments"]
+        if segment["no_speech_prob"] < NO_SPEECH_THRESHOLD
+    )
+
+
+def bench_file(path: str, model) -> dict:
+    audio = load_audio(path)
+    vad = VoiceActivityDetector(SAMPLE_RATE)
+
+    start = time.perf_counter()
+    for i in range(0, len(audio), BLOCK_FRAMES):
+        vad.process(audio[i : i + BLOCK_FRAMES])
+    vad_time = time.perf_counter() - start
+
+    window_len = WINDOW_S * SAMPLE_RATE
+    windows = skipped = words = words_lost = 0
+    for i in range(0, len(audio), window_len):
+        window = audio[i : i + window_len]
+        windows += 1
+        has_speech = vad.speech_bounds(i, i + len(window)) is not None
+        if not has_speech:
+            skipped += 1
+        if model is not None:
+            n = words_in(model, window)
+            words += n
+            if not has_speech:
+                words_lost += n
+
+    return {
+        "file": path,
+        "audio_s": len(audio) / SAMPLE_RATE,
+        "vad_rtf": vad_time / (len(audio) / SAMPLE_RATE),
+        "windows": windows,
+        "skipped": skipped,
+        "words": words if model is not None else None,
+        "words_lost": words_lost if model is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how much inference the VAD gate avoids")
+    parser.add_argument("files", nargs="+", help="recordings to replay (anything ffmpeg can read)")
+    parser.add_argument("--no-whisper", action="store_true", help="skip transcribing windows to count lost words")
+    args = parser.parse_args()
+
+    model = None
+    if not args.no_whisper:
+        with silenced_stderr():
+            import whisper
+        model = whisper.load_model(MODEL_ID, in_memory=True)
+
+    total_windows = total_skipped = total_words = total_lost = 0
+    for path in args.files:
+        result = bench_file(path, model)
+        total_windows += result["windows"]
+        total_skipped += result["skipped"]
+        line = (
+            f"{result['file']}: {result['audio_s']:.1f}s audio, VAD RTF {result['vad_rtf']:.4f}, "
+            f"skipped {result['skipped']}/{result['windows']} windows"
+        )
+        if model is not None:
+            total_words += result["words"]
+            total_lost += result["words_lost"]
+            line += f", lost {result['words_lost']}/{result['words']} words"
+        print(line)
+
+    print(f"Total: skipped {total_skipped}/{total_windows} inference calls", end="")
+    if model is not None:
+        print(f", lost {total_lost}/{total_words} words")
+    else:
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3.9
+# Load test for the transcript server: feeds it synthetic transcript
+# messages while many overlay-style clients poll /text (plus a few
+# that stall, and a few event streams), and reports request latency.
+#
+# Usage: python3 bench/load_test_server.py [--clients 100] [--duration 30]
+
+from pathlib import Path
+import argparse
+import http.client
+import queue
+import random
+import socket
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import transcription_server
+
+WORDS = "the stream chat is going to love this new map so let's try and beat the boss again".split()
+# How often overlays poll, like view_transcript.html's fallback
+POLL_INTERVAL_S = 0.75
+# How often the synthetic engine sends stream updates, and commits every few of them
+FEED_INTERVAL_S = 0.5
+STREAMS_PER_COMMIT = 4
+
+
+def feed(mp_q: queue.Queue, stop: threading.Event):
+    rng = random.Random(0)
+    i = 0
+    while not stop.is_set():
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20)))
+        i += 1
+        mp_q.put({"log": text} if i % STREAMS_PER_COMMIT == 0 else {"stream": text})
+        time.sleep(FEED_INTERVAL_S)
+    mp_q.put({"stop": True})
+
+
+def poller(latencies: list, errors: list, stop: threading.Event, delta: bool):
+    conn = http.client.HTTPConnection(transcription_server.HOST_NAME, transcription_server.SERVER_PORT, timeout=10)
+    generation = None
+    offset = 0
+    # Spread the clients out over the first poll interval
+    time.sleep(random.random() * POLL_INTERVAL_S)
+    while not stop.is_set():
+        path = "/text" if not delta or generation is None else f"/text?since={offset}&gen={generation}"
+        start = time.perf_counter()
+        try:
+            conn.request("GET", path, headers={"Accept-Encoding": "gzip"})
+            res = conn.getresponse()
+            res.read()
+            latencies.append(time.perf_counter() - start)
+            if res.status != 200:
+                errors.append(res.status)
+            generation = res.getheader("X-Transcript-Generation")
+            offset = res.getheader("X-Transcript-Offset")
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(type(e).__name__)
+            conn.close()
+        time.sleep(POLL_INTERVAL_S)
+    conn.close()
+
+
+def staller(stop: threading.Event):
+    """Connects, sends half a request, and never reads anything, like a frozen browser source"""
+    sock = socket.create_connection((transcription_server.HOST_NAME, transcription_server.SERVER_PORT))
+    sock.sendall(b"GET /text HTTP/1.1\r\nHost: localhost\r\n")
+    stop.wait()
+    sock.close()
+
+
+def event_stream(counts: list, stop: threading.Event):
+    conn = http.client.HTTPConnection(transcription_server.HOST_NAME, transcription_server.SERVER_PORT, timeout=30)
+    conn.request("GET", "/events")
+    res = conn.getresponse()
+    while not stop.is_set():
+        line = res.fp.readline()
+        if not line:
+            break
+        if line.startswith(b"id:"):
+            counts.append(1)
+    conn.close()
+
+
+def percentile(values, p):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, round(p / 100 * (len(values) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the transcript server")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent /text pollers")
+    parser.add_argument("--stalled", type=int, default=5, help="clients that connect and never finish a request")
+    parser.add_argument("--streams", type=int, default=5, help="concurrent /events clients")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run for")
+    parser.add_argument("--full", action="store_true", help="poll the full transcript instead of delta reads")
+    args = parser.parse_args()
+
+    mp_q = queue.Queue()
+    stop = threading.Event()
+    server_thread = threading.Thread(target=transcription_server.start_server)
+    listener_thread = threading.Thread(target=transcription_server.start_listener, args=(mp_q,))
+    server_thread.start()
+    listener_thread.start()
+    while transcription_server.web_server is None:
+        time.sleep(0.05)
+
+    latencies = []
+    errors = []
+    event_counts = []
+    threads = [threading.Thread(target=feed, args=(mp_q, stop))]
+    threads += [threading.Thread(target=staller, args=(stop,)) for _ in range(args.stalled)]
+    threads += [threading.Thread(target=event_stream, args=(event_counts, stop), daemon=True) for _ in range(args.streams)]
+    threads += [
+        threading.Thread(target=poller, args=(latencies, errors, stop, not args.full)) for _ in range(args.clients)
+    ]
+    for thread in threads:
+        thread.start()
+
+    started = time.time()
+    while time.time() - started < args.duration:
+        time.sleep(5)
+        window = latencies[-args.clients * 5 :]
+        print(
+            f"{time.time() - started:5.0f}s: {len(latencies)} requests, "
+            f"p50 {percentile(window, 50) * 1000:.1f}ms, p99 {percentile(window, 99) * 1000:.1f}ms"
+        )
+
+    stop.set()
+    for thread in threads:
+        if not thread.daemon:
+            thread.join()
+    with transcription_server.web_server_mtx:
+        transcription_server.web_server.shutdown()
+    server_thread.join()
+    listener_thread.join()
+
+    print(f"Requests: {len(latencies)}, errors: {len(errors)} {sorted(set(map(str, errors)))}")
+    print(", ".join(f"p{p} {percentile(latencies, p) * 1000:.1f}ms" for p in (50, 90, 99)))
+    print(f"Events received across {args.streams} streams: {len(event_counts)}")
+
+
+if __name__ == "__main__":
+    main()
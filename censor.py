@@ -0,0 +1,108 @@
+#!/usr/bin/env python3.9
+# This module censors transcript text with a single precompiled regex,
+# built from better_profanity's word list, so each segment only needs
+# to be scanned once when it arrives.
+
+from typing import Dict, Iterable, Sequence
+
+import re
+
+CENSOR_CHAR = "*"
+
+
+class ProfanityFilter:
+    """
+    Matches every censored word (and better_profanity's character
+    substitutions, like "@" for "a") with one regex, built as a trie so
+    matching doesn't slow down with the size of the word list.
+
+    Censoring keeps the text's length, so a censored prefix of a string
+    lines up with the same prefix of the original.
+
+    A match that is a whitelisted word, with or without substitutions (like
+    "fvck" for "fuck"), is left alone: the word list has entries of its own
+    for some of those spellings.
+    """
+
+    def __init__(self, words: Iterable[str], char_mapping: Dict[str, Sequence[str]], whitelist: Iterable[str] = ()) -> None:
+        words = sorted({word.lower() for word in words if word})
+        whitelist = sorted({word.lower() for word in whitelist if word})
+        self.max_phrase_words = max((len(word.split()) for word in words), default=1)
+        self._pattern = re.compile(
+            r"(?<!\w)" + _trie_pattern(words, char_mapping) + r"(?!\w)",
+            re.IGNORECASE,
+        )
+        self._whitelist = re.compile(_trie_pattern(whitelist, char_mapping), re.IGNORECASE) if whitelist else None
+
+    @staticmethod
+    def from_profanity(profanity, whitelist: Iterable[str] = ()) -> "ProfanityFilter":
+        """
+        Uses whatever better_profanity currently has loaded. It doesn't keep
+        the whitelist it was loaded with, so that's passed in again.
+        """
+        return ProfanityFilter((str(word) for word in profanity.CENSOR_WORDSET), profanity.CHARS_MAPPING, whitelist)
+
+    def censor(self, text: str) -> str:
+        return self._pattern.sub(self._replace, text)
+
+    def _replace(self, match: "re.Match") -> str:
+        text = match.group()
+        if self._whitelist is not None and self._whitelist.fullmatch(text):
+            return text
+        return CENSOR_CHAR * len(text)
+
+    def censor_update(self, previous: str, previous_censored: str, text: str) -> str:
+        """
+        Censors `text`, given that `previous` censored to `previous_censored`.
+        Only rescans from a few words before where the two texts diverge, which
+        is cheap for streaming text that mostly grows at the end.
+        """
+        if text == previous:
+            return previous_censored
+
+        # Binary search for the common prefix, so the comparisons happen in C
+        common, hi = 0, min(len(previous), len(text))
+        while common < hi:
+            mid = (common + hi + 1) // 2
+            if previous[:mid] == text[:mid]:
+                common = mid
+            else:
+                hi = mid - 1
+
+        # Back up far enough that no match touching the changed text can start before us
+        start = common
+        for _ in range(self.max_phrase_words + 1):
+            start = text.rfind(" ", 0, start)
+            if start <= 0:
+                return self.censor(text)
+        # ...and don't restart halfway through a censored phrase that was already there
+        while start < common and previous_censored[start] == CENSOR_CHAR:
+            start += 1
+        return previous_censored[:start] + self.censor(text[start:])
+
+
+def _trie_pattern(words: Sequence[str], char_mapping: Dict[str, Sequence[str]]) -> str:
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def char_pattern(char: str) -> str:
+        if char.isspace():
+            return r"\s+"
+        alternatives = sorted(set(char_mapping.get(char, ())) | {char})
+        if len(alternatives) == 1:
+            return re.escape(char)
+        return "[" + "".join(re.escape(alternative) for alternative in alternatives) + "]"
+
+    def emit(node: dict) -> str:
+        branches = [char_pattern(char) + emit(child) for char, child in sorted(node.items()) if char != ""]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:" + "|".join(branches) + ")" + ("?" if "" in node else "")
+
+    return emit(trie)
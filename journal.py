@@ -0,0 +1,217 @@
+#!/usr/bin/env python3.9
+# This module keeps a persistent journal of committed transcript
+# segments, so the transcript survives restarts and `clear`, and can be
+# exported as subtitles afterwards.
+#
+# Usage: python3 journal.py export --format srt [--since 2024-01-01T20:00] [--until ...] [-o out.srt]
+
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+from util import create_logger
+
+import argparse
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+LOG = create_logger("transcript-journal")
+
+JOURNAL_DIR = Path.home().joinpath(".stream", "journal")
+# Start a new journal file once the current one reaches this size
+JOURNAL_MAX_BYTES = 16 * 1024 * 1024
+# Writes are fsync'd in batches at most this far apart
+JOURNAL_FSYNC_S = 1.0
+
+MAGIC = b"STJ1"
+# Record header: type, start time, end time (both UNIX seconds), UTF-8 text length
+RECORD = struct.Struct("<BddI")
+SEGMENT = 0
+# Marks a `clear`: segments before it aren't part of the current session anymore
+CLEAR = 1
+
+
+class JournalRecord(NamedTuple):
+    kind: int
+    start: float
+    end: float
+    text: str
+
+
+def journal_files(directory: Path = JOURNAL_DIR) -> List[Path]:
+    """Journal files, oldest first"""
+    if not directory.exists():
+        return []
+    return sorted(directory.glob("transcript-*.stj"))
+
+
+def read_records(path: Path) -> Iterator[JournalRecord]:
+    """Reads a journal file through mmap, stopping at a torn record at the end"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[: len(MAGIC)] != MAGIC:
+                LOG.warning(f"{path} is not a transcript journal, skipping")
+                return
+            pos = len(MAGIC)
+            while pos + RECORD.size <= len(data):
+                kind, start, end, length = RECORD.unpack_from(data, pos)
+                pos += RECORD.size
+                if pos + length > len(data):
+                    break
+                yield JournalRecord(kind, start, end, data[pos : pos + length].decode("utf-8", errors="replace"))
+                pos += length
+
+
+def load_session(directory: Path = JOURNAL_DIR) -> List[JournalRecord]:
+    """Segments committed since the last `clear`, across however many files that spans"""
+    segments = []
+    for path in reversed(journal_files(directory)):
+        records = list(read_records(path))
+        for i in range(len(records) - 1, -1, -1):
+            if records[i].kind == CLEAR:
+                segments[:0] = [record for record in records[i + 1 :] if record.kind == SEGMENT]
+                return segments
+        segments[:0] = [record for record in records if record.kind == SEGMENT]
+    return segments
+
+
+class TranscriptJournal:
+    """
+    Appends records to the journal from a background thread, so the caller
+    never waits on the disk. Files rotate when they reach `max_bytes`, after
+    every `clear`, and once per process start.
+    """
+
+    def __init__(self, directory: Path = JOURNAL_DIR, max_bytes: int = JOURNAL_MAX_BYTES, fsync_s: float = JOURNAL_FSYNC_S) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fsync_s = fsync_s
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="transcript-journal", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def append(self, text: str, start: float, end: float):
+        self._queue.put(JournalRecord(SEGMENT, start, end, text))
+
+    def clear(self):
+        now = time.time()
+        self._queue.put(JournalRecord(CLEAR, now, now, ""))
+
+    def close(self):
+        """Writes out everything queued so far and stops the writer"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _open_new(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory.joinpath(f"transcript-{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}.stj")
+        f = open(path, "ab")
+        f.write(MAGIC)
+        LOG.info(f"Journaling to {path}")
+        return f
+
+    @staticmethod
+    def _sync(f):
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _run(self):
+        f = None
+        dirty = False
+        last_sync = time.time()
+        try:
+            while True:
+                try:
+                    record = self._queue.get(timeout=self.fsync_s if dirty else None)
+                except queue.Empty:
+                    record = False
+
+                if record is None:
+                    break
+                if record:
+                    if f is None:
+                        f = self._open_new()
+                    text = record.text.encode("utf-8")
+                    f.write(RECORD.pack(record.kind, record.start, record.end, len(text)) + text)
+                    dirty = True
+
+                    if record.kind == CLEAR or f.tell() >= self.max_bytes:
+                        self._sync(f)
+                        f.close()
+                        f = None
+                        dirty = False
+                        last_sync = time.time()
+                        continue
+
+                if dirty and time.time() - last_sync >= self.fsync_s:
+                    self._sync(f)
+                    dirty = False
+                    last_sync = time.time()
+        except OSError as e:
+            LOG.error(f"Journal writer failed: {type(e).__name__}: {e}")
+        finally:
+            if f is not None:
+                self._sync(f)
+                f.close()
+
+
+def format_timestamp(seconds: float, separator: str) -> str:
+    millis = max(0, round(seconds * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02}:{minutes:02}:{secs:02}{separator}{millis:03}"
+
+
+def export(records: List[JournalRecord], fmt: str, origin: Optional[float] = None) -> str:
+    """Formats segments as SRT or WebVTT, timed relative to `origin` (default: the first segment)"""
+    if origin is None:
+        origin = records[0].start if records else 0.0
+    separator = "," if fmt == "srt" else "."
+    cues = []
+    for i, record in enumerate(records, 1):
+        timing = f"{format_timestamp(record.start - origin, separator)} --> {format_timestamp(record.end - origin, separator)}"
+        cue = f"{timing}\n{record.text.strip()}\n"
+        cues.append(f"{i}\n{cue}" if fmt == "srt" else cue)
+    header = "WEBVTT\n\n" if fmt == "vtt" else ""
+    return header + "\n".join(cues)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Work with the transcript journal")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="export a time range as subtitles")
+    export_parser.add_argument("--format", choices=("srt", "vtt"), default="srt")
+    export_parser.add_argument("--since", type=datetime.fromisoformat, help="start of the range (ISO 8601, local time)")
+    export_parser.add_argument("--until", type=datetime.fromisoformat, help="end of the range (ISO 8601, local time)")
+    export_parser.add_argument("-o", "--output", help="file to write (default: stdout)")
+    export_parser.add_argument("--dir", type=Path, default=JOURNAL_DIR, help=f"journal directory (default {JOURNAL_DIR})")
+    args = parser.parse_args()
+
+    since = args.since.timestamp() if args.since else None
+    until = args.until.timestamp() if args.until else None
+    records = [
+        record
+        for path in journal_files(args.dir)
+        for record in read_records(path)
+        if record.kind == SEGMENT
+        and (since is None or record.end >= since)
+        and (until is None or record.start <= until)
+    ]
+    output = export(records, args.format, origin=since)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        sys.stdout.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3.9
+# This module implements the local-agreement commit policy: a word is
+# committed once two consecutive transcriptions of the same audio agree on
+# it and everything before it, so the engine can cut audio at that word
+# and keep the window it retranscribes short.
+
+from typing import List
+
+import re
+
+
+def normalize_word(word: str) -> str:
+    # Whisper flips casing and punctuation between hypotheses more often than words
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+class LocalAgreement:
+    """
+    Holds the part of the last hypothesis that hasn't been committed yet.
+    Words are whisper's word dicts ("word", "start", "end", ...), with times
+    relative to the start of the buffer, which is where the last commit cut.
+    """
+
+    def __init__(self) -> None:
+        self._previous: List[dict] = []
+
+    def reset(self):
+        self._previous = []
+
+    def update(self, words: List[dict]) -> List[dict]:
+        """Takes a new hypothesis, and returns its longest prefix the previous one agrees with"""
+        agreed = 0
+        for previous, word in zip(self._previous, words):
+            if normalize_word(previous["word"]) != normalize_word(word["word"]):
+                break
+            agreed += 1
+        # The audio is cut after the agreed words, so they won't be in the next hypothesis
+        self._previous = words[agreed:]
+        return words[:agreed]
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3.9
+# This module keeps a rolling cache of log-mel spectrogram frames for
+# the audio held by the transcription engine, so each tick only has to
+# run the STFT over audio that arrived since the last one.
+
+from contextlib import contextmanager
+from audio_buffer import AudioRingBuffer
+from whisper.audio import HOP_LENGTH, N_FFT, N_FRAMES, mel_filters
+
+import importlib
+import numpy
+import torch
+
+# Half an STFT window: how far a frame reaches either side of its center
+HALF_WINDOW = N_FFT // 2
+# log10 of the clamp whisper applies to silent (zero-padded) frames
+SILENT_FRAME = -10.0
+# Frames at the start of a window whose STFT reaches into whisper's reflect padding
+HEAD_FRAMES = -(-HALF_WINDOW // HOP_LENGTH)
+
+
+class MelCache:
+    """
+    Caches un-normalized log10 mel frames keyed by absolute frame index
+    (absolute sample offset // HOP_LENGTH).
+
+    A frame is cached once its whole STFT window has been captured, so it
+    never changes afterwards; frames near the end of the audio depend on
+    the zero padding whisper adds, and the first couple depend on its
+    reflect padding, so those are recomputed every tick. Whisper's global
+    normalization is applied to the assembled window on the way out.
+
+    The audio buffer's start must stay a multiple of HOP_LENGTH.
+    """
+
+    def __init__(self, n_mels: int, capacity_frames: int):
+        self.n_mels = n_mels
+        self._filters = mel_filters("cpu", n_mels)
+        self._window = torch.hann_window(N_FFT)
+        self._cols = numpy.empty((n_mels, capacity_frames), dtype=numpy.float32)
+        self._head = 0
+        self._first = 0
+        self._count = 0
+
+    @staticmethod
+    def for_buffer(n_mels: int, audio: AudioRingBuffer) -> "MelCache":
+        if audio.alignment % HOP_LENGTH != 0:
+            raise ValueError("audio buffer must be aligned to HOP_LENGTH")
+        return MelCache(n_mels, audio.capacity // HOP_LENGTH + 1)
+
+    def clear(self):
+        self._head = 0
+        self._count = 0
+
+    def update(self, audio: AudioRingBuffer, end: int = None) -> torch.Tensor:
+        """
+        Returns the normalized log-mel spectrogram whisper would compute for
+        the audio between `audio.start_sample` and `end`, including the
+        N_FRAMES of padding `transcribe` adds at the tail.
+        """
+        start = audio.start_sample
+        end = audio.end_sample if end is None else min(max(start, end), audio.end_sample)
+        if start % HOP_LENGTH != 0:
+            raise ValueError("audio buffer start is not aligned to HOP_LENGTH")
+        first = start // HOP_LENGTH
+
+        # Drop frames that were cut from the head of the buffer
+        if self._count == 0 or first < self._first or first > self._first + self._count:
+            self._first = first
+            self._count = 0
+            self._head = 0
+        elif first > self._first:
+            dropped = first - self._first
+            self._head += dropped
+            self._count -= dropped
+            self._first = first
+
+        # Cache every frame whose window has been fully captured
+        stable_end = (audio.end_sample - HALF_WINDOW) // HOP_LENGTH + 1
+        cached_end = self._first + self._count
+        if stable_end > cached_end:
+            self._append(self._compute(audio, cached_end, stable_end, audio.end_sample))
+            cached_end = stable_end
+
+        # Frames whose window runs past `end` see zero padding, so they're
+        # only good for this tick
+        n_frames = (end - start) // HOP_LENGTH + N_FRAMES
+        tail_start = max(first, min(cached_end, (end - HALF_WINDOW) // HOP_LENGTH + 1))
+        tail_end = min(first + n_frames, -(-(end + HALF_WINDOW) // HOP_LENGTH))
+
+        mel = numpy.full((self.n_mels, n_frames), SILENT_FRAME, dtype=numpy.float32)
+        mel[:, : tail_start - first] = self._cols[:, self._head : self._head + tail_start - first]
+        if tail_end > tail_start:
+            mel[:, tail_start - first : tail_end - first] = self._compute(audio, tail_start, tail_end, end)
+        # Cached frames at the head saw the audio before the last cut, not reflect padding
+        head_end = min(tail_start, first + HEAD_FRAMES)
+        if head_end > first:
+            mel[:, : head_end - first] = self._compute(audio, first, head_end, end)
+
+        numpy.maximum(mel, mel.max() - 8.0, out=mel)
+        mel += 4.0
+        mel /= 4.0
+        return torch.from_numpy(mel)
+
+    def _append(self, frames: numpy.ndarray):
+        n = frames.shape[1]
+        capacity = self._cols.shape[1]
+        if n > capacity:
+            self._first += self._count + n - capacity
+            self._count = 0
+            frames = frames[:, -capacity:]
+            n = capacity
+        elif self._count + n > capacity:
+            dropped = self._count + n - capacity
+            self._head += dropped
+            self._count -= dropped
+            self._first += dropped
+        if self._head + self._count + n > capacity:
+            self._cols[:, : self._count] = self._cols[:, self._head : self._head + self._count]
+            self._head = 0
+        self._cols[:, self._head + self._count : self._head + self._count + n] = frames
+        self._count += n
+
+    def _compute(self, audio: AudioRingBuffer, k0: int, k1: int, end: int) -> numpy.ndarray:
+        """
+        Computes frames [k0, k1) from the buffered audio before `end`,
+        reflect-padded at the buffer start and zero-padded past `end`.
+        """
+        left = k0 * HOP_LENGTH - HALF_WINDOW
+        right = (k1 - 1) * HOP_LENGTH + HALF_WINDOW
+        seg_start = max(left, audio.start_sample)
+        # Reflecting needs a sample past the padding width, even if it's zero padding
+        seg_end = max(right, seg_start + HALF_WINDOW + 1)
+        samples = audio.view(seg_start, min(seg_end, end))
+        if len(samples) < seg_end - seg_start:
+            samples = numpy.pad(samples, (0, seg_end - seg_start - len(samples)))
+        if left < seg_start:
+            samples = numpy.pad(samples, (seg_start - left, 0), mode="reflect")
+        samples = samples[: right - left]
+
+        stft = torch.stft(
+            torch.from_numpy(numpy.ascontiguousarray(samples)),
+            N_FFT,
+            HOP_LENGTH,
+            window=self._window,
+            center=False,
+            return_complex=True,
+        )
+        mel = self._filters @ (stft.abs() ** 2)
+        return torch.clamp(mel, min=1e-10).log10().numpy()
+
+
+@contextmanager
+def precomputed_mel(mel: torch.Tensor):
+    """
+    Makes `whisper.transcribe` use `mel` instead of computing a spectrogram
+    from the audio it's given. Not thread-safe; the engine only transcribes
+    from one thread.
+    """
+    # `whisper.transcribe` is shadowed by the function of the same name
+    module = importlib.import_module("whisper.transcribe")
+    original = module.log_mel_spectrogram
+    module.log_mel_spectrogram = lambda *_args, **_kwargs: mel
+    try:
+        yield
+    finally:
+        module.log_mel_spectrogram = original
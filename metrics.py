@@ -0,0 +1,135 @@
+#!/usr/bin/env python3.9
+# This module collects counters, gauges and histograms in each process,
+# ships them to the transcription server over a multiprocessing queue,
+# and renders everything in Prometheus' text exposition format.
+
+from bisect import bisect_left
+from typing import Dict, Optional, Tuple
+
+import multiprocessing
+import queue
+import threading
+import time
+
+# How often a process sends its metrics to the server
+PUBLISH_INTERVAL_S = 1.0
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "engine_inference_seconds": ("histogram", "Time spent transcribing one tick", (0.1, 0.25, 0.5, 1, 2, 4, 8, 16)),
+    "engine_realtime_factor": ("histogram", "Inference seconds per second of audio transcribed", (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 4)),
+    "engine_buffered_audio_seconds": ("gauge", "Audio currently held by the engine", None),
+    "engine_audio_status_total": ("counter", "sounddevice callback status flags, by flag", None),
+    "engine_audio_dropped_samples_total": ("counter", "Samples dropped because the engine's audio buffer was full", None),
+    "engine_decode_fallbacks_total": ("counter", "Windows decoded again at a higher temperature", None),
+    "engine_decode_over_budget_total": ("counter", "Ticks that ran out of decode time budget before every window decoded cleanly", None),
+    "engine_ticks_total": ("counter", "Engine ticks, by what they ended up doing", None),
+    "engine_messages_total": ("counter", "Messages sent to the server, by kind", None),
+    "server_messages_total": ("counter", "Messages received from the engine, by kind", None),
+    "server_stale_messages_total": ("counter", "Stream messages dropped for covering already committed or newer audio", None),
+    "server_queue_depth": ("gauge", "Messages waiting in the engine-to-server queue", None),
+    "server_nowplaying_updates_total": ("counter", "Now-playing updates received from the nowplaying process", None),
+    "server_http_request_seconds": ("histogram", "Time to handle an HTTP request, by route", (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1)),
+    "nowplaying_poll_seconds": ("histogram", "Time to read now-playing info from the OS", (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2)),
+    "nowplaying_file_writes_total": ("counter", "Files written for OBS, by file", None),
+    "nowplaying_artwork_cache_total": ("counter", "Artwork looked up in the on-disk cache, by hit or miss", None),
+    "nowplaying_events_total": ("counter", "Change events pushed by the now-playing backend, by event", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Registry:
+    """Thread-safe metric values for one process; `const_labels` are added to every series"""
+
+    def __init__(self, **const_labels) -> None:
+        self._const_labels = tuple(sorted(const_labels.items()))
+        self._lock = threading.Lock()
+        # (name, labels) -> value, or [bucket counts..., +Inf count, sum] for histograms
+        self._values: Dict[Tuple[str, Labels], object] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                (name, tuple(sorted(labels + self._const_labels))): list(value) if isinstance(value, list) else value
+                for (name, labels), value in self._values.items()
+            }
+
+
+class Publisher:
+    """Sends a registry's snapshot down a queue at most every PUBLISH_INTERVAL_S; never blocks"""
+
+    def __init__(self, process: str, registry: Registry, channel: Optional[multiprocessing.Queue]) -> None:
+        self.process = process
+        self.registry = registry
+        self.channel = channel
+        self._last = 0.0
+
+    def maybe_publish(self):
+        if self.channel is None or time.time() - self._last < PUBLISH_INTERVAL_S:
+            return
+        self._last = time.time()
+        try:
+            self.channel.put_nowait((self.process, self.registry.snapshot()))
+        except queue.Full:
+            pass
+
+
+def _escape_label_value(value) -> str:
+    # Label values come from config too (source names), so anything can be in them
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    labels = labels + extra
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels) + "}"
+
+
+def render(*snapshots: dict) -> str:
+    """Prometheus text format for the merged snapshots"""
+    merged = {}
+    for snapshot in snapshots:
+        merged.update(snapshot)
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = sorted((labels, value) for (metric, labels), value in merged.items() if metric == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in series:
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', str(bound)),))} {cumulative}")
+            cumulative += value[len(buckets)]
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
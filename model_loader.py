@@ -0,0 +1,119 @@
+#!/usr/bin/env python3.9
+# This module loads the whisper model on a background thread, so the
+# engine can start capturing audio right away, and optionally converts it
+# to an int8 dynamically quantized CPU model cached on disk.
+
+from pathlib import Path
+from typing import Optional
+from util import create_logger
+from whisper.audio import SAMPLE_RATE
+
+import numpy
+import os
+import threading
+import time
+import torch
+
+LOG = create_logger("model-loader")
+
+MODEL_CACHE_DIR = Path.home().joinpath(".stream", "models")
+# Length of the synthetic audio the model is warmed up on
+WARMUP_S = 3
+
+
+def quantized_cache_path(model_id: str, directory: Path = MODEL_CACHE_DIR) -> Path:
+    # Pickled quantized modules aren't portable across torch versions
+    return directory.joinpath(f"{model_id}-int8-torch{torch.__version__}.pt")
+
+
+def quantize(model):
+    """int8 dynamic quantization of every linear layer; the model must be on the CPU"""
+    import whisper.model
+
+    # Whisper's Linear only adds a dtype cast, which doesn't matter in fp32,
+    # and torch won't quantize subclasses
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def load_model(model_id: str, int8: bool = False, cache_dir: Path = MODEL_CACHE_DIR):
+    """Loads a whisper model, converting it to int8 (and caching that) the first time it's asked for"""
+    import whisper
+
+    if not int8:
+        return whisper.load_model(model_id, in_memory=True)
+
+    path = quantized_cache_path(model_id, cache_dir)
+    if path.exists():
+        try:
+            return torch.load(path, weights_only=False)
+        except Exception as e:
+            LOG.warning(f"Couldn't load cached int8 model {path}, converting again: {type(e).__name__}: {e}")
+
+    model = quantize(whisper.load_model(model_id, device="cpu", in_memory=True))
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        torch.save(model, tmp_path)
+        os.replace(tmp_path, path)
+        LOG.info(f"Cached int8 model at {path}")
+    except OSError as e:
+        LOG.warning(f"Couldn't cache int8 model: {type(e).__name__}: {e}")
+    return model
+
+
+def warm_up(model):
+    """Runs one transcription on quiet noise, so the first real one doesn't pay for lazy setup"""
+    noise = numpy.random.default_rng(0).normal(0, 0.01, int(WARMUP_S * SAMPLE_RATE)).astype(numpy.float32)
+    model.transcribe(noise, fp16=False, condition_on_previous_text=False)
+
+
+class ModelLoader:
+    """Loads and warms up a model on a background thread"""
+
+    def __init__(self, model_id: str, int8: bool = False, warmup: bool = True) -> None:
+        self.model_id = model_id
+        self.int8 = int8
+        self.warmup = warmup
+        self.load_s: Optional[float] = None
+        self.warmup_s: Optional[float] = None
+        self._model = None
+        self._error: Optional[BaseException] = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+
+    def start(self) -> "ModelLoader":
+        self._thread.start()
+        return self
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def result(self):
+        """Waits for the model, re-raising anything that went wrong loading it"""
+        self._done.wait()
+        if self._error is not None:
+            raise self._error
+        return self._model
+
+    def _run(self):
+        try:
+            start = time.time()
+            model = load_model(self.model_id, self.int8)
+            self.load_s = time.time() - start
+            if self.warmup:
+                start = time.time()
+                warm_up(model)
+                self.warmup_s = time.time() - start
+            LOG.info(
+                f"Loaded {self.model_id}{' (int8)' if self.int8 else ''} in {self.load_s:.2f}s"
+                + (f", warmed up in {self.warmup_s:.2f}s" if self.warmup_s is not None else "")
+            )
+            self._model = model
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
@@ -2,19 +2,26 @@
 # This module exports now-playing information that can be read by OBS
 
 from subprocess import run, PIPE
-from time import sleep
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
 from PIL import Image
 from io import BytesIO
 from abc import ABC, abstractmethod
 from util import create_logger
+from metrics import Publisher, Registry
+from artwork_cache import ArtworkCache
+from outputs import FileSink, MemorySink, Outputs, Sink
+from progress_bar import ProgressBar, ProgressStyle, filled_pixels, render
 import os
 import base64
 import platform
 import daemon
 import asyncio
 import signal
+import threading
+import time
+import urllib.parse
+import urllib.request
 
 LOG = create_logger("now-playing")
 
@@ -26,23 +33,63 @@ TITLE_PATH = DEST.joinpath("title.txt")
 ARTIST_PATH = DEST.joinpath("artist.txt")
 ALBUM_PATH = DEST.joinpath("album.txt")
 PROGRESS_PATH = DEST.joinpath("progress.png")
+# Progress as a fraction, as far as the bar shows it
+PROGRESS_TEXT_PATH = DEST.joinpath("progress.txt")
+# Size and colors of the progress bar
+PROGRESS_STYLE = ProgressStyle(width=200, height=10, rounded=False)
 
 ARTWORK_PATH = DEST.joinpath("artwork.png")
 ARTWORK_DEFAULT_PATH = ME.joinpath("res", "default_music.png")
 
+# How often to poll backends that can't push changes, and the most often the progress bar is redrawn
+POLL_INTERVAL_S = 0.5
+# With a backend that pushes changes, read everything again this often anyway, in case one got lost
+RESYNC_INTERVAL_S = 30
+
+# Events backends that can push changes call back with
+TRACK_CHANGED = "track"
+PLAYBACK_CHANGED = "playback"
+SEEKED = "seek"
+
+# MPRIS players own a bus name under this prefix and serve this object
+MPRIS_PREFIX = "org.mpris.MediaPlayer2."
+MPRIS_PATH = "/org/mpris/MediaPlayer2"
+MPRIS_PLAYER_INTERFACE = "org.mpris.MediaPlayer2.Player"
+MPRIS_CONNECT_TIMEOUT_S = 5
+
 
 exit = False
+# Set to wake the poll loop early: on a change event, or to exit
+wake = threading.Event()
 def on_term(*_):
     LOG.info("exiting")
     global exit
     exit = True
+    wake.set()
 
 
-def artwork_is_default():
-    if not ARTWORK_PATH.exists():
-        return False
+class MediaSnapshot(NamedTuple):
+    """Everything about what's playing except the artwork, read in one go"""
+
+    title: str
+    artist: str
+    album: str
+    progress: Optional[float]
+    # None if the backend can't tell
+    playing: Optional[bool] = None
+    # How fast `progress` moves, per second, so it can be advanced without asking again; None if unknown
+    progress_per_s: Optional[float] = None
+    # Where the artwork comes from, if the backend can tell (an MPRIS art URL); it can arrive after the track
+    artwork_id: Optional[str] = None
+
+    @property
+    def track_key(self) -> Tuple[str, str, str]:
+        return (self.title, self.artist, self.album)
 
-    return ARTWORK_PATH.samefile(ARTWORK_DEFAULT_PATH)
+    @property
+    def artwork_key(self) -> tuple:
+        # Artwork only changes with this, so this says when to fetch it again
+        return (self.track_key, self.artwork_id)
 
 
 class MediaInfo(ABC):
@@ -52,19 +99,30 @@ class MediaInfo(ABC):
             return MediaInfoImplMacOS()
         elif platform.system() == "Windows":
             return MediaInfoImplWindows()
+        elif platform.system() == "Linux":
+            return MediaInfoImplLinux()
         raise NotImplementedError("MediaInfo is not implemented on " + platform.system())
 
     @staticmethod
     def progress_as_image(progress: float, width=200, height=10) -> Image:
-        progress = round(progress * width)
-        progressImg = Image.new("RGBA", (width, height))
-        for y in range(progressImg.height):
-            for i in range(progress):
-                progressImg.putpixel((i, y), (255, 255, 255, 255))
-            for i in range(progress + 1, progressImg.width):
-                progressImg.putpixel((i, y), (0, 0, 0, 0))
-
-        return progressImg
+        style = PROGRESS_STYLE._replace(width=width, height=height)
+        return render(filled_pixels(progress, width), style)
+
+    def snapshot(self) -> MediaSnapshot:
+        """
+        Every field but the artwork. Backends override this to read them in
+        a single round trip; fetch `artwork` only when `artwork_key` changes,
+        or on a TRACK_CHANGED event.
+        """
+        return MediaSnapshot(self.title, self.artist, self.album, self.progress)
+
+    def subscribe(self, callback: Callable[[str], None]) -> bool:
+        """
+        Has the backend call `callback` with TRACK_CHANGED, PLAYBACK_CHANGED or
+        SEEKED, from a thread of its own, whenever one of those happens.
+        Returns False if it can't push changes, and the caller has to poll.
+        """
+        return False
 
     @property
     @abstractmethod
@@ -83,9 +141,15 @@ class MediaInfo(ABC):
 
     @property
     @abstractmethod
-    def artwork(self) -> Optional[Image.Image]:
+    def artwork_bytes(self) -> Optional[bytes]:
+        """The artwork as the player hands it over, still encoded"""
         ...
 
+    @property
+    def artwork(self) -> Optional[Image.Image]:
+        data = self.artwork_bytes
+        return None if data is None else Image.open(BytesIO(data))
+
     @property
     @abstractmethod
     def progress(self) -> Optional[float]:
@@ -93,48 +157,74 @@ class MediaInfo(ABC):
 
 
 class MediaInfoImplMacOS(MediaInfo):
+    # What `snapshot` asks nowplaying-cli for; it prints one value per line, in order
+    SNAPSHOT_FIELDS = ("title", "artist", "album", "duration", "elapsedTime", "playbackRate")
+
     def __init__(self) -> None:
         super().__init__()
         self._base_args = ["nowplaying-cli", "get"]
 
+    def _get(self, *fields: str) -> List[str]:
+        return run([*self._base_args, *fields], stdout=PIPE).stdout.decode().strip("\n").split("\n")
+
+    @staticmethod
+    def _text(value: str) -> str:
+        value = value.strip()
+        return "" if value == "null" else value
+
+    @staticmethod
+    def _progress(duration: str, elapsed: str) -> Optional[float]:
+        duration = duration.strip()
+        elapsed = elapsed.strip()
+        if duration == "null" or elapsed == "null":
+            return None
+
+        duration = float(duration)
+        elapsed = float(elapsed)
+        if duration == 0:
+            return 0.0
+
+        return elapsed / duration
+
+    def snapshot(self) -> MediaSnapshot:
+        values = self._get(*self.SNAPSHOT_FIELDS)
+        if len(values) != len(self.SNAPSHOT_FIELDS):
+            # A title with a line break in it; ask for each field on its own
+            return super().snapshot()
+
+        title, artist, album, duration, elapsed, rate = values
+        playing = None if rate.strip() == "null" else float(rate) > 0
+        progress_per_s = None
+        if playing is not None and duration.strip() != "null" and float(duration) > 0:
+            progress_per_s = float(rate) / float(duration)
+        return MediaSnapshot(
+            self._text(title), self._text(artist), self._text(album), self._progress(duration, elapsed), playing, progress_per_s
+        )
+
     @property
     def title(self) -> str:
-        title = run([*self._base_args, "title"], stdout=PIPE).stdout.decode().strip()
-        return "" if title == "null" else title
+        return self._text(self._get("title")[0])
 
     @property
     def artist(self) -> str:
-        artist = run([*self._base_args, "artist"], stdout=PIPE).stdout.decode().strip()
-        return "" if artist == "null" else artist
+        return self._text(self._get("artist")[0])
 
     @property
     def album(self) -> str:
-        album = run([*self._base_args, "album"], stdout=PIPE).stdout.decode().strip()
-        return "" if album == "null" else album
+        return self._text(self._get("album")[0])
 
     @property
-    def artwork(self) -> Optional[Image.Image]:
+    def artwork_bytes(self) -> Optional[bytes]:
         artworkDataB64 = run([*self._base_args, "artworkData"], stdout=PIPE).stdout.decode().strip().encode("utf-8")
         if artworkDataB64 == b"null":
             return None
 
-        artworkData = base64.decodebytes(artworkDataB64)
-        return Image.open(BytesIO(artworkData))
+        return base64.decodebytes(artworkDataB64)
 
     @property
     def progress(self) -> Optional[float]:
-        duration = run([*self._base_args, "duration"], stdout=PIPE).stdout.decode().strip()
-        elapsed = run([*self._base_args, "elapsedTime"], stdout=PIPE).stdout.decode().strip()
-
-        if duration == "null" or elapsed == "null":
-            return None
-
-        duration = float(duration)
-        elapsed = float(elapsed)
-        if duration == 0:
-            return 0.0
-
-        return elapsed / duration
+        duration, elapsed = self._get("duration", "elapsedTime")
+        return self._progress(duration, elapsed)
 
 
 class MediaInfoImplWindows(MediaInfo):
@@ -143,9 +233,15 @@ class MediaInfoImplWindows(MediaInfo):
         from winsdk.windows.media.control import GlobalSystemMediaTransportControlsSessionManager as MediaManager
 
         self._media_manager = MediaManager
+        # What the last snapshot read, so `artwork` right after it doesn't ask again
+        self._snapshot_info = None
+        # Allocated once; thumbnails are read into it
+        self._thumb_read_buffer = None
 
     # source: https://stackoverflow.com/questions/65011660/how-can-i-get-the-title-of-the-currently-playing-media-in-windows-10-with-python
     async def _get_media_info_async(self):
+        from winsdk.windows.media.control import GlobalSystemMediaTransportControlsSessionPlaybackStatus as PlaybackStatus
+
         sessions = await self._media_manager.request_async()
 
         current_session = sessions.get_current_session()
@@ -157,6 +253,7 @@ class MediaInfoImplWindows(MediaInfo):
 
             # converts winrt vector to list
             info_dict["genres"] = list(info_dict["genres"])
+            info_dict["playing"] = current_session.get_playback_info().playback_status == PlaybackStatus.PLAYING
 
             return info_dict
         return None
@@ -166,50 +263,85 @@ class MediaInfoImplWindows(MediaInfo):
         from winsdk.windows.storage.streams import InputStreamOptions
 
         readable_stream = await stream_ref.open_read_async()
-        readable_stream.read_async(buffer, buffer.capacity, InputStreamOptions.READ_AHEAD)
+        await readable_stream.read_async(buffer, buffer.capacity, InputStreamOptions.READ_AHEAD)
 
-    @staticmethod
-    def _get_artwork_from_stream_ref(reference) -> bytes:
+    def _get_artwork_from_stream_ref(self, reference) -> bytes:
         from winsdk.windows.storage.streams import Buffer
 
-        thumb_read_buffer = Buffer(5 * 1024 * 1024)  # 5MB
-        asyncio.run(MediaInfoImplWindows._read_stream_into_buffer(reference, thumb_read_buffer))
-        return bytes(bytearray(thumb_read_buffer))
+        if self._thumb_read_buffer is None:
+            self._thumb_read_buffer = Buffer(5 * 1024 * 1024)  # 5MB
+        asyncio.run(MediaInfoImplWindows._read_stream_into_buffer(reference, self._thumb_read_buffer))
+        # Only the part the read filled in
+        return bytes(memoryview(self._thumb_read_buffer)[: self._thumb_read_buffer.length])
 
     def _get_media_info(self):
         return asyncio.run(self._get_media_info_async())
 
-    @property
-    def title(self) -> str:
-        info = self._get_media_info()
-        if info is None or "title" not in info or info["title"] is None:
+    @staticmethod
+    def _text(info, key: str) -> str:
+        if info is None or key not in info or info[key] is None:
             return ""
 
-        return info["title"]
+        return info[key]
+
+    def snapshot(self) -> MediaSnapshot:
+        info = self._snapshot_info = self._get_media_info()
+        return MediaSnapshot(
+            self._text(info, "title"),
+            self._text(info, "album_artist"),
+            self._text(info, "album_title"),
+            None,
+            None if info is None else info["playing"],
+        )
+
+    def subscribe(self, callback: Callable[[str], None]) -> bool:
+        try:
+            asyncio.run(self._subscribe_async(callback))
+        except Exception as e:
+            LOG.warning(f"Couldn't subscribe to media session changes, polling instead: {type(e).__name__}: {e}")
+            return False
+        return True
+
+    async def _subscribe_async(self, callback: Callable[[str], None]):
+        # The manager only raises events while something holds on to it
+        self._manager = await self._media_manager.request_async()
+        hooked = set()
+
+        def hook(session):
+            # Sessions come back when their app is current again; hook each app once
+            if session is None or session.source_app_user_model_id in hooked:
+                return
+            hooked.add(session.source_app_user_model_id)
+            session.add_media_properties_changed(lambda *_: callback(TRACK_CHANGED))
+            session.add_playback_info_changed(lambda *_: callback(PLAYBACK_CHANGED))
+            session.add_timeline_properties_changed(lambda *_: callback(SEEKED))
+
+        def on_current_session_changed(manager, _):
+            hook(manager.get_current_session())
+            callback(TRACK_CHANGED)
+
+        self._manager.add_current_session_changed(on_current_session_changed)
+        hook(self._manager.get_current_session())
 
     @property
-    def artist(self) -> str:
-        info = self._get_media_info()
-        if info is None or "album_artist" not in info or info["album_artist"] is None:
-            return ""
+    def title(self) -> str:
+        return self._text(self._get_media_info(), "title")
 
-        return info["album_artist"]
+    @property
+    def artist(self) -> str:
+        return self._text(self._get_media_info(), "album_artist")
 
     @property
     def album(self) -> str:
-        info = self._get_media_info()
-        if info is None or "album_title" not in info or info["album_title"] is None:
-            return ""
-
-        return info["album_title"]
+        return self._text(self._get_media_info(), "album_title")
 
     @property
-    def artwork(self) -> Optional[Image.Image]:
-        info = self._get_media_info()
+    def artwork_bytes(self) -> Optional[bytes]:
+        info, self._snapshot_info = self._snapshot_info or self._get_media_info(), None
         if info is None or "thumbnail" not in info or info["thumbnail"] is None:
             return None
 
-        return Image.open(BytesIO(MediaInfoImplWindows._get_artwork_from_stream_ref(info["thumbnail"])))
+        return self._get_artwork_from_stream_ref(info["thumbnail"])
 
     @property
     def progress(self) -> Optional[float]:
@@ -217,48 +349,363 @@ class MediaInfoImplWindows(MediaInfo):
         return None
 
 
-def start():
+class MprisPlayer:
+    """What one MPRIS player last told us"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.metadata: Dict[str, object] = {}
+        self.status = "Stopped"
+        self.rate = 1.0
+        # Position in microseconds as of `position_time` (monotonic); players don't signal it as it moves
+        self.position_us = 0
+        self.position_time = time.monotonic()
+        # Bumped whenever the player tells us the position, so an answer to an older question can be told apart
+        self.position_generation = 0
+        # When it last changed, so the most recently active player wins
+        self.changed_time = 0.0
+
+    def update(self, properties: Dict[str, object]):
+        # Pin the position down before the rate or state it moves with changes; that's no news of the position
+        self.position_us, self.position_time = self.position(), time.monotonic()
+        if "Metadata" in properties:
+            metadata = {key: variant.value for key, variant in properties["Metadata"].items()}
+            if metadata.get("xesam:title") != self.metadata.get("xesam:title") or metadata.get("mpris:trackid") != self.metadata.get("mpris:trackid"):
+                self.set_position(0)
+            self.metadata = metadata
+        if "PlaybackStatus" in properties:
+            self.status = properties["PlaybackStatus"]
+        if "Rate" in properties:
+            self.rate = properties["Rate"]
+        if "Position" in properties:
+            self.set_position(properties["Position"])
+        self.changed_time = time.monotonic()
+
+    def set_position(self, position_us: int):
+        self.position_us = position_us
+        self.position_time = time.monotonic()
+        self.position_generation += 1
+
+    def position(self) -> int:
+        if self.status != "Playing":
+            return self.position_us
+        return self.position_us + int((time.monotonic() - self.position_time) * self.rate * 1_000_000)
+
+    def text(self, key: str) -> str:
+        value = self.metadata.get(key)
+        if isinstance(value, list):
+            return ", ".join(value)
+        return "" if value is None else str(value)
+
+    @property
+    def track_key(self) -> Tuple[str, str, str]:
+        return (self.text("xesam:title"), self.text("xesam:artist"), self.text("xesam:album"))
+
+    @property
+    def art_url(self) -> Optional[str]:
+        return self.metadata.get("mpris:artUrl") or None
+
+    @property
+    def progress(self) -> Optional[float]:
+        length = self.metadata.get("mpris:length")
+        if not length:
+            return None
+        return min(max(self.position() / length, 0.0), 1.0)
+
+    @property
+    def progress_per_s(self) -> Optional[float]:
+        length = self.metadata.get("mpris:length")
+        if not length:
+            return None
+        return self.rate * 1_000_000 / length if self.status == "Playing" else 0.0
+
+
+class MediaInfoImplLinux(MediaInfo):
+    """
+    Follows MPRIS players on the D-Bus session bus. Everything is cached from
+    their PropertiesChanged and Seeked signals on a thread of its own, so
+    reading it doesn't cost a round trip; with several players, the one that
+    most recently started playing counts.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._lock = threading.Lock()
+        # By unique bus name, which is what signals come from
+        self._players: Dict[str, MprisPlayer] = {}
+        self._callback: Optional[Callable[[str], None]] = None
+        self._bus = None
+        self._error: Optional[BaseException] = None
+        self._connected = threading.Event()
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._run, name="mpris", daemon=True).start()
+        if not self._connected.wait(MPRIS_CONNECT_TIMEOUT_S):
+            raise TimeoutError("Timed out connecting to the D-Bus session bus")
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._connect())
+        except BaseException as e:
+            self._error = e
+            return
+        finally:
+            self._connected.set()
+        self._loop.run_forever()
+
+    async def _call(self, destination: str, path: str, interface: str, member: str, signature: str = "", body: list = []):
+        from dbus_next import Message, MessageType
+
+        reply = await self._bus.call(
+            Message(destination=destination, path=path, interface=interface, member=member, signature=signature, body=body)
+        )
+        if reply.message_type == MessageType.ERROR:
+            raise RuntimeError(f"{member} on {destination}: {reply.error_name}: {' '.join(map(str, reply.body))}")
+        return reply.body
+
+    async def _call_bus(self, member: str, signature: str = "", body: list = []):
+        return await self._call("org.freedesktop.DBus", "/org/freedesktop/DBus", "org.freedesktop.DBus", member, signature, body)
+
+    async def _connect(self):
+        from dbus_next.aio import MessageBus
+
+        self._bus = await MessageBus().connect()
+        self._bus.add_message_handler(self._on_message)
+        for rule in (
+            f"type='signal',interface='org.freedesktop.DBus',member='NameOwnerChanged',arg0namespace='{MPRIS_PREFIX[:-1]}'",
+            f"type='signal',interface='org.freedesktop.DBus.Properties',member='PropertiesChanged',path='{MPRIS_PATH}'",
+            f"type='signal',interface='{MPRIS_PLAYER_INTERFACE}',member='Seeked',path='{MPRIS_PATH}'",
+        ):
+            await self._call_bus("AddMatch", "s", [rule])
+        for name in (await self._call_bus("ListNames"))[0]:
+            if name.startswith(MPRIS_PREFIX):
+                await self._add_player(name)
+
+    async def _add_player(self, name: str):
+        try:
+            owner = (await self._call_bus("GetNameOwner", "s", [name]))[0]
+            properties = (
+                await self._call(owner, MPRIS_PATH, "org.freedesktop.DBus.Properties", "GetAll", "s", [MPRIS_PLAYER_INTERFACE])
+            )[0]
+        except RuntimeError as e:
+            # Gone again already, or not much of a player
+            LOG.warning(f"Ignoring MPRIS player {name}: {e}")
+            return
+
+        player = MprisPlayer(name)
+        player.update({key: variant.value for key, variant in properties.items()})
+        self._change(lambda: self._players.__setitem__(owner, player))
+
+    async def _refresh_position(self, owner: str):
+        with self._lock:
+            player = self._players.get(owner)
+            if player is None:
+                return
+            generation = player.position_generation
+        try:
+            position = (
+                await self._call(owner, MPRIS_PATH, "org.freedesktop.DBus.Properties", "Get", "ss", [MPRIS_PLAYER_INTERFACE, "Position"])
+            )[0]
+        except RuntimeError:
+            return
+        with self._lock:
+            # A Seeked handled while we waited is newer than this answer
+            if self._players.get(owner) is player and player.position_generation == generation:
+                player.set_position(position.value)
+
+    def _on_message(self, message):
+        from dbus_next import MessageType
+
+        # runs on the bus thread, for every message the bus delivers
+        if message.message_type != MessageType.SIGNAL:
+            return
+        if message.member == "NameOwnerChanged":
+            name, old_owner, new_owner = message.body
+            if not name.startswith(MPRIS_PREFIX):
+                return
+            if old_owner:
+                self._change(lambda: self._players.pop(old_owner, None))
+            if new_owner:
+                self._loop.create_task(self._add_player(name))
+        elif message.member == "PropertiesChanged" and message.sender in self._players:
+            interface, changed, _ = message.body
+            if interface != MPRIS_PLAYER_INTERFACE:
+                return
+            self._change(lambda: self._players[message.sender].update({key: variant.value for key, variant in changed.items()}))
+            if "PlaybackStatus" in changed or "Metadata" in changed:
+                # The position isn't signalled, and only extrapolated until now
+                self._loop.create_task(self._refresh_position(message.sender))
+        elif message.member == "Seeked" and message.sender in self._players:
+            with self._lock:
+                self._players[message.sender].set_position(message.body[0])
+            self._emit(SEEKED)
+
+    def _change(self, apply: Callable[[], object]):
+        """Applies a change to the players, and tells the subscriber what it changed for the current one"""
+        with self._lock:
+            before = self._current_state()
+            apply()
+            after = self._current_state()
+        if before[0] != after[0]:
+            self._emit(TRACK_CHANGED)
+        if before[1] != after[1]:
+            self._emit(PLAYBACK_CHANGED)
+
+    def _emit(self, event: str):
+        callback = self._callback
+        if callback is not None:
+            callback(event)
+
+    def _current(self) -> Optional[MprisPlayer]:
+        # Callers hold the lock
+        if not self._players:
+            return None
+        return max(self._players.values(), key=lambda player: (player.status == "Playing", player.changed_time))
+
+    def _current_state(self):
+        player = self._current()
+        # Players often send the art URL in a later signal than the rest of the track, which counts as a track change too
+        return (None, None) if player is None else ((player.track_key, player.art_url), player.status)
+
+    def subscribe(self, callback: Callable[[str], None]) -> bool:
+        self._callback = callback
+        return True
+
+    def snapshot(self) -> MediaSnapshot:
+        with self._lock:
+            player = self._current()
+            if player is None:
+                return MediaSnapshot("", "", "", None, False)
+            return MediaSnapshot(
+                *player.track_key, player.progress, player.status == "Playing", player.progress_per_s, player.art_url
+            )
+
+    @property
+    def title(self) -> str:
+        return self.snapshot().title
+
+    @property
+    def artist(self) -> str:
+        return self.snapshot().artist
+
+    @property
+    def album(self) -> str:
+        return self.snapshot().album
+
+    @property
+    def progress(self) -> Optional[float]:
+        return self.snapshot().progress
+
+    @property
+    def artwork_bytes(self) -> Optional[bytes]:
+        with self._lock:
+            player = self._current()
+            url = None if player is None else player.art_url
+        if not url:
+            return None
+
+        try:
+            if url.startswith("file://"):
+                return Path(urllib.parse.unquote(urllib.parse.urlparse(url).path)).read_bytes()
+            with urllib.request.urlopen(url, timeout=MPRIS_CONNECT_TIMEOUT_S) as response:
+                return response.read()
+        except Exception as e:
+            LOG.warning(f"Couldn't load artwork from {url}: {type(e).__name__}: {e}")
+            return None
+
+
+# The latest of everything the files hold, for consumers in this process
+memory = MemorySink()
+
+
+def start(metrics_queue=None, sinks: Sequence[Sink] = ()):
+    """Follows what's playing until terminated; `sinks` get everything the files do"""
     signal.signal(signal.SIGTERM, on_term)
     signal.signal(signal.SIGINT, signal.SIG_IGN)
-    DEST.mkdir(parents=True, exist_ok=True)
+    outputs = Outputs(FileSink(DEST), memory, *sinks)
 
     info = MediaInfo.create()
-
-    last_progress = None
-    last_info = None
+    metrics = Registry()
+    publisher = Publisher("now-playing", metrics, metrics_queue)
+
+    # Set by TRACK_CHANGED events; the artwork can change without the track key (a Windows thumbnail arriving late)
+    track_changed = threading.Event()
+
+    def on_event(event: str):
+        # runs on the backend's thread
+        metrics.inc("nowplaying_events_total", event=event)
+        if event == TRACK_CHANGED:
+            track_changed.set()
+        wake.set()
+
+    subscribed = info.subscribe(on_event)
+    LOG.info("Following now-playing changes" if subscribed else "Polling now-playing info")
+
+    progress_bar = ProgressBar(PROGRESS_STYLE)
+    artwork_cache = ArtworkCache()
+    last_key = None
+    last_artwork_key = None
+    snapshot = None
+    # When `snapshot` was read (monotonic)
+    read_time = 0.0
     while not exit:
-        title, artist, album = curr_info = (info.title, info.artist, info.album)
-        TITLE_PATH.write_text(title)
-        ARTIST_PATH.write_text(artist)
-        ALBUM_PATH.write_text(album)
+        # With a backend that pushes changes, only ask it again when it says something changed
+        if snapshot is None or not subscribed or wake.is_set() or time.monotonic() - read_time >= RESYNC_INTERVAL_S:
+            wake.clear()
+            artwork_changed = track_changed.is_set()
+            track_changed.clear()
+            poll_start = time.time()
+            snapshot = info.snapshot()
+            read_time = time.monotonic()
+            progress = snapshot.progress
+            # Artwork is the expensive part, and only changes with the track or on its own event
+            artwork_changed = artwork_changed or snapshot.artwork_key != last_artwork_key
+            artwork = info.artwork_bytes if artwork_changed else None
+            metrics.observe("nowplaying_poll_seconds", time.time() - poll_start)
+
+            outputs.stage(TITLE_PATH.name, snapshot.title.encode())
+            outputs.stage(ARTIST_PATH.name, snapshot.artist.encode())
+            outputs.stage(ALBUM_PATH.name, snapshot.album.encode())
+
+            if snapshot.track_key != last_key:
+                last_key = snapshot.track_key
+                LOG.info(last_key)
+            if artwork_changed:
+                last_artwork_key = snapshot.artwork_key
+                cached = artwork_cache.get(artwork) if artwork is not None else None
+                metrics.set("nowplaying_artwork_cache_total", artwork_cache.hits, result="hit")
+                metrics.set("nowplaying_artwork_cache_total", artwork_cache.misses, result="miss")
+                outputs.stage(ARTWORK_PATH.name, ARTWORK_DEFAULT_PATH if cached is None else cached)
+        else:
+            # Between events progress moves the way the backend last said it would
+            progress = snapshot.progress
+            if progress is not None and snapshot.progress_per_s:
+                progress = min(progress + snapshot.progress_per_s * (time.monotonic() - read_time), 1.0)
 
-        progress = info.progress
         progress = 0 if progress is None else progress
-        if progress != last_progress:
-            last_progress = progress
-            MediaInfo.progress_as_image(progress).save(PROGRESS_PATH)
-
-        artwork = info.artwork
-        if curr_info != last_info:
-            last_info = curr_info
-            LOG.info(curr_info)
-            if artwork is not None:
-                if artwork_is_default():
-                    ARTWORK_PATH.unlink()
-                artwork.save(ARTWORK_PATH)
-            elif not artwork_is_default():
-                if ARTWORK_PATH.exists():
-                    ARTWORK_PATH.unlink()
-                os.link(ARTWORK_DEFAULT_PATH, ARTWORK_PATH)
-
-        sleep(0.5)
-    
-    if TITLE_PATH.exists():
-        TITLE_PATH.write_text("")
-    if ARTIST_PATH.exists():
-        ARTIST_PATH.write_text("")
-    if ALBUM_PATH.exists():
-        ALBUM_PATH.write_text("")
+        if progress_bar.update(progress):
+            outputs.stage(PROGRESS_PATH.name, progress_bar.png)
+            outputs.stage(PROGRESS_TEXT_PATH.name, f"{progress_bar.progress:.4f}".encode())
+
+        for name in outputs.flush():
+            metrics.inc("nowplaying_file_writes_total", file=name)
+        publisher.maybe_publish()
+        if not subscribed:
+            wake.wait(POLL_INTERVAL_S)
+            continue
+        resync_s = max(RESYNC_INTERVAL_S - (time.monotonic() - read_time), 0.0)
+        if snapshot.playing and snapshot.progress is not None and snapshot.progress_per_s:
+            # Only the progress bar moves on its own; wake when it's a pixel further
+            wake.wait(min(max(1 / (PROGRESS_STYLE.width * snapshot.progress_per_s), POLL_INTERVAL_S), resync_s))
+        else:
+            # Nothing moves until the backend says so
+            wake.wait(resync_s)
+
+    for path in (TITLE_PATH, ARTIST_PATH, ALBUM_PATH):
+        outputs.stage(path.name, b"")
+    outputs.flush()
     LOG.info("done")
 
 
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3.9
+# This module hands now-playing state to whatever shows it. Each tick's
+# values are compared against what was last handed out, and only the ones
+# that changed go to every sink, together, in one flush: files for OBS,
+# written atomically, and an in-memory copy for anything else.
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Union
+from artwork_cache import swap_in
+from util import create_logger
+
+import multiprocessing
+import os
+import threading
+
+LOG = create_logger("outputs")
+
+# Contents, or a file that already holds them, which sinks can link instead of copying
+Value = Union[bytes, Path]
+
+
+class Sink(ABC):
+    @abstractmethod
+    def write(self, changes: Dict[str, Value]):
+        """Takes everything that changed in one tick, by name"""
+        ...
+
+
+class FileSink(Sink):
+    """Writes every value to a file of the same name, through a rename so readers never see half of one"""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, changes: Dict[str, Value]):
+        for name, value in changes.items():
+            dest = self.directory.joinpath(name)
+            if isinstance(value, Path):
+                swap_in(value, dest)
+                continue
+            tmp = dest.with_name(f".{name}.tmp")
+            tmp.write_bytes(value)
+            os.replace(tmp, dest)
+
+
+class MemorySink(Sink):
+    """Keeps the latest of every value as bytes, for other consumers in this process"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._values: Dict[str, bytes] = {}
+        # Goes up with every flush that changed something
+        self.version = 0
+
+    def write(self, changes: Dict[str, Value]):
+        values = {name: value.read_bytes() if isinstance(value, Path) else value for name, value in changes.items()}
+        with self._lock:
+            self._values.update(values)
+            self.version += 1
+
+    def get(self, name: str) -> bytes:
+        with self._lock:
+            return self._values.get(name, b"")
+
+    def snapshot(self) -> Dict[str, bytes]:
+        with self._lock:
+            return dict(self._values)
+
+
+class QueueSink(Sink):
+    """Sends every flush's changes, as bytes, to another process"""
+
+    def __init__(self, queue: multiprocessing.Queue) -> None:
+        self.queue = queue
+
+    def write(self, changes: Dict[str, Value]):
+        self.queue.put({name: value.read_bytes() if isinstance(value, Path) else value for name, value in changes.items()})
+
+
+class Outputs:
+    def __init__(self, *sinks: Sink) -> None:
+        self.sinks: List[Sink] = list(sinks)
+        self._written: Dict[str, Value] = {}
+        self._pending: Dict[str, Value] = {}
+
+    def add(self, sink: Sink):
+        self.sinks.append(sink)
+        # Catch it up on everything the others already have
+        if self._written:
+            sink.write(dict(self._written))
+
+    def stage(self, name: str, value: Value):
+        """Sets a value for the next flush; it's only handed out if it differs from the last one"""
+        if self._written.get(name) == value:
+            self._pending.pop(name, None)
+        else:
+            self._pending[name] = value
+
+    def flush(self) -> List[str]:
+        """Hands everything staged since the last flush to every sink; returns the names that changed"""
+        if not self._pending:
+            return []
+
+        changes, self._pending = self._pending, {}
+        for sink in self.sinks:
+            try:
+                sink.write(changes)
+            except Exception as e:
+                # One sink failing mustn't keep the others stale
+                LOG.error(f"{type(sink).__name__} failed: {type(e).__name__}: {e}")
+        self._written.update(changes)
+        return list(changes)
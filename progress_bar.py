@@ -0,0 +1,85 @@
+#!/usr/bin/env python3.9
+# This module draws the now-playing progress bar. Progress is quantized to
+# whole pixels, so a bar only has `width + 1` possible frames; each one is
+# built with a single NumPy select and encoded to PNG at most once.
+
+from functools import lru_cache
+from io import BytesIO
+from typing import NamedTuple, Tuple
+from PIL import Image, ImageDraw
+
+import numpy
+
+# Encoded frames kept per style; a 200px bar has 201 frames of a few hundred bytes each
+PNG_CACHE_SIZE = 512
+
+RGBA = Tuple[int, int, int, int]
+
+
+class ProgressStyle(NamedTuple):
+    width: int = 200
+    height: int = 10
+    # Filled part, and the rest of the track
+    foreground: RGBA = (255, 255, 255, 255)
+    background: RGBA = (0, 0, 0, 0)
+    # Round the ends of the track, which clips the filled part too
+    rounded: bool = False
+
+
+def filled_pixels(progress: float, width: int) -> int:
+    return min(max(round(progress * width), 0), width)
+
+
+@lru_cache(maxsize=16)
+def _layers(style: ProgressStyle) -> Tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]:
+    """The fully filled and fully empty bar, and each pixel's column, to select between them"""
+
+    def layer(color: RGBA) -> numpy.ndarray:
+        if not style.rounded:
+            return numpy.broadcast_to(numpy.array(color, dtype=numpy.uint8), (style.height, style.width, 4))
+        image = Image.new("RGBA", (style.width, style.height))
+        ImageDraw.Draw(image).rounded_rectangle(
+            (0, 0, style.width - 1, style.height - 1), radius=style.height // 2, fill=color
+        )
+        return numpy.asarray(image)
+
+    columns = numpy.arange(style.width).reshape(1, style.width, 1)
+    return layer(style.foreground), layer(style.background), columns
+
+
+def render(filled: int, style: ProgressStyle = ProgressStyle()) -> Image.Image:
+    """The bar with its first `filled` columns filled"""
+    foreground, background, columns = _layers(style)
+    return Image.fromarray(numpy.where(columns < filled, foreground, background), "RGBA")
+
+
+@lru_cache(maxsize=PNG_CACHE_SIZE)
+def render_png(filled: int, style: ProgressStyle = ProgressStyle()) -> bytes:
+    png = BytesIO()
+    render(filled, style).save(png, format="PNG")
+    return png.getvalue()
+
+
+class ProgressBar:
+    """Tells when the bar needs redrawing: only when progress moves by a whole pixel"""
+
+    def __init__(self, style: ProgressStyle = ProgressStyle()) -> None:
+        self.style = style
+        self._filled = None
+
+    def update(self, progress: float) -> bool:
+        """True if `progress` draws differently from the last one"""
+        filled = filled_pixels(progress, self.style.width)
+        if filled == self._filled:
+            return False
+        self._filled = filled
+        return True
+
+    @property
+    def progress(self) -> float:
+        """Progress as it's drawn, in whole pixels"""
+        return (self._filled or 0) / self.style.width
+
+    @property
+    def png(self) -> bytes:
+        return render_png(self._filled or 0, self.style)
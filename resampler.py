@@ -0,0 +1,99 @@
+#!/usr/bin/env python3.9
+# This module converts audio between sample rates with a polyphase FIR
+# filter: a windowed-sinc low-pass split into one short filter per output
+# phase, applied to a whole block of output samples with one vectorized
+# product. It keeps its state between blocks, so it can run inside a
+# capture callback on audio as it arrives.
+
+from math import gcd
+
+import numpy
+
+# Filter length in zero crossings of the sinc on each side, at the lower of the two rates
+ZERO_CROSSINGS = 16
+# Cutoff as a fraction of the lower rate's Nyquist frequency; the transition band sits around it
+ROLLOFF = 0.9
+KAISER_BETA = 8.0
+# Input handed to `process` at once by `resample`, to bound its temporary arrays
+RESAMPLE_CHUNK = 65536
+
+
+class PolyphaseResampler:
+    """
+    Streaming resampler from `from_rate` to `to_rate`, which are rounded to
+    whole Hz. Output lags input by `delay_s`, the filter's group delay; the
+    first output sample is aligned with the first input sample, so the
+    output of a whole signal matches `resample`.
+    """
+
+    def __init__(self, from_rate: float, to_rate: float) -> None:
+        from_rate, to_rate = int(round(from_rate)), int(round(to_rate))
+        divisor = gcd(from_rate, to_rate)
+        # Upsample by L, low-pass, downsample by M
+        self.up = to_rate // divisor
+        self.down = from_rate // divisor
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+
+        # Taps per phase: enough input samples to cover the zero crossings at the lower rate
+        self.taps = 2 * ZERO_CROSSINGS * max(1, -(-self.down // self.up))
+        length = self.up * self.taps
+        # Cutoff in cycles per sample of the upsampled signal
+        cutoff = ROLLOFF * 0.5 / max(self.up, self.down)
+        # Where the filter's center is, in upsampled samples; a whole sample, so output lines up with input exactly
+        self._center = (length - 1) // 2
+        n = numpy.arange(length) - self._center
+        half = self._center + 1
+        window = numpy.i0(KAISER_BETA * numpy.sqrt(1 - (n / half) ** 2)) / numpy.i0(KAISER_BETA)
+        prototype = 2 * cutoff * numpy.sinc(2 * cutoff * n) * window * self.up
+        # phases[p, j] weights the j-th of the `taps` input samples ending at an output's base sample
+        self.phases = prototype.reshape(self.taps, self.up).T[:, ::-1].astype(numpy.float32).copy()
+
+        self._history = numpy.zeros(self.taps - 1, dtype=numpy.float32)
+        self._consumed = 0
+        self._next_output = 0
+
+    @property
+    def delay_s(self) -> float:
+        """How far behind the input the output is, in seconds"""
+        return self._center / (self.up * self.from_rate)
+
+    def process(self, block: numpy.ndarray) -> numpy.ndarray:
+        """Takes the next input samples (1-D float32), and returns every output sample they complete"""
+        if self.up == self.down:
+            return numpy.asarray(block, dtype=numpy.float32)
+        if len(block) == 0:
+            # Completes nothing, and there may not be a whole filter's worth of history to slide over yet
+            return numpy.zeros(0, dtype=numpy.float32)
+
+        buffer = numpy.concatenate((self._history, numpy.asarray(block, dtype=numpy.float32)))
+        buffer_start = self._consumed - (self.taps - 1)
+        end = self._consumed + len(block)
+        # Output k needs input up to sample (k * down + center) // up
+        last = (end * self.up - 1 - self._center) // self.down
+        outputs = numpy.arange(self._next_output, last + 1)
+        positions = outputs * self.down + self._center
+        bases = positions // self.up - buffer_start
+        windows = numpy.lib.stride_tricks.sliding_window_view(buffer, self.taps)[bases - (self.taps - 1)]
+        result = numpy.einsum("ij,ij->i", windows, self.phases[positions % self.up])
+
+        self._history = buffer[len(buffer) - (self.taps - 1) :]
+        self._consumed = end
+        # Before the filter has filled up, `last` is still negative
+        self._next_output = max(self._next_output, last + 1)
+        return result.astype(numpy.float32, copy=False)
+
+    def flush(self) -> numpy.ndarray:
+        """The output still held back by the filter delay, as if the input had ended with silence"""
+        return self.process(numpy.zeros(self._center // self.up + self.taps, dtype=numpy.float32))
+
+
+def resample(audio: numpy.ndarray, from_rate: float, to_rate: float) -> numpy.ndarray:
+    """Resamples a whole signal, keeping its start aligned and its length in proportion"""
+    resampler = PolyphaseResampler(from_rate, to_rate)
+    if resampler.up == resampler.down:
+        return numpy.ascontiguousarray(audio, dtype=numpy.float32)
+    length = int(len(audio) * resampler.up / resampler.down)
+    pieces = [resampler.process(audio[i : i + RESAMPLE_CHUNK]) for i in range(0, len(audio), RESAMPLE_CHUNK)]
+    pieces.append(resampler.flush())
+    return numpy.concatenate(pieces)[:length]
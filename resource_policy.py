@@ -0,0 +1,124 @@
+#!/usr/bin/env python3.9
+# This module decides how much of the machine each of our processes gets:
+# torch threads for inference, which CPUs a process may run on, its nice
+# value, and optionally a cgroup CPU quota, so transcription doesn't take
+# every core away from OBS and the now-playing poll.
+
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+from util import create_logger
+
+import os
+
+LOG = create_logger("resource-policy")
+
+CPU_COUNT = os.cpu_count() or 1
+# Torch threads for inference, split between all the engine workers; by default half the cores, leaving the
+# rest to OBS. Pick it with bench/bench_threads.py
+ENGINE_THREADS = max(1, CPU_COUNT // 2)
+# Where cgroup v2 is mounted, for CPU quotas
+CGROUP_ROOT = Path("/sys/fs/cgroup")
+# cpu.max period; quotas are a share of it
+CGROUP_PERIOD_US = 100_000
+
+
+class ProcessPolicy(NamedTuple):
+    # Torch intra-op threads; None leaves torch's default of one per core
+    torch_threads: Optional[int] = None
+    # CPUs the process may run on (Linux only); None for all of them
+    cpus: Optional[Tuple[int, ...]] = None
+    # Nice value to run at; raising it never needs privileges
+    nice: Optional[int] = None
+    # Most cores' worth of CPU time the process may use, as a cgroup v2 cpu.max quota, where we may create cgroups
+    cpu_quota: Optional[float] = None
+
+
+# By process role, as __main__ starts them
+POLICIES: Dict[str, ProcessPolicy] = {
+    "capture": ProcessPolicy(),
+    # Inference can wait a little; OBS and the now-playing poll shouldn't. Threads are split between the workers.
+    "engine": ProcessPolicy(torch_threads=ENGINE_THREADS, nice=5),
+    "nowplaying": ProcessPolicy(),
+    "server": ProcessPolicy(),
+}
+
+
+def set_torch_threads(threads: int):
+    import torch
+
+    torch.set_num_threads(threads)
+    try:
+        # Only allowed before torch has run anything in parallel
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def own_cgroup() -> Optional[Path]:
+    """Our cgroup v2 directory, or None on other systems and cgroup v1"""
+    try:
+        for line in Path("/proc/self/cgroup").read_text().splitlines():
+            if line.startswith("0::"):
+                return CGROUP_ROOT.joinpath(line[3:].lstrip("/"))
+    except OSError:
+        pass
+    return None
+
+
+def set_cpu_quota(role: str, cores: float):
+    """Moves this process into a child cgroup of its own, limited to `cores` worth of CPU time"""
+    parent = own_cgroup()
+    if parent is None:
+        raise OSError("cgroup v2 isn't available")
+    cgroup = parent.joinpath(f"stream-{role}")
+    cgroup.mkdir(exist_ok=True)
+    cgroup.joinpath("cpu.max").write_text(f"{int(cores * CGROUP_PERIOD_US)} {CGROUP_PERIOD_US}")
+    cgroup.joinpath("cgroup.procs").write_text(str(os.getpid()))
+
+
+def apply(role: str, policy: ProcessPolicy):
+    """Applies a policy to the calling process. Whatever the OS doesn't support or allow is logged and skipped."""
+    applied = []
+    if policy.torch_threads is not None:
+        set_torch_threads(policy.torch_threads)
+        applied.append(f"{policy.torch_threads} torch threads")
+    if policy.cpus is not None:
+        if hasattr(os, "sched_setaffinity"):
+            try:
+                os.sched_setaffinity(0, policy.cpus)
+                applied.append(f"CPUs {','.join(map(str, policy.cpus))}")
+            except OSError as e:
+                LOG.warning(f"{role}: couldn't set CPU affinity: {type(e).__name__}: {e}")
+        else:
+            LOG.warning(f"{role}: CPU affinity isn't supported here")
+    if policy.nice is not None:
+        if hasattr(os, "setpriority"):
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, policy.nice)
+                applied.append(f"nice {policy.nice}")
+            except OSError as e:
+                LOG.warning(f"{role}: couldn't set nice value: {type(e).__name__}: {e}")
+        else:
+            LOG.warning(f"{role}: nice values aren't supported here")
+    if policy.cpu_quota is not None:
+        try:
+            set_cpu_quota(role, policy.cpu_quota)
+            applied.append(f"quota {policy.cpu_quota:g} CPUs")
+        except OSError as e:
+            LOG.warning(f"{role}: couldn't set a CPU quota: {type(e).__name__}: {e}")
+    if applied:
+        LOG.info(f"{role}: {', '.join(applied)}")
+
+
+def policy_for(role: str, processes: int = 1) -> ProcessPolicy:
+    """The role's policy for each of `processes` processes with that role; they split its torch threads"""
+    policy = POLICIES[role]
+    if policy.torch_threads is None or processes <= 1:
+        return policy
+    return policy._replace(torch_threads=max(1, policy.torch_threads // processes))
+
+
+def run_with_policy(role: str, target, /, *args, role_processes: int = 1, **kwargs):
+    """Process target that applies the role's policy, as one of `role_processes` processes with that role, then runs `target`"""
+    apply(role, policy_for(role, role_processes))
+    return target(*args, **kwargs)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3.9
+# This module decides when the transcription engine should run its next
+# tick, based on how fast inference has been keeping up with real time.
+
+from typing import NamedTuple
+from util import create_logger
+
+LOG = create_logger("tick-scheduler")
+
+# Weight of the newest measurement in the moving real-time factor and tick time
+RTF_SMOOTHING = 0.3
+# Real-time factor we assume before anything has been measured
+INITIAL_RTF = 0.5
+# Longest window whisper transcribes at once; longer buffers don't cost more per tick
+MAX_WINDOW_S = 30
+# Real-time factor at which inference can't keep up with the audio, and we fall back to commit-only ticks
+BEHIND_RTF = 0.9
+# Share of those limits (BEHIND_RTF, and a tick's time against the longest interval) we must get back
+# under before streaming again, so we don't flap between modes
+CAUGHT_UP = 0.65
+# While behind, how often to run a streaming tick anyway, to keep measuring inference
+PROBE_INTERVAL_S = 10
+
+
+class TickDecision(NamedTuple):
+    # Whether this tick should publish streaming (uncommitted) text. When
+    # false we're falling behind, and the tick should only run if it could commit.
+    stream: bool
+    # How long to wait between the start of this tick and the start of the next
+    delay_s: float
+
+
+class TickScheduler:
+    """
+    Picks tick intervals that keep display latency near a target.
+
+    A word spoken just after a tick starts is shown once the next tick has
+    waited `delay` and transcribed the window, so latency is roughly
+    `delay + rtf * (window + delay)`. We solve that for `delay`, clamped to
+    [min_interval_s, max_interval_s]. A long window only makes ticks come
+    sooner; the engine is behind when inference itself can't keep up, that
+    is when the measured real-time factor nears 1 or a tick takes longer
+    than `max_interval_s`. Then we switch to commit-only ticks at the
+    longest interval, with a streaming tick every PROBE_INTERVAL_S to keep
+    measuring, until both are comfortably back under.
+    """
+
+    def __init__(self, target_latency_s: float, min_interval_s: float, max_interval_s: float):
+        self.target_latency_s = target_latency_s
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.rtf = INITIAL_RTF
+        # Smoothed time a transcribing tick takes
+        self.tick_s = 0.0
+        self.behind = False
+        # Time spent behind since the last tick that measured inference
+        self._unmeasured_s = 0.0
+
+    def record(self, inference_s: float, audio_s: float):
+        """Feeds in how long a tick took to transcribe `audio_s` seconds of audio"""
+        if audio_s <= 0:
+            return
+        self.rtf += RTF_SMOOTHING * (inference_s / audio_s - self.rtf)
+        self.tick_s += RTF_SMOOTHING * (inference_s - self.tick_s)
+        self._unmeasured_s = 0.0
+
+    def decide(self, window_s: float) -> TickDecision:
+        """Decides the next tick, given how much audio the engine would transcribe now"""
+        window_s = min(window_s, MAX_WINDOW_S)
+        if self.behind:
+            self.behind = self.rtf >= CAUGHT_UP * BEHIND_RTF or self.tick_s >= CAUGHT_UP * self.max_interval_s
+        else:
+            self.behind = self.rtf >= BEHIND_RTF or self.tick_s > self.max_interval_s
+
+        predicted_s = self.rtf * window_s
+        if self.behind:
+            probe = self._unmeasured_s >= PROBE_INTERVAL_S
+            self._unmeasured_s += self.max_interval_s
+            decision = TickDecision(stream=probe, delay_s=self.max_interval_s)
+        else:
+            delay_s = (self.target_latency_s - predicted_s) / (1 + self.rtf)
+            decision = TickDecision(stream=True, delay_s=min(max(delay_s, self.min_interval_s), self.max_interval_s))
+
+        LOG.debug(
+            f"rtf={self.rtf:.2f} tick={self.tick_s:.2f}s window={window_s:.2f}s predicted={predicted_s:.2f}s "
+            f"next_tick={decision.delay_s:.2f}s mode={'commit-only' if self.behind else 'stream'}"
+            f"{' (probe)' if self.behind and decision.stream else ''}"
+        )
+        return decision
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3.9
+# This module stores the transcript for the transcription server as
+# pre-encoded, append-only chunks, so serving it never has to rebuild
+# or re-encode the whole thing, and never holds a lock while it does.
+
+from bisect import bisect_right
+from typing import List, Optional
+
+import secrets
+import zlib
+
+# Appended to each committed segment, like the old text log
+SEGMENT_SEPARATOR = b"\n"
+
+
+class TranscriptSnapshot:
+    """
+    A consistent view of the transcript at one point in time. Taking one is
+    O(1), and everything it does is safe to run after the store's lock has
+    been released, because the store only ever appends to the lists it shares.
+    """
+
+    def __init__(self, instance: str, generation: int, version: int, chunks: List[bytes], offsets: List[int], count: int, size: int,
+                 stream: bytes, gzip_chunks: List[bytes], gzip_count: int, compressor) -> None:
+        self.instance = instance
+        self.generation = generation
+        self.version = version
+        # Byte length of the committed part of the transcript
+        self.size = size
+        self.stream = stream
+        self._chunks = chunks
+        self._offsets = offsets
+        self._count = count
+        self._gzip_chunks = gzip_chunks
+        self._gzip_count = gzip_count
+        self._compressor = compressor
+
+    @property
+    def generation_id(self) -> str:
+        """The generation as clients echo it back; never the same for two stores, even across restarts"""
+        return f"{self.instance}-{self.generation}"
+
+    def etag(self, gzip: bool = False, since: Optional[int] = None) -> str:
+        """Tells apart every body /text can send for this version: gzipped or not, full or a delta from `since`"""
+        return f'"{self.generation_id}-{self.version}{"-gz" if gzip else ""}{"" if since is None else f"-d{since}"}"'
+
+    def committed_since(self, offset: int) -> bytes:
+        """Committed bytes from `offset` onwards"""
+        offset = min(max(0, offset), self.size)
+        i = bisect_right(self._offsets, offset, 0, self._count) - 1
+        if i < 0:
+            return b"".join(self._chunks[: self._count])
+        head = self._chunks[i][offset - self._offsets[i] :]
+        return head + b"".join(self._chunks[i + 1 : self._count])
+
+    def full(self) -> bytes:
+        return self.committed_since(0) + self.stream
+
+    def full_gzip(self) -> bytes:
+        # The committed part was compressed as it came in; only the stream text is new
+        compressor = self._compressor
+        return b"".join(self._gzip_chunks[: self._gzip_count]) + compressor.compress(self.stream) + compressor.flush()
+
+
+class SegmentStore:
+    """
+    Committed transcript segments as UTF-8 chunks with cumulative byte offsets,
+    plus the current streaming text. Also keeps a running gzip stream of the
+    committed text, flushed at every segment, so full reads can be served
+    compressed without recompressing the whole transcript.
+
+    Not thread-safe: callers serialize access, and hand snapshots to readers.
+    """
+
+    def __init__(self) -> None:
+        # Generations and versions count from zero again in every process, so
+        # ETags and generation ids carry this too, to not match a previous one's
+        self.instance = secrets.token_hex(4)
+        self.generation = 0
+        self.version = 0
+        self._reset()
+
+    def _reset(self):
+        # Fresh lists rather than clearing, since old snapshots may still use them
+        self._chunks: List[bytes] = []
+        self._offsets: List[int] = []
+        self._size = 0
+        self._stream = b""
+        self._compressor = zlib.compressobj(wbits=31)
+        self._gzip_chunks: List[bytes] = []
+
+    def append(self, text: str):
+        chunk = text.encode("utf-8") + SEGMENT_SEPARATOR
+        self._offsets.append(self._size)
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        self._gzip_chunks.append(self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self._stream = b""
+        self.version += 1
+
+    def set_stream(self, text: str):
+        self._stream = text.encode("utf-8")
+        self.version += 1
+
+    def clear(self):
+        self._reset()
+        self.generation += 1
+        self.version += 1
+
+    def snapshot(self, gzip: bool = False) -> TranscriptSnapshot:
+        """Takes a snapshot; pass `gzip` if you'll call `full_gzip` on it"""
+        return TranscriptSnapshot(
+            instance=self.instance,
+            generation=self.generation,
+            version=self.version,
+            chunks=self._chunks,
+            offsets=self._offsets,
+            count=len(self._chunks),
+            size=self._size,
+            stream=self._stream,
+            gzip_chunks=self._gzip_chunks,
+            gzip_count=len(self._gzip_chunks),
+            compressor=self._compressor.copy() if gzip else None,
+        )
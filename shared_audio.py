@@ -0,0 +1,242 @@
+#!/usr/bin/env python3.9
+# This module moves captured audio between processes through shared
+# memory: a capture process writes microphone audio into one ring per
+# input, and any number of inference workers read it without copying it
+# through a pipe.
+
+from typing import Dict, List, Optional
+from multiprocessing import shared_memory
+from audio_source import AudioSource, STATUS_FLAGS, open_capture
+from util import create_logger
+from whisper.audio import SAMPLE_RATE
+
+import numpy
+import signal
+import time
+
+LOG = create_logger("shared-audio")
+
+# How much audio a ring holds; readers that fall further behind lose audio
+RING_CAPACITY_S = 60
+# How often a reader checks for new audio while it waits
+READ_POLL_S = 0.01
+
+# Header slots (int64). SEQ is odd while the writer is updating END and CAPTURED.
+SEQ = 0
+END = 1
+# Where the commit worker has cut its buffer, so stream workers can follow
+COMMITTED = 2
+CLOSED = 3
+STATUS = 4
+INT_SLOTS = 16
+# Bytes before the samples: the int header, then the capture time (float64)
+HEADER_BYTES = 256
+
+
+class SharedAudioRing:
+    """
+    A single-writer, many-reader ring of float32 samples in shared memory,
+    addressed by absolute sample position since capture started. The writer
+    updates the end position under a sequence lock, so readers always see
+    an end position and capture time that belong together.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool) -> None:
+        self._shm = shm
+        self.owner = owner
+        self._ints = numpy.ndarray((INT_SLOTS,), dtype=numpy.int64, buffer=shm.buf)
+        self._captured = numpy.ndarray((1,), dtype=numpy.float64, buffer=shm.buf, offset=INT_SLOTS * 8)
+        self._data = numpy.ndarray(((shm.size - HEADER_BYTES) // 4,), dtype=numpy.float32, buffer=shm.buf, offset=HEADER_BYTES)
+        self.capacity = len(self._data)
+
+    @staticmethod
+    def create(capacity: int = RING_CAPACITY_S * SAMPLE_RATE) -> "SharedAudioRing":
+        ring = SharedAudioRing(shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity * 4), owner=True)
+        ring._ints[:] = 0
+        ring._captured[0] = 0.0
+        return ring
+
+    @staticmethod
+    def attach(name: str) -> "SharedAudioRing":
+        # Our processes share the creator's resource tracker, so attaching
+        # doesn't get the ring unlinked behind the creator's back
+        return SharedAudioRing(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def close(self):
+        # Views into the buffer have to go before it can be closed
+        del self._ints, self._captured, self._data
+        self._shm.close()
+        if self.owner:
+            self._shm.unlink()
+
+    # Writer side
+
+    def write(self, block: numpy.ndarray, captured: float):
+        """Appends a block; `captured` is when its last sample was captured (UNIX seconds)"""
+        block = block[-self.capacity :]
+        end = int(self._ints[END])
+        i = end % self.capacity
+        first = min(len(block), self.capacity - i)
+        self._ints[SEQ] += 1
+        self._data[i : i + first] = block[:first]
+        self._data[: len(block) - first] = block[first:]
+        self._ints[END] = end + len(block)
+        self._captured[0] = captured
+        self._ints[SEQ] += 1
+
+    def count_status(self, flag: str):
+        self._ints[STATUS + STATUS_FLAGS.index(flag)] += 1
+
+    def mark_closed(self):
+        self._ints[CLOSED] = 1
+
+    # Reader side
+
+    def position(self):
+        """(end position, capture time of the sample before it), read consistently"""
+        while True:
+            seq = int(self._ints[SEQ])
+            if seq % 2 == 0:
+                end = int(self._ints[END])
+                captured = float(self._captured[0])
+                if int(self._ints[SEQ]) == seq:
+                    return end, captured
+            time.sleep(0)
+
+    def views(self, start: int, end: int) -> List[numpy.ndarray]:
+        """
+        Zero-copy views of samples [start, end), which must still be in the
+        ring. The writer can overwrite them at any time: copy them, then
+        check `position` again for what was overwritten meanwhile.
+        """
+        i = start % self.capacity
+        j = i + (end - start)
+        if j <= self.capacity:
+            return [self._data[i:j]]
+        return [self._data[i:], self._data[: j - self.capacity]]
+
+    def overwritten(self, start: int) -> bool:
+        """True if the writer has moved on far enough to overwrite `start`"""
+        return int(self._ints[END]) - self.capacity > start
+
+    @property
+    def closed(self) -> bool:
+        return bool(self._ints[CLOSED])
+
+    @property
+    def committed(self) -> int:
+        return int(self._ints[COMMITTED])
+
+    @committed.setter
+    def committed(self, sample: int):
+        self._ints[COMMITTED] = sample
+
+    def status_counts(self) -> Dict[str, int]:
+        return {flag: int(self._ints[STATUS + i]) for i, flag in enumerate(STATUS_FLAGS) if self._ints[STATUS + i]}
+
+
+class SharedMemorySource(AudioSource):
+    """
+    Reads a SharedAudioRing that another process writes. Only the ring's
+    name is pickled, so sources can be handed to worker processes. Positions
+    the engine sees start at zero when the source is opened; `origin` maps
+    them onto the ring, which every reader shares. A reader that falls so
+    far behind it loses audio moves `origin` on by what it lost, so the
+    audio it reads next still maps onto the ring where it was captured.
+    """
+
+    def __init__(self, ring_name: str) -> None:
+        super().__init__()
+        self.ring_name = ring_name
+        self._ring: Optional[SharedAudioRing] = None
+        self._pos = 0
+
+    def __getstate__(self):
+        return {"ring_name": self.ring_name}
+
+    def __setstate__(self, state):
+        self.__init__(state["ring_name"])
+
+    def __enter__(self) -> "SharedMemorySource":
+        self._ring = SharedAudioRing.attach(self.ring_name)
+        self._pos, self.last_capture_time = self._ring.position()
+        self.origin = self._pos
+        return self
+
+    def __exit__(self, *_):
+        self._ring.close()
+        self._ring = None
+
+    @property
+    def exhausted(self) -> bool:
+        return self._ring.closed and self._ring.position()[0] <= self._pos
+
+    def status_counts(self) -> Dict[str, int]:
+        return self._ring.status_counts()
+
+    @property
+    def committed_sample(self) -> Optional[int]:
+        committed = self._ring.committed - self.origin
+        return committed if committed > 0 else None
+
+    def mark_committed(self, sample: int):
+        self._ring.committed = self.origin + sample
+
+    def read(self) -> List[numpy.ndarray]:
+        end, captured = self._ring.position()
+        while end <= self._pos and not self._ring.closed:
+            time.sleep(READ_POLL_S)
+            end, captured = self._ring.position()
+        if self._ring.overwritten(self._pos):
+            lost = end - self._ring.capacity - self._pos
+            LOG.warning(f"Fell {lost} samples behind the capture ring, skipping ahead")
+            self._pos += lost
+            self.origin += lost
+        block = numpy.concatenate(self._ring.views(self._pos, end))
+        # Whatever the writer got to while we copied is torn (a write in progress
+        # then has finished by now). It becomes silence, so positions still line up.
+        stale = min(self._ring.position()[0] - self._ring.capacity - self._pos, len(block))
+        if stale > 0:
+            LOG.warning(f"Capture ring overwrote {stale} samples while they were read, silencing them")
+            block[:stale] = 0
+        self._pos = end
+        self.last_capture_time = captured
+        return [block]
+
+
+exit = False
+def on_term(*_):
+    global exit
+    LOG.info("exiting")
+    exit = True
+
+
+def start_capture(rings: Dict[str, str], devices: Dict[str, Optional[str]]):
+    """
+    Captures every input in `devices` (label -> sounddevice device) into the
+    ring of the same label (label -> shared memory name) until terminated.
+    """
+    signal.signal(signal.SIGTERM, on_term)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    attached = {name: SharedAudioRing.attach(ring_name) for name, ring_name in rings.items()}
+
+    # Each ring is written from its own stream's callback thread only
+    streams = [open_capture(devices[name], ring.write, ring.count_status) for name, ring in attached.items()]
+    try:
+        for stream in streams:
+            stream.start()
+        LOG.info(f"Capturing {', '.join(attached)}")
+        while not exit:
+            time.sleep(0.1)
+    finally:
+        for stream in streams:
+            stream.close()
+        for ring in attached.values():
+            ring.mark_closed()
+            ring.close()
+    LOG.info("done")
@@ -0,0 +1,32 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from censor import ProfanityFilter
+from util import create_filter
+
+MAPPING = {"u": ("u", "*", "v"), "v": ("v", "*", "u"), "i": ("i", "1")}
+
+
+def test_whitelisted_word_with_a_substitution_is_kept():
+    matcher = ProfanityFilter(["fvck", "bitch"], MAPPING, whitelist=["fuck"])
+    assert matcher.censor("what the fvck") == "what the fvck"
+    assert matcher.censor("what the FUCK") == "what the FUCK"
+    assert matcher.censor("you b1tch") == "you *****"
+
+
+def test_repo_filter_keeps_whitelisted_spellings():
+    matcher = create_filter()
+    assert matcher.censor("oh fvck") == "oh fvck"
+    assert matcher.censor("oh fuck") == "oh fuck"
+    assert "b1tch" not in matcher.censor("oh b1tch")
+
+
+def test_censor_update_matches_a_full_rescan():
+    matcher = create_filter()
+    previous = previous_censored = ""
+    for text in ("what the", "what the fvck", "what the fvck you b1tch", "what the fvck you b1tch again"):
+        previous_censored = matcher.censor_update(previous, previous_censored, text)
+        previous = text
+        assert previous_censored == matcher.censor(text)
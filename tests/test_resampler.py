@@ -0,0 +1,28 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy
+from resampler import PolyphaseResampler, resample
+
+
+def test_empty_blocks_are_fine_anytime():
+    resampler = PolyphaseResampler(48000, 16000)
+    assert len(resampler.process(numpy.zeros(0, dtype=numpy.float32))) == 0
+    resampler.process(numpy.ones(480, dtype=numpy.float32))
+    assert len(resampler.process(numpy.zeros(0, dtype=numpy.float32))) == 0
+
+
+def test_streaming_in_uneven_blocks_matches_a_whole_signal():
+    audio = numpy.random.default_rng(0).normal(0, 0.1, 44100).astype(numpy.float32)
+    resampler = PolyphaseResampler(44100, 16000)
+    pieces, i = [], 0
+    for size in [0, 1, 7, 0, 441, 3000] * 100:
+        pieces.append(resampler.process(audio[i : i + size]))
+        i += size
+    pieces.append(resampler.process(audio[i:]))
+    pieces.append(resampler.flush())
+    streamed = numpy.concatenate(pieces)
+    whole = resample(audio, 44100, 16000)
+    numpy.testing.assert_allclose(streamed[: len(whole)], whole, atol=1e-5)
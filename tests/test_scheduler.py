@@ -0,0 +1,46 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scheduler import MAX_WINDOW_S, TickScheduler
+
+
+def talk(scheduler: TickScheduler, seconds: float, rtf: float, segment_s: float) -> list:
+    """Feeds the scheduler a continuous utterance, committing (and so cutting the window) every `segment_s`"""
+    modes = []
+    window_s = elapsed_s = 0.0
+    while elapsed_s < seconds:
+        decision = scheduler.decide(window_s)
+        modes.append(decision.stream)
+        if decision.stream and window_s > 0:
+            transcribed_s = min(window_s, MAX_WINDOW_S)
+            scheduler.record(rtf * transcribed_s, transcribed_s)
+        if window_s >= segment_s:
+            window_s = 0.0
+        window_s += decision.delay_s
+        elapsed_s += decision.delay_s
+    return modes
+
+
+def test_long_utterance_at_fast_rtf_keeps_streaming():
+    scheduler = TickScheduler(target_latency_s=3, min_interval_s=0.5, max_interval_s=2)
+    assert all(talk(scheduler, seconds=300, rtf=0.1, segment_s=7))
+    assert not scheduler.behind
+
+
+def test_long_window_without_commits_keeps_streaming():
+    scheduler = TickScheduler(target_latency_s=3, min_interval_s=0.5, max_interval_s=2)
+    assert all(talk(scheduler, seconds=120, rtf=0.05, segment_s=60))
+
+
+def test_slow_inference_falls_behind_and_recovers():
+    scheduler = TickScheduler(target_latency_s=3, min_interval_s=0.5, max_interval_s=2)
+    modes = talk(scheduler, seconds=60, rtf=1.2, segment_s=7)
+    assert scheduler.behind
+    # Still measuring while behind
+    assert any(modes[len(modes) // 2 :])
+
+    talk(scheduler, seconds=60, rtf=0.1, segment_s=7)
+    assert not scheduler.behind
+    assert scheduler.decide(5).stream
@@ -0,0 +1,45 @@
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy
+from shared_audio import SharedAudioRing, SharedMemorySource
+
+
+def write(ring: SharedAudioRing, samples: int):
+    ring.write(numpy.ones(samples, dtype=numpy.float32), 0.0)
+
+
+def test_read_keeps_positions_on_the_ring_timeline():
+    ring = SharedAudioRing.create(capacity=1000)
+    try:
+        write(ring, 600)
+        with SharedMemorySource(ring.name) as source:
+            write(ring, 300)
+            read = sum(len(block) for block in source.read())
+            assert source.origin + read == ring.position()[0]
+    finally:
+        ring.close()
+
+
+def test_overrun_moves_origin_by_what_was_lost():
+    ring = SharedAudioRing.create(capacity=1000)
+    try:
+        write(ring, 600)
+        with SharedMemorySource(ring.name) as source:
+            assert source.origin == 600
+            # The writer laps the reader: everything before 2000 is gone
+            for _ in range(6):
+                write(ring, 400)
+            end = ring.position()[0]
+            assert end == 3000
+            read = sum(len(block) for block in source.read())
+            assert read == ring.capacity
+            assert source.origin + read == end
+            # The next read carries on from there
+            write(ring, 100)
+            read += sum(len(block) for block in source.read())
+            assert source.origin + read == ring.position()[0]
+    finally:
+        ring.close()
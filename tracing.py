@@ -0,0 +1,100 @@
+#!/usr/bin/env python3.9
+# This module records timing spans across the engine and server
+# processes, and exports them as Chrome trace JSON (chrome://tracing
+# or https://ui.perfetto.dev) to show where transcript latency goes.
+
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Tuple
+
+import threading
+import time
+
+# Most spans a tracer keeps before dropping the oldest
+TRACE_MAX_SPANS = 100_000
+# Back-to-back calls of a traced module closer together than this are merged into one span
+MERGE_GAP_S = 0.005
+
+# (process, track, name, start, end, args); times are UNIX seconds, so spans
+# from different processes on the same machine line up
+Span = Tuple[str, str, str, float, float, dict]
+
+
+class Tracer:
+    def __init__(self, process: str, max_spans: int = TRACE_MAX_SPANS) -> None:
+        self.process = process
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, end: float, track: str = "main", **args):
+        with self._lock:
+            self._spans.append((self.process, track, name, start, end, args))
+
+    @contextmanager
+    def span(self, name: str, track: str = "main", **args):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.time(), track, **args)
+
+    def trace_module(self, module, name: str, track: str = "main"):
+        """Records a span for every forward pass of a torch module, merging back-to-back calls"""
+        starts = []
+
+        def pre_hook(*_):
+            starts.append(time.time())
+
+        def post_hook(*_):
+            start = starts.pop()
+            end = time.time()
+            with self._lock:
+                if self._spans:
+                    process, last_track, last_name, last_start, last_end, args = self._spans[-1]
+                    if last_name == name and last_track == track and start - last_end < MERGE_GAP_S:
+                        self._spans[-1] = (process, track, name, last_start, end, {"calls": args.get("calls", 1) + 1})
+                        return
+                self._spans.append((self.process, track, name, start, end, {"calls": 1}))
+
+        module.register_forward_pre_hook(pre_hook)
+        module.register_forward_hook(post_hook)
+
+    def drain(self) -> List[Span]:
+        """Removes and returns every recorded span, for shipping to another process"""
+        with self._lock:
+            spans = list(self._spans)
+            self._spans.clear()
+        return spans
+
+    def extend(self, spans: List[Span]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def chrome_trace(self) -> dict:
+        with self._lock:
+            spans = list(self._spans)
+
+        pids = {}
+        tids = {}
+        events = []
+        for process, track, name, start, end, args in spans:
+            if process not in pids:
+                pids[process] = len(pids) + 1
+                events.append({"ph": "M", "name": "process_name", "pid": pids[process], "args": {"name": process}})
+            if (process, track) not in tids:
+                tids[(process, track)] = len(tids) + 1
+                events.append(
+                    {"ph": "M", "name": "thread_name", "pid": pids[process], "tid": tids[(process, track)], "args": {"name": track}}
+                )
+            events.append(
+                {
+                    "ph": "X",
+                    "name": name,
+                    "pid": pids[process],
+                    "tid": tids[(process, track)],
+                    "ts": start * 1e6,
+                    "dur": max(0.0, end - start) * 1e6,
+                    "args": args,
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
@@ -4,15 +4,23 @@
 # in elsewhere.
 
 from pathlib import Path
-from contextlib import contextmanager
+from contextlib import contextmanager, ExitStack
+from typing import Callable, Dict, Optional
 from util import create_logger
-from whisper.audio import SAMPLE_RATE
+from audio_buffer import AudioRingBuffer
+from mel_cache import MelCache
+from batch_transcribe import DECODE_PROFILES, transcribe_batch
+from local_agreement import LocalAgreement
+from vad import VoiceActivityDetector
+from scheduler import TickDecision, TickScheduler
+from audio_source import AudioSource, MicrophoneSource
+from tracing import Tracer
+from metrics import Publisher, Registry
+from model_loader import ModelLoader
+from whisper.audio import SAMPLE_RATE, HOP_LENGTH
 
 import multiprocessing
-import sounddevice
-import numpy
 import time
-import queue
 import sys
 import os
 import signal
@@ -29,14 +37,46 @@ SEGMENT_TRAILS_CUT_PAST_S = 0
 WINDOW_S = 2
 # Maximum length of a segment before we accept its text and cut it
 MAX_SEGMENT_LENGTH_S = 7
+# The display latency (speech to text on screen) the tick scheduler aims for
+TARGET_LATENCY_S = 3
 # The fastest amount of time between updates (lower is more real time but higher CPU)
+MIN_UPDATE_S = 0.5
+# The slowest amount of time between updates, also used when we're falling behind
 MAX_UPDATE_S = 2
+# How much audio we can hold at once before the oldest audio is dropped
+BUFFER_CAPACITY_S = 60
+
+# How hard to try decoding each tick, see `batch_transcribe.DECODE_PROFILES`
+DECODE_PROFILE = "realtime"
+
+# When to commit text: "segments" once whisper starts a new segment or a
+# segment has gone quiet for MAX_SEGMENT_LENGTH_S; "agreement" word by word,
+# once two consecutive transcriptions agree on it
+COMMIT_POLICY = "segments"
+COMMIT_POLICIES = ("segments", "agreement")
+# With the agreement policy, how long the buffer may get before words are
+# committed without agreement
+AGREEMENT_MAX_WINDOW_S = 10
+
+# How much audio to keep around detected speech when trimming silence
+VAD_PAD_S = 0.5
 
 # Probability threshold at which point we consider a segment "empty"
 NO_SPEECH_THRESHOLD = 0.3
 
+# Audio inputs to transcribe, by speaker label: label -> sounddevice input device (None for the default)
+INPUT_DEVICES = {"mic": None}
+
 # Whisper model identifier
 MODEL_ID = "base.en"
+# What an engine sends: "both" streams and commits; with several workers
+# reading the same capture, a "stream" worker (say, a small fast model)
+# only streams and a "commit" worker (a larger one) only commits
+ROLES = ("both", "stream", "commit")
+# Inference worker processes, as (role, model), e.g. [("stream", "tiny.en"), ("commit", "small.en")]
+WORKERS = [("both", MODEL_ID)]
+# Run an int8 dynamically quantized copy of the model on the CPU (faster, slightly less accurate)
+MODEL_INT8 = False
 
 exit = False
 def on_term(*_):
@@ -54,7 +94,51 @@ def silenced_stderr():
     finally:
         sys.stderr = orig_stderr
 
-def start(log_queue: multiprocessing.Queue):
+class SourceState:
+    """One named source's audio, voice activity and mel frames; each source is cut on its own"""
+
+    def __init__(self, name: str, source: AudioSource) -> None:
+        self.name = name
+        self.source = source
+        # Cut on spectrogram frame boundaries so cached mel frames stay valid
+        self.audio = AudioRingBuffer(int(BUFFER_CAPACITY_S * SAMPLE_RATE), alignment=HOP_LENGTH)
+        self.vad = VoiceActivityDetector(SAMPLE_RATE)
+        # Created once the model (and so its number of mel bins) is known
+        self.mel_cache: Optional[MelCache] = None
+        # The agreement policy's unconfirmed words
+        self.agreement = LocalAgreement()
+        # Start of the window last transcribed, for tracing
+        self.window_start = 0
+        # Set after a source's final tick
+        self.done = False
+
+    def time_to_samples(self, t: float) -> int:
+        return int(t * self.source.samplerate)
+
+    def cur_len_s(self) -> float:
+        return len(self.audio) / self.source.samplerate
+
+    def capture_time(self, sample: int) -> float:
+        return self.source.last_capture_time - (self.audio.end_sample - sample) / self.source.samplerate
+
+
+def start(
+    log_queue: multiprocessing.Queue,
+    sources: Optional[Dict[str, AudioSource]] = None,
+    on_tick: Optional[Callable[[dict], None]] = None,
+    metrics_queue: Optional[multiprocessing.Queue] = None,
+    role: str = "both",
+    model_id: Optional[str] = None,
+):
+    """
+    Transcribes `sources`, by speaker label (the INPUT_DEVICES by default),
+    until we're told to exit or they all run out. Every tick, the windows
+    of all sources that need transcribing go through the model in one
+    batch. `on_tick`, if given, receives a dict of statistics after every
+    tick, which the offline benchmark uses. Metrics are sent to the server
+    over `metrics_queue`, if given. `role` is one of ROLES; `model_id`
+    defaults to MODEL_ID.
+    """
     global exit
 
     signal.signal(signal.SIGTERM, on_term)
@@ -64,103 +148,332 @@ def start(log_queue: multiprocessing.Queue):
     with silenced_stderr():
         import whisper
 
-    model = whisper.load_model(MODEL_ID, in_memory=True)
-    audio_queue = queue.Queue()
-
-    audio_data = None
+    # Audio is captured and buffered while the model loads
+    if role not in ROLES:
+        raise ValueError(f"unknown engine role {role!r}")
+    if COMMIT_POLICY not in COMMIT_POLICIES:
+        raise ValueError(f"unknown commit policy {COMMIT_POLICY!r}")
+    profile = DECODE_PROFILES[DECODE_PROFILE]
+    # Stream workers never commit, so they don't need word timings
+    agreement = COMMIT_POLICY == "agreement" and role != "stream"
+    loader = ModelLoader(model_id or MODEL_ID, int8=MODEL_INT8).start()
+    model = None
+    if sources is None:
+        sources = {name: MicrophoneSource(device=device) for name, device in INPUT_DEVICES.items()}
 
-    # runs on sounddevice's separate thread
-    def audio_callback(indata: numpy.ndarray, frames: int, time, status):
-        if status:
-            LOG.error(status, file=sys.stderr)
-        audio_queue.put(indata.copy())
+    states = [SourceState(name, source) for name, source in sources.items()]
+    # The first source's clock paces the ticks
+    clock = states[0].source
+    scheduler = TickScheduler(TARGET_LATENCY_S, MIN_UPDATE_S, MAX_UPDATE_S)
+    # Spans are shipped to the server with the transcript, see `tracing`
+    process_name = "transcription-engine" if role == "both" else f"transcription-engine-{role}"
+    tracer = Tracer(process_name)
+    # Workers can share a role, so their series are told apart by model too
+    metrics = Registry(worker=role, model=model_id or MODEL_ID)
+    publisher = Publisher(f"{process_name}-{model_id or MODEL_ID}", metrics, metrics_queue)
 
     try:
-        with sounddevice.InputStream(callback=audio_callback, dtype="float32", samplerate=SAMPLE_RATE, latency=1.0, channels=1) as istream:
+        with ExitStack() as stack:
+            for state in states:
+                stack.enter_context(state.source)
             LOG.info(f"Readying window ({WINDOW_S} seconds)...")
 
-            def time_to_samples(t):
-                return int(t * istream.samplerate)
-
-            def cur_len_s():
-                nonlocal audio_data
-                if audio_data is None:
-                    return 0
-                return len(audio_data) / istream.samplerate
-
-            def retrieve_audio_data():
-                nonlocal audio_data
-                didGetAll = False
-                while not didGetAll:
-                    try:
-                        indata = audio_queue.get_nowait()
-                    except queue.Empty:
-                        indata = audio_queue.get()
-                        didGetAll = True
-                    audio_data = indata if audio_data is None else numpy.concatenate((audio_data, indata), dtype="float32")
-
-            last_start = time.time()
-            while not exit:                
-                time_since_last = time.time() - last_start
-                if time_since_last < MAX_UPDATE_S:
-                    time.sleep(MAX_UPDATE_S - time_since_last)
-                last_start = time.time()
-                
-                retrieve_audio_data()
-                
-                if cur_len_s() >= WINDOW_S:
-                    flattened = audio_data.copy().flatten()
-                    start = time.time()
-                    with silenced_stderr():
-                        tscript = model.transcribe(
-                            flattened,
-                            no_speech_threshold=NO_SPEECH_THRESHOLD,
-                            condition_on_previous_text=False
+            def retrieve_audio_data(state: SourceState):
+                audio = state.audio
+                for indata in state.source.read():
+                    audio.append(indata)
+                    state.vad.process(indata)
+                if audio.dropped:
+                    LOG.warning(f"{state.name}: audio buffer full, dropped {audio.dropped} samples")
+                    metrics.inc("engine_audio_dropped_samples_total", audio.dropped, source=state.name)
+                    audio.dropped = 0
+                for flag, count in state.source.status_counts().items():
+                    metrics.set("engine_audio_status_total", count, flag=flag, source=state.name)
+
+            def send(state: SourceState, kind: str, text: str, end_sample: int, stats: dict):
+                # Timestamps for following this text from the microphone to the overlay
+                trace = {
+                    "audio_start": state.window_start,
+                    "audio_end": end_sample,
+                    "captured": state.capture_time(end_sample),
+                    "inference_start": stats["inference_start"],
+                    "inference_end": stats["inference_end"],
+                    "enqueued": time.time(),
+                }
+                # Sequence number: where the text ends on the audio timeline all workers share
+                seq = state.source.origin + end_sample
+                # When the audio the text covers was captured, for subtitles
+                start, end = state.capture_time(state.audio.start_sample), state.capture_time(end_sample)
+                log_queue.put({kind: text, "source": state.name, "seq": seq, "start": start, "end": end, "trace": trace})
+                metrics.inc("engine_messages_total", kind=kind)
+
+            def commit(state: SourceState, text: str, end_sample: int, stats: dict):
+                send(state, "log", text, end_sample, stats)
+                stats["commits"].append({"text": text, "end_s": end_sample / state.source.samplerate, "source": state.name})
+
+            def prepare(state: SourceState, decision: TickDecision, final: bool) -> Optional[int]:
+                """Trims silence, and returns where the window to transcribe ends, if this source needs transcribing"""
+                audio = state.audio
+                committed = state.source.committed_sample
+                if role == "stream" and committed is not None and committed > audio.start_sample:
+                    # Follow the commit worker, so we only stream what it hasn't committed yet
+                    audio.cut_to(min(committed, audio.end_sample))
+                speech = state.vad.speech_bounds(audio.start_sample, audio.end_sample)
+                if speech is None:
+                    if state.cur_len_s() >= WINDOW_S:
+                        # Nothing but silence, no need to ask whisper
+                        LOG.debug(f"{state.name}: no speech detected, skipping transcription")
+                        audio.keep_last(state.time_to_samples(EMPTY_CUT_TO_S))
+                    return None
+
+                # Trim leading silence for good, and trailing silence for this tick
+                pad = state.time_to_samples(VAD_PAD_S)
+                if speech[0] - pad > audio.start_sample:
+                    audio.cut_to(speech[0] - pad)
+                window_end = min(audio.end_sample, speech[1] + pad)
+
+                if role == "stream" and (final or not decision.stream):
+                    # Committing the rest is the commit worker's job
+                    return None
+                if role == "both" and not agreement and not final and not decision.stream and state.cur_len_s() < MAX_SEGMENT_LENGTH_S:
+                    # Falling behind: only spend time on ticks that could commit something
+                    LOG.debug(f"{state.name}: skipping stream-only tick")
+                    return None
+
+                if not final and state.cur_len_s() < WINDOW_S:
+                    return None
+                return window_end
+
+            def finish(state: SourceState, tscript: dict, window_end: int, decision: TickDecision, final: bool, stats: dict):
+                """Commits, cuts and streams one source's transcription"""
+                audio = state.audio
+                time_to_samples = state.time_to_samples
+                audio_data_s = round(state.cur_len_s(), 2)
+
+                if role == "stream":
+                    # Everything since the last commit, which is where our buffer starts
+                    text = "".join(
+                        segment["text"]
+                        for segment in tscript["segments"]
+                        if segment["no_speech_prob"] < NO_SPEECH_THRESHOLD
+                    )
+                    if text:
+                        send(state, "stream", text, window_end, stats)
+                    else:
+                        audio.keep_last(time_to_samples(EMPTY_CUT_TO_S))
+                    LOG.info(f"{state.name}: Audio length: {audio_data_s}s, Transcription: {text or '[empty]'}")
+                    return
+
+                if agreement:
+                    finish_agreement(state, tscript, window_end, decision, final, stats)
+                    return
+
+                if final:
+                    # The source is done, so nothing is going to change anymore
+                    text = "".join(
+                        segment["text"]
+                        for segment in tscript["segments"]
+                        if segment["no_speech_prob"] < NO_SPEECH_THRESHOLD
+                    )
+                    if text:
+                        commit(state, text, audio.start_sample + time_to_samples(tscript["segments"][-1]["end"]), stats)
+                    audio.clear()
+                    return
+
+                # Find segments that are eligible to be "committed"
+                #  (i.e. they're old enough/long away enough that they're unlikely to change).
+                if len(tscript["segments"]) > 1:
+                    # Cut old segments
+                    LOG.debug(f"{state.name}: cutting extra segments!")
+                    segment_cutoff = time_to_samples(tscript["segments"][-2]["end"])
+                    prev_text = "".join(
+                        segment["text"]
+                        for segment in tscript["segments"][:-1]
+                        if segment["no_speech_prob"] < NO_SPEECH_THRESHOLD
+                    )
+                    commit(state, prev_text, audio.start_sample + segment_cutoff, stats)
+                    audio.cut_to(audio.start_sample + segment_cutoff)
+                elif all(segment["no_speech_prob"] > NO_SPEECH_THRESHOLD for segment in tscript["segments"]):
+                    # Cut empty data down to EMPTY_CUT_TO_S
+                    LOG.debug(f"{state.name}: cutting empty data")
+                    audio.keep_last(time_to_samples(EMPTY_CUT_TO_S))
+                elif len(tscript["segments"]) == 1 and state.cur_len_s() - tscript["segments"][0]["end"] > MAX_SEGMENT_LENGTH_S:
+                    # Cut down a segment where we've stopped talking
+                    LOG.debug(f"{state.name}: segment is done, cutting")
+                    if tscript["segments"][0]["no_speech_prob"] < NO_SPEECH_THRESHOLD:
+                        commit(
+                            state,
+                            tscript["segments"][0]["text"],
+                            audio.start_sample + time_to_samples(tscript["segments"][0]["end"]),
+                            stats,
                         )
-                    transcription_time = round(time.time() - start, 2)
-                    audio_data_s = round(len(audio_data) / istream.samplerate, 2)
-
-                    # Find segments that are eligible to be "committed"
-                    #  (i.e. they're old enough/long away enough that they're unlikely to change).
-                    if len(tscript["segments"]) > 1:
-                        # Cut old segments
-                        LOG.debug("Cutting extra segments!")
-                        segment_cutoff = time_to_samples(tscript["segments"][-2]["end"])
-                        audio_data = audio_data[segment_cutoff:]
-                        prev_text = "".join(
-                            segment["text"]
-                            for segment in tscript["segments"][:-1]
-                            if segment["no_speech_prob"] < NO_SPEECH_THRESHOLD
+                    audio.cut_to(
+                        audio.start_sample
+                        + max(
+                            min(
+                                len(audio),
+                                time_to_samples(tscript["segments"][0]["end"] + SEGMENT_TRAILS_CUT_PAST_S),
+                            ),
+                            len(audio),
                         )
-                        log_queue.put({"log": prev_text})
-                    elif all(segment["no_speech_prob"] > NO_SPEECH_THRESHOLD for segment in tscript["segments"]):
-                        # Cut empty data down to EMPTY_CUT_TO_S
-                        LOG.debug("Cutting empty data")
-                        audio_data = audio_data[min(max(0, len(audio_data) - time_to_samples(EMPTY_CUT_TO_S)), len(audio_data)) :]
-                    elif len(tscript["segments"]) == 1 and cur_len_s() - tscript["segments"][0]["end"] > MAX_SEGMENT_LENGTH_S:
-                        # Cut down a segment where we've stopped talking
-                        LOG.debug("Segment is done, cutting")
-                        audio_data = audio_data[
-                            max(
-                                min(
-                                    len(audio_data),
-                                    time_to_samples(tscript["segments"][0]["end"] + SEGMENT_TRAILS_CUT_PAST_S),
-                                ),
-                                len(audio_data),
-                            ) :
-                        ]
-                        if tscript["segments"][0]["no_speech_prob"] < NO_SPEECH_THRESHOLD:
-                            log_queue.put({"log": tscript["segments"][0]["text"]})
-                        tscript["segments"][0]["text"] = ""
-
-                    # Communicate any text segments to the receiver
-                    if len(tscript["segments"]) >= 1:
-                        cur_text = tscript["segments"][-1]["text"]
-                        LOG.info(f"Time to transcribe: {transcription_time}s, Audio length: {audio_data_s}s, Transcription: {cur_text}")
-                        if not all(segment["no_speech_prob"] > NO_SPEECH_THRESHOLD for segment in tscript["segments"]):
-                            log_queue.put({"stream": cur_text})
-                    else:
-                        LOG.info(f"Time to transcribe: {transcription_time}s, Audio length: {audio_data_s}s, Transcription: [empty]")
+                    )
+                    tscript["segments"][0]["text"] = ""
+
+                # Communicate any text segments to the receiver
+                if len(tscript["segments"]) >= 1:
+                    cur_text = tscript["segments"][-1]["text"]
+                    if decision.stream and role == "both" and not all(segment["no_speech_prob"] > NO_SPEECH_THRESHOLD for segment in tscript["segments"]):
+                        send(state, "stream", cur_text, window_end, stats)
+                    LOG.info(f"{state.name}: Audio length: {audio_data_s}s, Transcription: {cur_text}")
+                else:
+                    LOG.info(f"{state.name}: Audio length: {audio_data_s}s, Transcription: [empty]")
+
+            def finish_agreement(state: SourceState, tscript: dict, window_end: int, decision: TickDecision, final: bool, stats: dict):
+                """Commits the words two consecutive transcriptions agree on, and cuts after them"""
+                audio = state.audio
+                words = [
+                    word
+                    for segment in tscript["segments"]
+                    if segment["no_speech_prob"] < NO_SPEECH_THRESHOLD
+                    for word in segment.get("words", [])
+                ]
+                if final:
+                    if words:
+                        commit(state, "".join(word["word"] for word in words), audio.start_sample + state.time_to_samples(words[-1]["end"]), stats)
+                    audio.clear()
+                    state.agreement.reset()
+                    return
+                if not words:
+                    LOG.debug(f"{state.name}: cutting empty data")
+                    audio.keep_last(state.time_to_samples(EMPTY_CUT_TO_S))
+                    state.agreement.reset()
+                    return
+
+                agreed = state.agreement.update(words)
+                window_s = (window_end - audio.start_sample) / state.source.samplerate
+                if not agreed and window_s > AGREEMENT_MAX_WINDOW_S:
+                    # No agreement in a long time: commit what's old enough not to change much
+                    agreed = [word for word in words if word["end"] < window_s - WINDOW_S] or words[:1]
+                    state.agreement.reset()
+                if agreed:
+                    cutoff = audio.start_sample + state.time_to_samples(agreed[-1]["end"])
+                    commit(state, "".join(word["word"] for word in agreed), cutoff, stats)
+                    audio.cut_to(cutoff)
+
+                pending = "".join(word["word"] for word in words[len(agreed) :])
+                if decision.stream and role == "both" and pending:
+                    send(state, "stream", pending, window_end, stats)
+                LOG.info(f"{state.name}: Audio length: {window_s:.2f}s, Committed: {len(agreed)} words, Pending: {pending or '[empty]'}")
+
+            def run_tick(decision: TickDecision, stats: dict):
+                pending = []
+                for state in states:
+                    if state.done:
+                        continue
+                    # When a recording runs out, transcribe and commit whatever is left
+                    final = state.source.exhausted
+                    window_end = prepare(state, decision, final)
+                    if window_end is not None:
+                        pending.append((state, window_end, final))
+                    elif final:
+                        state.done = True
+                if not pending:
+                    return
+
+                start = time.time()
+                with tracer.span("mel", track="inference"):
+                    windows = [
+                        (state.mel_cache.update(state.audio, window_end), state.audio.view(end=window_end))
+                        for state, window_end, _ in pending
+                    ]
+                stats["mel_s"] = time.time() - start
+                with silenced_stderr(), tracer.span("transcribe", sources=len(pending)):
+                    tscripts = transcribe_batch(
+                        model, windows, NO_SPEECH_THRESHOLD, word_timestamps=agreement, profile=profile, stats=stats
+                    )
+                cut_start = time.time()
+                stats["inference_start"] = start
+                stats["inference_end"] = cut_start
+                transcription_time = round(cut_start - start, 2)
+                window_s = sum(len(window) for _, window in windows) / SAMPLE_RATE
+                scheduler.record(transcription_time, window_s)
+                metrics.observe("engine_inference_seconds", cut_start - start)
+                if window_s > 0:
+                    metrics.observe("engine_realtime_factor", (cut_start - start) / window_s)
+                stats["inference_s"] = transcription_time
+                stats["window_s"] = window_s
+                stats["windows"] = len(windows)
+                metrics.inc("engine_decode_fallbacks_total", stats["fallbacks"])
+                if stats["over_budget"]:
+                    metrics.inc("engine_decode_over_budget_total")
+                LOG.info(
+                    f"Time to transcribe: {transcription_time}s for {len(pending)} source(s) "
+                    f"(mel {stats['mel_s']:.2f}s, encode {stats['encode_s']:.2f}s, "
+                    f"decode {stats['decode_s']:.2f}s in {stats['decode_attempts']} attempt(s))"
+                )
+
+                for (state, window_end, final), tscript in zip(pending, tscripts):
+                    state.window_start = state.audio.start_sample
+                    finish(state, tscript, window_end, decision, final, stats)
+                    if final:
+                        state.done = True
+                tracer.add("cut", cut_start, time.time())
+
+            last_start = clock.time()
+            delay = MAX_UPDATE_S
+            while not exit:
+                time_since_last = clock.time() - last_start
+                if time_since_last < delay:
+                    for state in states:
+                        # Virtual clocks only move when we sleep on them
+                        if state.source is clock or not state.source.realtime:
+                            state.source.sleep(delay - time_since_last)
+                last_start = clock.time()
+                tick_start = time.time()
+                tick_cpu_start = time.process_time()
+
+                with tracer.span("retrieve"):
+                    for state in states:
+                        if not state.done:
+                            retrieve_audio_data(state)
+                any_final = any(state.source.exhausted for state in states if not state.done)
+                buffered_s = max(state.cur_len_s() for state in states)
+                decision = scheduler.decide(buffered_s)
+                delay = decision.delay_s
+
+                stats = {"clock": last_start, "buffered_s": buffered_s, "inference_s": None, "window_s": None, "commits": []}
+                if model is None and (loader.ready or any_final or not all(state.source.realtime for state in states)):
+                    model = loader.result()
+                    for state in states:
+                        state.mel_cache = MelCache.for_buffer(model.dims.n_mels, state.audio)
+                    tracer.trace_module(model.encoder, "encode", track="inference")
+                    tracer.trace_module(model.decoder, "decode", track="inference")
+                    stats["load_s"] = loader.load_s
+                    stats["warmup_s"] = loader.warmup_s
+                if model is not None:
+                    run_tick(decision, stats)
+                    if role != "stream":
+                        # Everything before the buffer has been committed (or was silence)
+                        for state in states:
+                            state.source.mark_committed(state.audio.start_sample)
+                else:
+                    LOG.debug(f"Model still loading, {buffered_s:.1f}s of audio buffered")
+                stats["tick_s"] = time.time() - tick_start
+                stats["cpu_s"] = time.process_time() - tick_cpu_start
+                if on_tick is not None:
+                    on_tick(stats)
+                spans = tracer.drain()
+                if spans:
+                    log_queue.put({"spans": spans})
+                    metrics.inc("engine_messages_total", kind="spans")
+
+                for state in states:
+                    metrics.set("engine_buffered_audio_seconds", state.cur_len_s(), source=state.name)
+                metrics.inc("engine_ticks_total", outcome="skipped" if stats["inference_s"] is None else "transcribed")
+                publisher.maybe_publish()
+
+                if all(state.done for state in states):
+                    break
 
     except KeyboardInterrupt:
         LOG.warn("\nInterrupted by user")
@@ -2,15 +2,25 @@
 # This module receives transcription data from the engine and
 # displays it on a javascript-driven page
 
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from segment_store import SegmentStore, TranscriptSnapshot
+from journal import TranscriptJournal, load_session
+from tracing import Tracer
+from metrics import Registry, render as render_metrics
 from util import create_logger, create_filter
 
 import os
+import hashlib
+import json
 import multiprocessing
 import threading
 import signal
+import sys
+import time
 
 LOG = create_logger("transcription-server")
 FILTER = create_filter()
@@ -21,38 +31,381 @@ SERVER_PORT = 8080
 with open(HTML_PATH, "rb") as f:
     VIEW_HTML = f.read()
 
-temp_text = ""
-text_log = ""
+# Most connections we serve at once; any more get a 503 straight away
+MAX_CONNECTIONS = 256
+# Connections that are idle (or stalled) for this long get dropped
+CONNECTION_TIMEOUT_S = 30
+
+# How many events we remember so reconnecting clients can catch up
+EVENT_HISTORY = 1024
+# How often to send a comment down idle event streams, so proxies don't time them out
+EVENT_KEEPALIVE_S = 15
+
+transcript = SegmentStore()
+# Set by start(); the load test runs without one
+journal: Optional[TranscriptJournal] = None
 text_mtx = threading.Lock()
+# Notified (with text_mtx held) whenever an event is published
+text_changed = threading.Condition(text_mtx)
+# (sequence number, event name, payload) for the last EVENT_HISTORY events
+events = deque(maxlen=EVENT_HISTORY)
+event_seq = 0
+shutting_down = False
+
+# Spans from the engine (shipped over the queue) and for each message's trip to a client
+TRACER = Tracer("transcription-server")
+# (sequence number, event name, trace) for traced messages no client has been sent yet
+unserved_traces = deque(maxlen=EVENT_HISTORY)
+
+METRICS = Registry()
+# Latest metrics snapshot from each of the other processes
+process_metrics = {}
+process_metrics_mtx = threading.Lock()
+# Set by start(), for reporting its depth
+message_queue: Optional[multiprocessing.Queue] = None
+
+
+class NowPlaying(NamedTuple):
+    """What the nowplaying process last sent, with responses built once per change"""
+
+    version: int
+    json: bytes
+    json_etag: str
+    artwork: bytes
+    artwork_etag: str
+
+
+def content_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+
+
+# Replaced whole on every update, so handlers can read it without the lock
+now_playing = NowPlaying(0, b"{}", content_etag(b"{}"), b"", content_etag(b""))
+now_playing_mtx = threading.Lock()
+# Notified (with now_playing_mtx held) whenever now_playing is replaced
+now_playing_changed = threading.Condition(now_playing_mtx)
+
+
+def publish_event(name: str, payload: dict):
+    """Records an event for streaming clients. Must be called with text_mtx held."""
+    global event_seq
+    event_seq += 1
+    events.append((event_seq, name, payload))
+    text_changed.notify_all()
+
+
+def mark_served(seq: int):
+    """Records latency spans for every traced message up to `seq`, the first time one is served"""
+    now = time.time()
+    with text_mtx:
+        while unserved_traces and unserved_traces[0][0] <= seq:
+            served_seq, name, trace = unserved_traces.popleft()
+            stages = (
+                ("buffered", trace["captured"], trace["inference_start"]),
+                ("inference", trace["inference_start"], trace["inference_end"]),
+                ("cut", trace["inference_end"], trace["enqueued"]),
+                ("queue", trace["enqueued"], trace["dequeued"]),
+                ("serve", trace["dequeued"], now),
+            )
+            for stage, start, end in stages:
+                TRACER.add(stage, start, end, track=f"{name} latency", seq=served_seq, samples=[trace["audio_start"], trace["audio_end"]])
+
+
+def format_event(seq: int, name: str, payload: dict) -> bytes:
+    return f"id: {seq}\nevent: {name}\ndata: {json.dumps(payload)}\n\n".encode("utf-8")
 
 
 class TranscriptHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so pollers don't reconnect every time
+    protocol_version = "HTTP/1.1"
+    timeout = CONNECTION_TIMEOUT_S
+
     def log_message(self, format: str, *args: Any) -> None:
         # Keep the server quiet
         pass
     
     def do_GET(self):
-        global temp_text
-        global text_mtx
-        global text_log
-        if "text" in self.path:
-            self.send_response(200)
-            self.send_header("Content-Type", "text/plain")
-            self.end_headers()
-            with text_mtx:
-                self.wfile.write(bytes(text_log + temp_text, "utf-8"))
+        start = time.time()
+        path = urlparse(self.path).path
+        if path == "/events":
+            # Long-lived, so its duration isn't a latency worth recording
+            self.stream_events()
+            return
+        elif path == "/trace.json":
+            route = path
+            self.send_trace()
+        elif path == "/metrics":
+            route = path
+            self.send_metrics()
+        elif path == "/nowplaying/events":
+            self.stream_now_playing()
+            return
+        elif path == "/nowplaying.json":
+            route = path
+            state = now_playing
+            self.send_cached(state.json, state.json_etag, "application/json")
+        elif path == "/artwork.png":
+            route = path
+            state = now_playing
+            # The URL /nowplaying.json points at has the ETag in it, so what it names never changes
+            immutable = parse_qs(urlparse(self.path).query).get("v", [None])[0] == state.artwork_etag.strip('"')
+            self.send_cached(state.artwork, state.artwork_etag, "image/png", immutable)
+        elif "text" in self.path:
+            route = "/text"
+            self.send_text()
         else:
+            route = "/"
             self.send_response(200)
             self.send_header("Content-type", "text/html")
+            self.send_header("Content-Length", str(len(VIEW_HTML)))
             self.end_headers()
             self.wfile.write(VIEW_HTML)
+        METRICS.observe("server_http_request_seconds", time.time() - start, route=route)
+
+    def send_text(self):
+        """
+        The transcript as plain text: committed segments followed by the
+        streaming text. With `?since=<offset>&gen=<generation>` only the
+        committed bytes after `offset` are sent; the X-Transcript-* headers
+        tell the client where to resume and how much of the body was committed.
+        """
+        query = parse_qs(urlparse(self.path).query)
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        since = query.get("since", [None])[0]
+        generation = query.get("gen", [None])[0]
+
+        with text_mtx:
+            snapshot = transcript.snapshot(gzip=use_gzip and since is None)
+            served_seq = event_seq
+
+        reset = True
+        try:
+            if since is not None and generation == snapshot.generation_id and 0 <= int(since) <= snapshot.size:
+                reset = False
+        except (TypeError, ValueError):
+            pass
+
+        is_delta = since is not None and not reset
+        use_gzip = use_gzip and since is None
+        start = int(since) if is_delta else 0
+        etag = snapshot.etag(gzip=use_gzip, since=start if is_delta else None)
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if use_gzip:
+            body = snapshot.full_gzip()
+        else:
+            body = snapshot.committed_since(start) + snapshot.stream
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("ETag", etag)
+        # The same URL is sent gzipped or not, depending on the request
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("X-Transcript-Generation", snapshot.generation_id)
+        self.send_header("X-Transcript-Offset", str(snapshot.size))
+        self.send_header("X-Transcript-Log-Length", str(snapshot.size - start))
+        if since is not None and reset:
+            self.send_header("X-Transcript-Reset", "1")
+        self.end_headers()
+        self.wfile.write(body)
+        mark_served(served_seq)
+
+    def send_cached(self, body: bytes, etag: str, content_type: str, immutable: bool = False):
+        """A body clients can revalidate with If-None-Match"""
+        cache_control = "public, max-age=31536000, immutable" if immutable else "no-cache"
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if not body:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache_control)
+        self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_trace(self):
+        """Everything traced so far, as Chrome trace JSON"""
+        body = json.dumps(TRACER.chrome_trace()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Disposition", 'attachment; filename="transcript-trace.json"')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_metrics(self):
+        """Metrics from every process, in Prometheus text format"""
+        depth = None
+        if message_queue is not None:
+            try:
+                depth = message_queue.qsize()
+            except NotImplementedError:
+                # macOS has no sem_getvalue
+                pass
+        if depth is not None:
+            METRICS.set("server_queue_depth", depth)
+        with process_metrics_mtx:
+            snapshots = list(process_metrics.values())
+        body = render_metrics(*snapshots, METRICS.snapshot()).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def stream_events(self):
+        """
+        Server-sent events: `log`, `stream` and `clear` as they arrive. Clients
+        resume with Last-Event-ID (or ?since=), and get a `reset` snapshot when
+        they're new or too far behind to replay.
+        """
+        last_seq = self.headers.get("Last-Event-ID")
+        if last_seq is None:
+            last_seq = parse_qs(urlparse(self.path).query).get("since", [None])[0]
+        try:
+            last_seq = None if last_seq is None else int(last_seq)
+        except ValueError:
+            last_seq = None
+
+        # The stream only ends when the connection does
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        try:
+            while True:
+                with text_mtx:
+                    pending, snapshot = self._pending_events(last_seq)
+                    if not pending and not shutting_down:
+                        text_changed.wait(EVENT_KEEPALIVE_S)
+                        pending, snapshot = self._pending_events(last_seq)
+                    if shutting_down:
+                        return
+                if snapshot is not None:
+                    # Decoding the whole transcript happens here, outside the lock
+                    seq = pending[0][0]
+                    pending = [(seq, "reset", {"log": snapshot.committed_since(0).decode("utf-8"), "stream": snapshot.stream.decode("utf-8")})]
+                if pending:
+                    self.wfile.write(b"".join(format_event(*event) for event in pending))
+                    last_seq = pending[-1][0]
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+                if pending:
+                    mark_served(last_seq)
+        except OSError:
+            # Client went away, or stalled for longer than CONNECTION_TIMEOUT_S
+            pass
+
+    def stream_now_playing(self):
+        """Server-sent `nowplaying` events with the same JSON as /nowplaying.json: now, and whenever it changes"""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        # Only the latest state matters, so a client that falls behind just skips ahead
+        sent_version = None
+        try:
+            while True:
+                with now_playing_mtx:
+                    if now_playing.version == sent_version and not shutting_down:
+                        now_playing_changed.wait(EVENT_KEEPALIVE_S)
+                    if shutting_down:
+                        return
+                    state = now_playing
+                if state.version != sent_version:
+                    self.wfile.write(b"event: nowplaying\ndata: " + state.json + b"\n\n")
+                    sent_version = state.version
+                else:
+                    self.wfile.write(b": keepalive\n\n")
+                self.wfile.flush()
+        except OSError:
+            pass
+
+    @staticmethod
+    def _pending_events(last_seq: Optional[int]) -> Tuple[list, Optional[TranscriptSnapshot]]:
+        """
+        Events a client that has seen `last_seq` still needs, or a placeholder
+        reset event and the snapshot to fill it from. Must be called with text_mtx held.
+        """
+        oldest_seq = events[0][0] if events else event_seq + 1
+        if last_seq is None or last_seq > event_seq or last_seq < oldest_seq - 1:
+            return [(event_seq, "reset", None)], transcript.snapshot()
+        return [event for event in events if event[0] > last_seq], None
+
+
+class TranscriptServer(ThreadingHTTPServer):
+    """
+    One thread per connection, capped at MAX_CONNECTIONS so a pile of stalled
+    clients can't exhaust the process. Stalled clients themselves are dropped
+    by the handler's socket timeout.
+    """
+
+    # Event streams never end on their own, don't wait for them when quitting
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._slots = threading.BoundedSemaphore(MAX_CONNECTIONS)
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\nRetry-After: 1\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        super().process_request(request, client_address)
+
+    def handle_error(self, request, client_address):
+        # Overlays disconnecting mid-response is business as usual
+        if isinstance(sys.exc_info()[1], (ConnectionError, TimeoutError)):
+            return
+        super().handle_error(request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._slots.release()
+
 
 web_server_mtx = threading.Lock()
 web_server = None
 def start_server():
     global web_server
     with web_server_mtx:
-        web_server = HTTPServer((HOST_NAME, SERVER_PORT), TranscriptHandler)
+        web_server = TranscriptServer((HOST_NAME, SERVER_PORT), TranscriptHandler)
         LOG.info("Server started http://%s:%s" % (HOST_NAME, SERVER_PORT))
 
     try:
@@ -65,34 +418,166 @@ def start_server():
 
 
 def start_listener(mp_q: multiprocessing.Queue):
-    global temp_text
-    global text_mtx
-    global text_log
+    # Censoring happens once per message here, so requests only ever copy bytes.
+    # Per source: raw streaming text, censored streaming text, and when the
+    # segment that's currently streaming started
+    streams = {}
+    # Once more than one source has spoken, text is labeled with its speaker
+    speakers = set()
+    # Per source: sequence numbers of the last commit and of the current
+    # stream, to drop stream text that a faster worker sent for audio
+    # that's already been committed, or that arrived out of order
+    sequence = {}
+
+    def labeled(source: Optional[str], text: str) -> str:
+        return f"{source}: {text.strip()}" if len(speakers) > 1 and source is not None else text
+
+    def combined_stream() -> str:
+        return "\n".join(labeled(source, censored) for source, (_, censored, _) in streams.items() if censored)
+
     while True:
         obj = mp_q.get()
         if "stop" in obj and obj["stop"]:
             LOG.info("transcript-reading loop finished")
             return
+        if "spans" in obj:
+            TRACER.extend(obj["spans"])
+            METRICS.inc("server_messages_total", kind="spans")
+            continue
+        for kind in ("log", "stream", "clear"):
+            if kind in obj:
+                METRICS.inc("server_messages_total", kind=kind)
+        now = time.time()
+        trace = obj.get("trace")
+        if trace is not None:
+            trace["dequeued"] = now
+        source = obj.get("source")
+        seq = obj.get("seq")
+        if seq is not None and ("log" in obj or "stream" in obj):
+            commit_seq, stream_seq = sequence.get(source, (-1, -1))
+            if "stream" in obj and (seq <= commit_seq or seq < stream_seq):
+                METRICS.inc("server_stale_messages_total")
+                continue
+            sequence[source] = (max(commit_seq, seq), -1) if "log" in obj else (commit_seq, seq)
+        if "log" in obj or "stream" in obj:
+            speakers.add(source)
+        stream_raw, stream_censored, segment_start = streams.get(source, ("", "", None))
+        # Capture times from the engine, so subtitles line up with the audio rather than with inference;
+        # messages without them fall back to when we heard about the segment
+        if segment_start is None:
+            segment_start = obj.get("start", now)
+        if "log" in obj:
+            log_censored = labeled(source, FILTER.censor(obj["log"]))
+            if journal is not None:
+                journal.append(labeled(source, obj["log"]), obj.get("start", segment_start), obj.get("end", now))
+            streams[source] = ("", "", None)
+        elif "stream" in obj:
+            stream_censored = FILTER.censor_update(stream_raw, stream_censored, obj["stream"])
+            streams[source] = (obj["stream"], stream_censored, segment_start)
+        if "clear" in obj and obj['clear']:
+            streams.clear()
+            if journal is not None:
+                journal.clear()
+
         with text_mtx:
             if "clear" in obj and obj['clear']:
-                text_log = ""
-                temp_text = ""
+                transcript.clear()
+                publish_event("clear", {})
             if "log" in obj:
-                text_log += obj["log"] + "\n"
-                temp_text = ""
+                transcript.append(log_censored)
+                publish_event("log", {"text": log_censored, "source": source})
+                # Other speakers may still be mid-sentence
+                stream = combined_stream()
+                if stream:
+                    transcript.set_stream(stream)
+                    publish_event("stream", {"text": stream})
             elif "stream" in obj:
-                temp_text = obj["stream"]
+                stream = combined_stream()
+                transcript.set_stream(stream)
+                publish_event("stream", {"text": stream, "source": source})
+            if trace is not None and ("log" in obj or "stream" in obj):
+                unserved_traces.append((event_seq, "log" if "log" in obj else "stream", trace))
+
+
+def start_metrics_listener(metrics_q: multiprocessing.Queue):
+    """Keeps the latest snapshot each process sends; they're cumulative, so older ones can go"""
+    while True:
+        process, snapshot = metrics_q.get()
+        with process_metrics_mtx:
+            process_metrics[process] = snapshot
 
 
-def start(mp_q: multiprocessing.Queue):
+def start_now_playing_listener(now_playing_q: multiprocessing.Queue):
+    """Keeps the latest of everything the nowplaying process writes, and builds the responses for it"""
+    global now_playing
+    values: Dict[str, bytes] = {}
+    while True:
+        changes = now_playing_q.get()
+        values.update(changes)
+        METRICS.inc("server_nowplaying_updates_total")
+
+        artwork = values.get("artwork.png", b"")
+        artwork_etag = now_playing.artwork_etag if "artwork.png" not in changes else content_etag(artwork)
+        artwork_version = artwork_etag.strip('"')
+        try:
+            progress = float(values.get("progress.txt", b"0"))
+        except ValueError:
+            progress = 0.0
+        body = json.dumps({
+            "title": values.get("title.txt", b"").decode("utf-8"),
+            "artist": values.get("artist.txt", b"").decode("utf-8"),
+            "album": values.get("album.txt", b"").decode("utf-8"),
+            "progress": progress,
+            "artwork": f"/artwork.png?v={artwork_version}" if artwork else None,
+        }).encode("utf-8")
+        with now_playing_mtx:
+            now_playing = NowPlaying(now_playing.version + 1, body, content_etag(body), artwork, artwork_etag)
+            now_playing_changed.notify_all()
+
+
+def restore_transcript():
+    """Reloads the current session's committed segments from the journal"""
+    segments = load_session()
+    with text_mtx:
+        for segment in segments:
+            transcript.append(FILTER.censor(segment.text))
+    if segments:
+        LOG.info(f"Restored {len(segments)} segments from the journal")
+
+
+def start(
+    mp_q: multiprocessing.Queue,
+    metrics_q: Optional[multiprocessing.Queue] = None,
+    now_playing_q: Optional[multiprocessing.Queue] = None,
+):
+    global journal, message_queue
+    message_queue = mp_q
+    try:
+        restore_transcript()
+    except OSError as e:
+        LOG.error(f"Couldn't restore transcript: {type(e).__name__}: {e}")
+    journal = TranscriptJournal()
+    journal.start()
+
     server_thread = threading.Thread(target=start_server)
     listener_thread = threading.Thread(target=start_listener, args=(mp_q,))
     server_thread.start()
     listener_thread.start()
+    if metrics_q is not None:
+        # Daemon: it only ever waits on the queue, and nothing needs flushing
+        threading.Thread(target=start_metrics_listener, args=(metrics_q,), daemon=True).start()
+    if now_playing_q is not None:
+        threading.Thread(target=start_now_playing_listener, args=(now_playing_q,), daemon=True).start()
 
     def on_term(*_):
+        global shutting_down
         LOG.info("quitting")
         mp_q.put({"stop": True})
+        with text_mtx:
+            shutting_down = True
+            text_changed.notify_all()
+        with now_playing_mtx:
+            now_playing_changed.notify_all()
         with web_server_mtx:
             web_server.shutdown()
         
@@ -103,4 +588,5 @@ def start(mp_q: multiprocessing.Queue):
 
     server_thread.join()
     listener_thread.join()
+    journal.close()
     LOG.info("done")
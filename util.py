@@ -1,6 +1,7 @@
 import logging
 import sys
 from better_profanity import profanity
+from censor import ProfanityFilter
 
 def create_logger(service_name: str, level: int = logging.DEBUG):
     logger = logging.getLogger(service_name)
@@ -11,65 +12,66 @@ def create_logger(service_name: str, level: int = logging.DEBUG):
     logger.addHandler(handler)
     return logger
 
-def create_filter():
-    return profanity.load_censor_words(
-        whitelist_words=[
-            "fuck",
-            "shit",
-            "damn",
-            "goddamn",
-            "ass",
-            "shitty",
-            "fucking",
-            "fucked",
-            "hell",
-            "crap",
-            "asshole",
-            "dick",
-            "drunk",
-            "dumb",
-            "dumbass",
-            "fat",
-            "gay",
-            "gays",
-            "god",
-            "homo",
-            "lesbian",
-            "lesbians",
-            "lmao",
-            "lust",
-            "loin",
-            "loins",
-            "masochist",
-            "menstruate",
-            "naked",
-            "nude",
-            "nudes",
-            "omg",
-            "pee",
-            "piss",
-            "pot",
-            "puss",
-            "screw",
-            "sex",
-            "sexual",
-            "smut",
-            "stoned",
-            "suck",
-            "sucks",
-            "tampon",
-            "sucked",
-            "thug",
-            "thrust",
-            "trashy",
-            "ugly",
-            "vomit",
-            "weed",
-            "weirdo",
-            "weird",
-            "womb",
-            "yaoi",
-            "yuri",
-            "yury",
-        ]
-    )
\ No newline at end of file
+def create_filter() -> ProfanityFilter:
+    whitelist = [
+        "fuck",
+        "shit",
+        "damn",
+        "goddamn",
+        "ass",
+        "shitty",
+        "fucking",
+        "fucked",
+        "hell",
+        "crap",
+        "asshole",
+        "dick",
+        "drunk",
+        "dumb",
+        "dumbass",
+        "fat",
+        "gay",
+        "gays",
+        "god",
+        "homo",
+        "lesbian",
+        "lesbians",
+        "lmao",
+        "lust",
+        "loin",
+        "loins",
+        "masochist",
+        "menstruate",
+        "naked",
+        "nude",
+        "nudes",
+        "omg",
+        "pee",
+        "piss",
+        "pot",
+        "puss",
+        "screw",
+        "sex",
+        "sexual",
+        "smut",
+        "stoned",
+        "suck",
+        "sucks",
+        "tampon",
+        "sucked",
+        "thug",
+        "thrust",
+        "trashy",
+        "ugly",
+        "vomit",
+        "weed",
+        "weirdo",
+        "weird",
+        "womb",
+        "yaoi",
+        "yuri",
+        "yury",
+    ]
+    # better_profanity lowercases the list in place
+    profanity.load_censor_words(whitelist_words=list(whitelist))
+    return ProfanityFilter.from_profanity(profanity, whitelist)
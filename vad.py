@@ -0,0 +1,111 @@
+#!/usr/bin/env python3.9
+# This module provides a lightweight voice-activity detector, so the
+# transcription engine can skip inference on windows that are nothing
+# but silence or background noise.
+
+from typing import List, Optional, Tuple
+
+import numpy
+
+# Length of one VAD analysis frame
+FRAME_S = 0.03
+# How far above the tracked noise floor a frame must be to count as speech
+ENERGY_MARGIN_DB = 9.0
+# Frames quieter than this are never speech, whatever the noise floor says
+MIN_ENERGY_DB = -60.0
+# Spectral flatness above this looks like noise rather than voice (0 = tonal, 1 = white noise)
+FLATNESS_THRESHOLD = 0.45
+# How long we keep calling it speech after the last speech frame
+HANGOVER_S = 0.3
+# How quickly the noise floor creeps up towards louder frames, per frame
+NOISE_FLOOR_RISE = 0.005
+
+
+class VoiceActivityDetector:
+    """
+    Classifies streamed audio as speech or not, using frame energy against an
+    adaptive noise floor plus spectral flatness, smoothed with a hangover.
+
+    Speech is remembered as regions of absolute sample offsets (counting every
+    sample ever passed to `process`), so callers can ask about any window of
+    audio they still hold.
+    """
+
+    def __init__(self, samplerate: int, frame_s: float = FRAME_S, hangover_s: float = HANGOVER_S):
+        self.samplerate = samplerate
+        self.frame_len = int(frame_s * samplerate)
+        self.hangover_frames = max(1, round(hangover_s / frame_s))
+        self._window = numpy.hanning(self.frame_len).astype(numpy.float32)
+        self._pending = numpy.zeros(0, dtype=numpy.float32)
+        self._samples = 0
+        self._noise_floor = None
+        self._hangover = 0
+        self._regions: List[List[int]] = []
+
+    def process(self, block: numpy.ndarray) -> bool:
+        """Feeds a block of audio in, and returns whether any of it was speech"""
+        block = numpy.asarray(block, dtype=numpy.float32).reshape(-1)
+        data = numpy.concatenate((self._pending, block)) if len(self._pending) else block
+        n_frames = len(data) // self.frame_len
+        frame_start = self._samples - len(self._pending)
+        self._pending = data[n_frames * self.frame_len :].copy()
+        self._samples += len(block)
+        if n_frames == 0:
+            return False
+
+        frames = data[: n_frames * self.frame_len].reshape(n_frames, self.frame_len)
+        energy_db = 10 * numpy.log10(numpy.mean(frames * frames, axis=1) + 1e-10)
+        power = numpy.abs(numpy.fft.rfft(frames * self._window, axis=1)) ** 2 + 1e-12
+        flatness = numpy.exp(numpy.mean(numpy.log(power), axis=1)) / numpy.mean(power, axis=1)
+
+        any_speech = False
+        for i in range(n_frames):
+            if self._noise_floor is None or energy_db[i] < self._noise_floor:
+                self._noise_floor = energy_db[i]
+            else:
+                self._noise_floor += NOISE_FLOOR_RISE * (energy_db[i] - self._noise_floor)
+
+            is_voice = (
+                energy_db[i] > MIN_ENERGY_DB
+                and energy_db[i] > self._noise_floor + ENERGY_MARGIN_DB
+                and flatness[i] < FLATNESS_THRESHOLD
+            )
+            if is_voice:
+                self._hangover = self.hangover_frames
+            elif self._hangover > 0:
+                self._hangover -= 1
+                is_voice = True
+
+            if is_voice:
+                any_speech = True
+                start = frame_start + i * self.frame_len
+                end = start + self.frame_len
+                if self._regions and self._regions[-1][1] >= start:
+                    self._regions[-1][1] = end
+                else:
+                    self._regions.append([start, end])
+        return any_speech
+
+    def speech_bounds(self, start: int, end: int) -> Optional[Tuple[int, int]]:
+        """
+        The first and last speech sample offsets within [start, end), or None
+        if that window holds no speech. Forgets regions that end before `start`.
+        """
+        while self._regions and self._regions[0][1] <= start:
+            self._regions.pop(0)
+
+        first = None
+        last = None
+        for region_start, region_end in self._regions:
+            if region_start >= end:
+                break
+            if first is None:
+                first = max(start, region_start)
+            last = min(end, region_end)
+        if first is None:
+            return None
+        return first, last
+
+    def reset(self):
+        self._regions.clear()
+        self._hangover = 0